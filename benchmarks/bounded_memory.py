@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""
+This script measures with tracemalloc the memory held by a reloaded
+FileStorage, with every object in memory against a memory budget of
+max_resident objects, and times the reload and a scan of all the
+objects. Run it from the root of the repository:
+
+    python3 -m benchmarks.bounded_memory [number of objects]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def measure(path, max_resident):
+    """This returns the memory in KiB held by the storage after its
+    reload, and the times in milliseconds of the reload and the scan"""
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        storage = FileStorage(path, max_resident=max_resident)
+        storage.reload()
+        loaded = time.perf_counter()
+        held = tracemalloc.get_traced_memory()[0] / 1024
+        rooms = sum(place.number_rooms
+                    for place in storage.all(Place).values())
+        scanned = time.perf_counter()
+    finally:
+        tracemalloc.stop()
+    assert rooms >= 0
+    return held, (loaded - start) * 1000, (scanned - loaded) * 1000
+
+
+def main(count=20000):
+    """This prints the measures"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "file.json")
+        storage = FileStorage(path)
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.description = "A quiet room near the park"
+            place.number_rooms = i % 5
+            storage.new(place)
+        storage.save()
+
+        print(f"{count} places")
+        print(f"{'max_resident':<14}{'memory':>12}{'reload':>12}{'scan':>12}")
+        for max_resident in (None, count // 10, 1000):
+            held, load, scan = measure(path, max_resident)
+            print(f"{str(max_resident):<14}{held:>8.0f} KiB"
+                  f"{load:>9.1f} ms{scan:>9.1f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
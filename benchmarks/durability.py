@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+This script times FileStorage.save() at each durability level, for a
+full snapshot and for a journal append. Run it from the root of the
+repository:
+
+    python3 -m benchmarks.durability [number of objects] [saves]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from models.engine.file_storage import DURABILITY_LEVELS, FileStorage
+from models.place import Place
+
+
+def time_saves(durability, count, saves, journal):
+    """This returns the mean time in milliseconds of saves saves of a
+    storage holding count places, one of them changed before each"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        storage = FileStorage(os.path.join(tmp, "file.json"),
+                              journal=journal, durability=durability)
+        places = []
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.price_by_night = i
+            storage.new(place)
+            places.append(place)
+        storage.save()
+        start = time.perf_counter()
+        for i in range(saves):
+            places[i % count].price_by_night += 1
+            storage.mark_dirty(places[i % count])
+            storage.save()
+        return (time.perf_counter() - start) * 1000 / saves
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main(count=1000, saves=50):
+    """This prints the timings as a table"""
+
+    print(f"{count} objects, mean of {saves} saves")
+    print(f"{'durability':<12}{'snapshot ms':>14}{'journal ms':>14}")
+    for durability in DURABILITY_LEVELS:
+        snapshot = time_saves(durability, count, saves, False)
+        journal = time_saves(durability, count, saves, True)
+        print(f"{durability:<12}{snapshot:>14.3f}{journal:>14.3f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""
+This script times the construction of the objects read by reload():
+through __init__(**kwargs) against BaseModel.from_dict(), and a whole
+FileStorage.reload(). Run it from the root of the repository:
+
+    python3 -m benchmarks.reload [number of objects]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from models.engine.file_storage import FileStorage
+from models.engine.serializers import load_file
+from models.place import Place
+
+
+def main(count=20000):
+    """This prints the timings"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "file.json")
+        storage = FileStorage(path)
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.description = "A quiet room near the park"
+            place.price_by_night = i % 300
+            storage.new(place)
+        storage.save()
+
+        print(f"{count} places")
+        for name, build in [("__init__(**kwargs)",
+                             lambda dic: Place(**dic)),
+                            ("from_dict()", Place.from_dict)]:
+            dicts = [value for key, value in load_file(path)]
+            start = time.perf_counter()
+            for dic in dicts:
+                build(dic)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<20}{elapsed * 1000:>10.1f} ms")
+
+        start = time.perf_counter()
+        FileStorage(path).reload()
+        elapsed = time.perf_counter() - start
+        print(f"{'reload()':<20}{elapsed * 1000:>10.1f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+This script measures with tracemalloc the memory a full save of
+FileStorage allocates on top of the objects: encoding the whole store
+at once with json.dumps, as save() used to, against the streaming
+save with and without the fragment cache. Run it from the root of the
+repository:
+
+    python3 -m benchmarks.save_memory [number of objects]
+"""
+
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def peak_kib(save):
+    """This returns the peak in KiB of the memory allocated by save()"""
+
+    tracemalloc.start()
+    try:
+        save()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(count=20000):
+    """This prints the measures"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        # each save writes its own file, so that no storage finds the
+        # file changed by another and merges it before saving
+        path = os.path.join(tmp, "file.json")
+        storages = {cache: FileStorage(os.path.join(tmp, f"{cache}.json"),
+                                       cache_fragments=cache)
+                    for cache in (True, False)}
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.description = "A quiet room near the park"
+            for storage in storages.values():
+                storage.new(place)
+
+        def whole():
+            """encodes the store in one string, then writes it"""
+            objs = storages[False].all().copy()
+            for key, value in objs.items():
+                objs[key] = value.to_dict()
+            with open(path, mode="w", encoding="utf-8") as f:
+                f.write(json.dumps(objs))
+
+        print(f"{count} places, file of "
+              f"{(whole(), os.path.getsize(path))[1] / 1024:.0f} KiB")
+        print(f"json.dumps of the whole store  {peak_kib(whole):>8.0f} KiB")
+        print(f"streaming, fragment cache      "
+              f"{peak_kib(storages[True].save):>8.0f} KiB")
+        print(f"streaming, no fragment cache   "
+              f"{peak_kib(storages[False].save):>8.0f} KiB")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+This script compares the serializers of FileStorage: the size of the
+file, the time of a full save and the time of a reload. Run it from
+the root of the repository:
+
+    python3 -m benchmarks.serializers [number of objects]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from models.engine.file_storage import FileStorage
+from models.engine.serializers import SERIALIZERS, load_file
+from models.place import Place
+
+
+def main(count=20000):
+    """This prints the measures as a table"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        places = []
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.description = "A quiet room near the park"
+            place.price_by_night = i % 300
+            place.latitude = 37.0 + i / count
+            place.amenity_ids = ["wifi", "kitchen"]
+            places.append(place)
+
+        print(f"{count} places")
+        print(f"{'serializer':<12}{'size KiB':>10}{'save ms':>10}"
+              f"{'decode ms':>11}{'reload ms':>11}")
+        for name in SERIALIZERS:
+            path = os.path.join(tmp, "file." + name)
+            storage = FileStorage(path, serializer=name,
+                                  durability="none")
+            for place in places:
+                storage.new(place)
+            start = time.perf_counter()
+            storage.save()
+            save = time.perf_counter() - start
+            start = time.perf_counter()
+            for pair in load_file(path):
+                pass
+            decode = time.perf_counter() - start
+            start = time.perf_counter()
+            FileStorage(path).reload()
+            reload = time.perf_counter() - start
+            print(f"{name:<12}{os.path.getsize(path) / 1024:>10.0f}"
+                  f"{save * 1000:>10.1f}{decode * 1000:>11.1f}"
+                  f"{reload * 1000:>11.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
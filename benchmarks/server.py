@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+This script times the console on a store of a given size, reading the
+file itself against asking a storage server (models/engine/server.py)
+that already holds the objects. Run it from the root of the
+repository:
+
+    python3 -m benchmarks.server [number of objects]
+"""
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.startup import ROOT, run
+from models.engine.client_storage import ClientStorage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def main(count=20000):
+    """This prints the timings"""
+
+    tmp = tempfile.mkdtemp()
+    server = None
+    try:
+        path = os.path.join(tmp, "file.json")
+        socket_path = os.path.join(tmp, "hbnb.sock")
+        storage = FileStorage(path)
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            storage.new(place)
+        storage.save()
+        ide = place.id
+
+        env = dict(os.environ, HBNB_FILE_PATH=path,
+                   HBNB_SOCKET_PATH=socket_path)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "models.engine.server"], cwd=ROOT,
+            env=env)
+        client = ClientStorage(socket_path)
+        while True:
+            try:
+                client.count()
+                break
+            except OSError:
+                time.sleep(0.05)
+        client.close()
+
+        print(f"{count} places")
+        for label, storage_type in [("file", None), ("server", "client")]:
+            console_env = dict(env)
+            if storage_type is not None:
+                console_env["HBNB_TYPE_STORAGE"] = storage_type
+            print(label)
+            for name, commands in [
+                    ("count Place", "count Place\nquit\n"),
+                    ("show Place <id>", f"show Place {ide}\nquit\n"),
+                    ("create Place", "create Place\nquit\n"),
+                    ("all Place", "all Place\nquit\n")]:
+                print(f"  {name:<18}{run(commands, console_env):>10.1f} ms")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
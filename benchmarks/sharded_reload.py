@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+This script times reload() of a sharded FileStorage on stores of
+several sizes: decoding the shards in this process against decoding
+them with a pool of processes, and with the default, which only
+starts the pool from PARALLEL_LOAD_BYTES of shards on. Run it from the
+root of the repository:
+
+    python3 -m benchmarks.sharded_reload [largest number of objects]
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+from models.amenity import Amenity
+from models.city import City
+from models.engine import file_storage
+from models.engine.file_storage import FileStorage
+from models.place import Place
+from models.review import Review
+from models.user import User
+
+
+CLASSES = (Place, User, City, Review, Amenity)
+
+
+def best_ms(reload, repeat=3):
+    """This returns the best time in milliseconds of reload()"""
+
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        reload()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(largest=100000):
+    """This prints the timings"""
+
+    cpus = os.cpu_count() or 1
+    # two processes at least, so that the pool is used on one CPU
+    workers = max(cpus, 2)
+    print(f"{cpus} CPUs, pool from "
+          f"{file_storage.PARALLEL_LOAD_BYTES >> 20} MB of shards")
+    print(f"{'objects':>8}{'shards':>10}{'1 process':>12}"
+          f"{f'{workers} processes':>14}{'default':>10}")
+    count = 700
+    while count <= largest:
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "file.json")
+            storage = FileStorage(path, sharded=True)
+            for i in range(count):
+                obj = CLASSES[i % len(CLASSES)]()
+                obj.name = f"object {i}"
+                obj.text = "A quiet room near the park"
+                storage.new(obj)
+            storage.save()
+            size = sum(os.path.getsize(os.path.join(storage.shard_dir, n))
+                       for n in os.listdir(storage.shard_dir))
+            single = FileStorage(path, sharded=True, workers=1)
+            pooled = FileStorage(path, sharded=True, workers=workers)
+            default = FileStorage(path, sharded=True)
+            with patch.object(file_storage, "PARALLEL_LOAD_BYTES", 0):
+                pool_ms = best_ms(pooled.reload)
+            print(f"{count:>8}{size / (1 << 20):>8.1f}MB"
+                  f"{best_ms(single.reload):>9.0f} ms"
+                  f"{pool_ms:>11.0f} ms{best_ms(default.reload):>7.0f} ms")
+        finally:
+            shutil.rmtree(tmp)
+        count *= 5
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""
+This script times the console on a store of a given size: starting and
+quitting, counting the objects of a class and showing one object,
+with and without the keys index, against reading the whole store.
+Run it from the root of the repository:
+
+    python3 -m benchmarks.startup [number of objects]
+"""
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(commands, env, repeat=3):
+    """This returns the best time in milliseconds of the console
+    running commands"""
+
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "console.py")],
+                       input=commands, env=env, capture_output=True,
+                       text=True, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count=20000):
+    """This prints the timings"""
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "file.json")
+        storage = FileStorage(path, keys_index=True)
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            storage.new(place)
+        storage.save()
+        ide = place.id
+
+        print(f"{count} places")
+        for keys in ("0", "1"):
+            env = dict(os.environ, HBNB_FILE_PATH=path,
+                       HBNB_FILE_KEYS_INDEX=keys)
+            label = "keys index" if keys == "1" else "no keys index"
+            print(label)
+            for name, commands in [
+                    ("quit", "quit\n"),
+                    ("count Place", "count Place\nquit\n"),
+                    ("show Place <id>", f"show Place {ide}\nquit\n"),
+                    ("all Place", "all Place\nquit\n")]:
+                print(f"  {name:<18}{run(commands, env):>10.1f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
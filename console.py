@@ -9,15 +9,9 @@ import ast
 import re
 import cmd
 import sys
-from models.base_model import BaseModel
-from models.user import User
-from models.state import State
-from models.amenity import Amenity
-from models.city import City
-from models.review import Review
-from models.place import Place
 from models import storage
-CLASSES = dir()
+from models.engine.registry import MODELS, load_models
+load_models()
 
 
 class HBNBCommand(cmd.Cmd):
@@ -115,15 +109,8 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
             return
         class_name = line
-        num = 0
-        if class_name in CLASSES:
-            objs = storage.all()
-            for keys in objs:
-                if class_name in keys:
-                    num += 1
-                else:
-                    continue
-            print(num)
+        if class_name in MODELS:
+            print(storage.count(class_name))
         else:
             print("** class doesn't exist **")
 
@@ -134,8 +121,8 @@ class HBNBCommand(cmd.Cmd):
             print("** class name missing **")
             return
         class_name = line
-        if class_name in CLASSES:
-            klass = globals()[class_name]
+        if class_name in MODELS:
+            klass = MODELS[class_name]
             instance = klass()
             instance.save()
             print(instance.id)
@@ -149,7 +136,7 @@ class HBNBCommand(cmd.Cmd):
         if len(args) == 0:
             print("** class name missing **")
             return
-        if args[0] in CLASSES:
+        if args[0] in MODELS:
             if len(args) == 1:
                 print("** instance id missing **")
                 return
@@ -157,10 +144,8 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
             return
         class_name, instance_id = args
-        key = class_name + "." + instance_id
-        all_objs = storage.all()
-        if key in all_objs:
-            obj = all_objs[key]
+        obj = storage.get(class_name, instance_id)
+        if obj is not None:
             print(obj)
         else:
             print("** no instance found **")
@@ -171,7 +156,7 @@ class HBNBCommand(cmd.Cmd):
         if len(args) == 0:
             print("** class name missing **")
             return
-        if args[0] in CLASSES:
+        if args[0] in MODELS:
             if len(args) == 1:
                 print("** instance id missing **")
                 return
@@ -179,10 +164,9 @@ class HBNBCommand(cmd.Cmd):
             print("** class doesn't exist **")
             return
         class_name, instance_id = args
-        key = class_name + "." + instance_id
-        all_objs = storage.all()
-        if key in all_objs:
-            del (all_objs[key])
+        obj = storage.get(class_name, instance_id)
+        if obj is not None:
+            storage.delete(obj)
             storage.save()
         else:
             print("** no instance found **")
@@ -192,39 +176,54 @@ class HBNBCommand(cmd.Cmd):
         based or not on the class name."""
         args = line.split()
         objs_list = []
-        all_objs = storage.all()
         if len(args) == 0:
-            for key in all_objs.keys():
-                obj = all_objs[key]
-                objs_list.append(obj.__str__())
+            # other threads, the flusher thread merging the changes of
+            # other processes for one, wait until the objects are read
+            with storage.reading():
+                all_objs = storage.all()
+                for key in all_objs.keys():
+                    obj = all_objs[key]
+                    objs_list.append(obj.__str__())
         elif len(args) == 1:
             class_name = args[0]
-            if class_name in CLASSES:
-                for key in all_objs.keys():
-                    if class_name in key:
-                        obj = all_objs[key]
+            if class_name in MODELS:
+                with storage.reading():
+                    for obj in storage.all(class_name).values():
                         objs_list.append(obj.__str__())
-                    else:
-                        continue
             else:
                 print("** class doesn't exist **")
                 return
         print(objs_list)
 
+    def do_search(self, line):
+        """Prints the string representation of the instances of
+        a class best matching the given words, best first"""
+        args = line.split()
+        if len(args) == 0:
+            print("** class name missing **")
+            return
+        if args[0] not in MODELS:
+            print("** class doesn't exist **")
+            return
+        if len(args) == 1:
+            print("** search words missing **")
+            return
+        objs = storage.search(args[0], " ".join(args[1:]))
+        print([obj.__str__() for obj in objs])
+
     def do_update(self, line):
         """Updates an instance based on the class name and
  id by adding or updating attribute"""
         args = line.split()
-        all_objs = storage.all()
         if len(args) == 0:
             print("** class name missing **")
             return 1
-        if args[0] in CLASSES:
+        if args[0] in MODELS:
             if len(args) == 1:
                 print("** instance id missing **")
                 return 1
-            key = args[0] + "." + args[1]
-            if key not in all_objs:
+            obj = storage.get(args[0], args[1])
+            if obj is None:
                 print("** no instance found **")
                 return 1
             if len(args) == 2:
@@ -236,16 +235,13 @@ class HBNBCommand(cmd.Cmd):
         else:
             print("** class doesn't exist **")
             return 1
-        class_name = args[0]
-        instance_id = args[1]
         attr_name = args[2]
         if "\"" in args[3]:
             value = args[3].replace("\"", "")
         else:
             value = args[3]
-        key = class_name + "." + instance_id
-        obj = all_objs[key]
-        if attr_name in type(obj).__dict__:
+        if attr_name in type(obj).__dict__ and \
+                not hasattr(type(obj).__dict__[attr_name], "__set__"):
             attr_type = type(type(obj).__dict__[attr_name])
             attr_val = attr_type(value)
         else:
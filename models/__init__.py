@@ -1,5 +1,27 @@
+import os
 from models.engine.file_storage import FileStorage
 
 
-storage = FileStorage()
-storage.reload()
+if os.getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(os.getenv("HBNB_DB_PATH", "hbnb.db"))
+elif os.getenv("HBNB_TYPE_STORAGE") == "client":
+    from models.engine.client_storage import ClientStorage
+    storage = ClientStorage(os.getenv("HBNB_SOCKET_PATH", "hbnb.sock"))
+else:
+    flush_ms = os.getenv("HBNB_FILE_FLUSH_MS")
+    level = os.getenv("HBNB_FILE_COMPRESSION_LEVEL")
+    resident = os.getenv("HBNB_FILE_MAX_RESIDENT")
+    storage = FileStorage(
+        os.getenv("HBNB_FILE_PATH"),
+        journal=os.getenv("HBNB_FILE_JOURNAL", "0") != "0",
+        sharded=os.getenv("HBNB_FILE_SHARDED", "0") != "0",
+        flush_interval=None if flush_ms is None else int(flush_ms) / 1000,
+        flush_changes=int(os.getenv("HBNB_FILE_FLUSH_CHANGES", "100")),
+        durability=os.getenv("HBNB_FILE_DURABILITY", "flush"),
+        serializer=os.getenv("HBNB_FILE_FORMAT"),
+        compression=os.getenv("HBNB_FILE_COMPRESSION"),
+        compression_level=None if level is None else int(level),
+        cache_fragments=os.getenv("HBNB_FILE_FRAGMENT_CACHE", "0") != "0",
+        keys_index=os.getenv("HBNB_FILE_KEYS_INDEX", "0") != "0",
+        max_resident=None if resident is None else int(resident))
@@ -9,11 +9,58 @@ that defines all common attributes/methods for other classes
 from datetime import datetime
 import uuid
 from models import storage
+from models.engine.batch import UNSET
+from models.engine.registry import notify_changed, register
+
+
+class LazyDatetime(object):
+    """Defines a descriptor for the datetime attributes of BaseModel.
+    An instance may hold the ISO string of the datetime instead of the
+    datetime itself, as it does after a reload; the string is parsed
+    the first time the attribute is read"""
+
+    def __set_name__(self, owner, name):
+        """records the name of the attribute"""
+
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        """returns the datetime, parsing the ISO string the instance
+        holds if needed. A string that is not ISO is returned as is"""
+
+        if obj is None:
+            return self
+        try:
+            value = obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return value
+            obj.__dict__[self.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        """sets the datetime, or its ISO string"""
+
+        obj.__dict__[self.name] = value
 
 
 class BaseModel(object):
     """Defines the class BaseModel that will serve as parent class"""
 
+    created_at = LazyDatetime()
+    updated_at = LazyDatetime()
+
+    def __init_subclass__(cls, **kwargs):
+        """adds every model class to the registry of
+        models/engine/registry.py"""
+
+        super().__init_subclass__(**kwargs)
+        register(cls)
+
     def __init__(self, *args, **kwargs):
         """creates a new instance of BaseModel"""
 
@@ -21,8 +68,6 @@ class BaseModel(object):
             for key, value in kwargs.items():
                 if key == "__class__":
                     continue
-                elif key == "created_at" or key == "updated_at":
-                    setattr(self, key, datetime.fromisoformat(value))
                 else:
                     setattr(self, key, value)
         else:
@@ -31,6 +76,27 @@ class BaseModel(object):
             self.updated_at = datetime.today()
             storage.new(self)
 
+    @classmethod
+    def from_dict(cls, dic):
+        """creates an instance from dic, a dictionary returned by
+        to_dict(), without going through __init__ and __setattr__.
+        dic is taken over by the instance as its __dict__, and the
+        datetimes are only parsed when they are read"""
+
+        obj = cls.__new__(cls)
+        dic.pop("__class__", None)
+        object.__setattr__(obj, "__dict__", dic)
+        return obj
+
+    def __setattr__(self, name, value):
+        """sets the attribute and flags the instance as changed
+        in every storage holding it, so that they serialize it again
+        on the next save"""
+
+        old = self.__dict__.get(name, UNSET)
+        super().__setattr__(name, value)
+        notify_changed(self, name, old)
+
     def save(self):
         """updates the public instance attribute updated_at
         with the current datetime"""
@@ -46,9 +112,13 @@ class BaseModel(object):
         # the original self.__dict__ that will be used in creating
         # the __str__() method
 
+        # The datetimes that were never read are still the ISO strings
+        # they were loaded from, which are kept as they are
+
         dic = self.__dict__.copy()
-        dic['updated_at'] = self.updated_at.isoformat()
-        dic['created_at'] = self.created_at.isoformat()
+        for name in ('updated_at', 'created_at'):
+            if not isinstance(dic[name], str):
+                dic[name] = dic[name].isoformat()
         dic['__class__'] = type(self).__name__
         return dic
 
@@ -60,4 +130,12 @@ class BaseModel(object):
         # __class__ and the datetime in isoformat. This is the reason why
         # we have to preserve the self.__dict__
 
+        # The datetimes still held as ISO strings are parsed first
+        # so that they are shown as datetimes
+
+        for name in ('created_at', 'updated_at'):
+            getattr(self, name, None)
         return f"[{type(self).__name__}] ({self.id}) {self.__dict__}"
+
+
+register(BaseModel)
@@ -12,5 +12,7 @@ class City(BaseModel):
     """This is the City class that is a subclass of the
     BaseModel Class"""
 
+    __hash_indexes__ = ("state_id",)
+
     state_id = ""
     name = ""
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""
+This module contains the definition of the Batch class used by the
+storage engines for storage.batch(), a context in which saves are
+deferred until the end and in-memory changes are undone if an
+exception is raised:
+
+    with storage.batch():
+        for place in places:
+            place.price_by_night += 10
+            place.save()
+"""
+
+
+from contextlib import contextmanager
+import threading
+
+
+# The previous value recorded for an attribute that was not set
+UNSET = object()
+
+
+class Batch(threading.local):
+    """This is the Batch class. It counts the nested batches open on
+    a storage, remembers whether a save was asked for inside them and
+    keeps an undo log of the changes made to the objects meanwhile.
+    Each thread has its own state, so that a batch only defers the
+    saves and undoes the changes of the thread that opened it"""
+
+    def __init__(self, storage):
+        """Creates the batch state of storage, again in each thread
+        that uses it"""
+
+        self.storage = storage
+        self.depth = 0
+        self.pending = False
+        self.__undo = []
+        self.__replaying = False
+
+    def defer(self):
+        """This returns True, and records that a save is due, when a
+        batch is open. The storage then skips its save"""
+
+        if self.depth == 0:
+            return False
+        self.pending = True
+        return True
+
+    def changed(self, obj, name, old):
+        """This records that the attribute name of obj was old"""
+
+        if self.depth and not self.__replaying:
+            self.__undo.append(("attr", obj, name, old))
+
+    def added(self, obj, previous=None):
+        """This records that obj was added, replacing previous"""
+
+        if self.depth and not self.__replaying:
+            self.__undo.append(("new", obj, previous))
+
+    def deleted(self, obj):
+        """This records that obj was deleted"""
+
+        if self.depth and not self.__replaying:
+            self.__undo.append(("delete", obj))
+
+    @contextmanager
+    def run(self):
+        """This opens a batch. Leaving the outermost batch saves the
+        storage once if a save was asked for. When an exception
+        leaves a batch, the changes made inside it are undone"""
+
+        mark = len(self.__undo)
+        self.depth += 1
+        try:
+            yield self.storage
+        except BaseException:
+            self.rollback(mark)
+            raise
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.__undo = []
+        if self.depth == 0 and self.pending:
+            self.pending = False
+            self.storage.save()
+
+    def rollback(self, mark=0):
+        """This undoes the changes recorded after the first mark ones,
+        most recent first"""
+
+        self.__replaying = True
+        try:
+            while len(self.__undo) > mark:
+                entry = self.__undo.pop()
+                if entry[0] == "attr":
+                    obj, name, old = entry[1:]
+                    if old is UNSET:
+                        obj.__dict__.pop(name, None)
+                    else:
+                        obj.__dict__[name] = old
+                    self.storage.mark_dirty(obj)
+                elif entry[0] == "new":
+                    obj, previous = entry[1:]
+                    self.storage.delete(obj)
+                    if previous is not None:
+                        self.storage.new(previous)
+                else:
+                    self.storage.new(entry[1])
+        finally:
+            self.__replaying = False
+        if self.depth <= 1:
+            self.pending = False
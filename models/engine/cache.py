@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+"""
+This module contains the ObjectCache class, which FileStorage uses in
+place of its dictionary of objects when it is given a memory budget
+(max_resident). Only the objects used last are kept in memory, the
+others are written to a temporary backing file and read back when
+they are used again
+"""
+
+
+from collections import OrderedDict
+from collections.abc import ItemsView, MutableMapping, ValuesView
+import tempfile
+import threading
+import weakref
+from models.engine.serializers import get_serializer
+
+
+class ObjectCache(MutableMapping):
+    """This is the ObjectCache class. It maps the keys of the objects
+    to the objects like a dictionary, keeping at most max_resident of
+    them in memory, least recently used first out. An object evicted
+    while the program still holds it is found again through a map of
+    weak references, so that a key always gives the same object. The
+    backing file holds the records of the evicted objects, encoded
+    with the marshal serializer, and the place of each one is kept.
+    Looking an object up changes the order of use, so the cache has
+    its own lock and may be read from several threads at once"""
+
+    def __init__(self, max_resident, classes, directory=None):
+        """Creates an empty cache keeping max_resident objects in
+        memory. classes(class name) returns the class of the objects
+        read back, and the backing file is created in directory"""
+
+        if max_resident < 1:
+            raise ValueError("max_resident must be at least 1")
+        self.max_resident = max_resident
+        self.classes = classes
+        self.directory = directory
+        self.__order = {}
+        self.__resident = OrderedDict()
+        self.__weak = weakref.WeakValueDictionary()
+        self.__places = {}
+        self.__changed = set()
+        self.__file = None
+        self.__live_bytes = 0
+        self.__serializer = get_serializer("marshal")
+        self.__lock = threading.RLock()
+
+    @property
+    def resident(self):
+        """This returns the number of objects held in memory"""
+
+        return len(self.__resident)
+
+    def __len__(self):
+        """This returns the number of objects"""
+
+        return len(self.__order)
+
+    def __iter__(self):
+        """This iterates over the keys, in the order they were added"""
+
+        return iter(self.__order)
+
+    def __contains__(self, key):
+        """This tells whether there is an object under key, without
+        reading it"""
+
+        return key in self.__order
+
+    def __getitem__(self, key):
+        """This returns the object under key, reading it from the
+        backing file if it is neither in memory nor still alive"""
+
+        with self.__lock:
+            obj = self.__resident.get(key)
+            if obj is not None:
+                self.__resident.move_to_end(key)
+                return obj
+            obj = self.__weak.get(key)
+            if obj is None:
+                if key not in self.__order:
+                    raise KeyError(key)
+                obj = self.__read(key)
+                self.__weak[key] = obj
+            self.__resident[key] = obj
+            self.__evict()
+            return obj
+
+    def __setitem__(self, key, obj):
+        """This stores obj under key"""
+
+        with self.__lock:
+            self.__order[key] = None
+            self.__resident[key] = obj
+            self.__resident.move_to_end(key)
+            self.__weak[key] = obj
+            self.__changed.add(key)
+            self.__evict()
+
+    def __delitem__(self, key):
+        """This removes the object under key"""
+
+        with self.__lock:
+            del self.__order[key]
+            self.__resident.pop(key, None)
+            self.__weak.pop(key, None)
+            self.__changed.discard(key)
+            place = self.__places.pop(key, None)
+            if place is not None:
+                self.__live_bytes -= place[1]
+
+    def changed(self, key):
+        """This records that the object under key has changed, so that
+        it is written again to the backing file when it is evicted"""
+
+        with self.__lock:
+            if key in self.__order:
+                self.__changed.add(key)
+
+    def copy(self):
+        """This returns a view of the objects that does not change
+        when objects are added to or removed from the cache"""
+
+        with self.__lock:
+            return CacheView(self, dict.fromkeys(self.__order))
+
+    def close(self):
+        """This closes the backing file, which is then deleted, and
+        empties the cache"""
+
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+            self.__order.clear()
+            self.__resident.clear()
+            self.__weak.clear()
+            self.__places.clear()
+            self.__changed.clear()
+            self.__live_bytes = 0
+
+    def __evict(self):
+        """This moves the least recently used objects out of memory
+        until there are max_resident left"""
+
+        while len(self.__resident) > self.max_resident:
+            key, obj = self.__resident.popitem(last=False)
+            if key in self.__changed or key not in self.__places:
+                self.__write(key, obj)
+
+    def __write(self, key, obj):
+        """This appends the record of obj to the backing file"""
+
+        if self.__file is None:
+            self.__file = tempfile.TemporaryFile(dir=self.directory)
+        record = self.__serializer.fragment(key, obj.to_dict())
+        old = self.__places.get(key)
+        if old is not None:
+            self.__live_bytes -= old[1]
+        self.__file.seek(0, 2)
+        self.__places[key] = (self.__file.tell(), len(record))
+        self.__file.write(record)
+        self.__live_bytes += len(record)
+        self.__changed.discard(key)
+        if self.__file.tell() > 2 * self.__live_bytes + (1 << 20):
+            self.__rewrite()
+
+    def __read(self, key):
+        """This builds the object under key from its record"""
+
+        offset, length = self.__places[key]
+        self.__file.seek(offset)
+        key, value = self.__serializer.decode(self.__file.read(length))
+        return self.classes(key.split(".")[0]).from_dict(value)
+
+    def __rewrite(self):
+        """This copies the records in use to a new backing file,
+        dropping the records of the objects written again since"""
+
+        old = self.__file
+        self.__file = tempfile.TemporaryFile(dir=self.directory)
+        places = {}
+        for key, (offset, length) in self.__places.items():
+            old.seek(offset)
+            places[key] = (self.__file.tell(), length)
+            self.__file.write(old.read(length))
+        old.close()
+        self.__places = places
+
+
+class CacheView(MutableMapping):
+    """This is the CacheView class. It holds keys, those of the
+    objects of one class for example, in the order they were added,
+    and looks their objects up in an ObjectCache. The keys whose
+    objects were removed from the cache since, by a copy kept while
+    the storage changes for example, are skipped"""
+
+    def __init__(self, cache, members=None):
+        """Creates a view of the objects of cache stored under the
+        keys of the dictionary members"""
+
+        self.cache = cache
+        self.members = {} if members is None else members
+
+    def __len__(self):
+        """This returns the number of keys"""
+
+        return len(self.members)
+
+    def __iter__(self):
+        """This iterates over the keys whose objects are in the cache"""
+
+        cache = self.cache
+        return (key for key in list(self.members) if key in cache)
+
+    def __contains__(self, key):
+        """This tells whether key is in the view"""
+
+        return key in self.members
+
+    def __getitem__(self, key):
+        """This returns the object under key"""
+
+        if key not in self.members:
+            raise KeyError(key)
+        return self.cache[key]
+
+    def __setitem__(self, key, obj):
+        """This adds key to the view, obj being stored in the cache"""
+
+        self.members[key] = None
+
+    def __delitem__(self, key):
+        """This removes key from the view"""
+
+        del self.members[key]
+
+    def pop(self, key, *default):
+        """This removes key from the view without reading its object,
+        and returns None"""
+
+        if key in self.members:
+            del self.members[key]
+            return None
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def copy(self):
+        """This returns a view of the same objects that does not change
+        when objects are added to or removed from this one"""
+
+        return CacheView(self.cache, dict(self.members))
+
+    def values(self):
+        """This returns a view of the objects"""
+
+        return _Values(self)
+
+    def items(self):
+        """This returns a view of the (key, object) pairs"""
+
+        return _Items(self)
+
+
+class _Values(ValuesView):
+    """This is the view of the objects of a CacheView. An object
+    removed from the cache while the view is read is skipped"""
+
+    def __iter__(self):
+        """This iterates over the objects"""
+
+        for key in self._mapping:
+            obj = self._mapping.get(key)
+            if obj is not None:
+                yield obj
+
+
+class _Items(ItemsView):
+    """This is the view of the (key, object) pairs of a CacheView. An
+    object removed from the cache while the view is read is skipped"""
+
+    def __iter__(self):
+        """This iterates over the (key, object) pairs"""
+
+        for key in self._mapping:
+            obj = self._mapping.get(key)
+            if obj is not None:
+                yield key, obj
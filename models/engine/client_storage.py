@@ -0,0 +1,241 @@
+#!/usr/bin/python3
+"""
+This script contains the definition of the ClientStorage.
+This class offers the same methods as the FileStorage class on
+the objects of a storage server (models/engine/server.py), which
+it reaches over a Unix socket
+"""
+
+
+import builtins
+import contextlib
+from models.engine.batch import UNSET, Batch
+from models.engine.file_storage import class_name
+from models.engine.protocol import ConnectionPool
+from models.engine.query import Query
+from models.engine.registry import add_storage, get_model
+
+
+def remote_error(name, message):
+    """This returns the exception to raise for a request that raised
+    the exception of class name with message in the server"""
+
+    klass = getattr(builtins, name, None)
+    if isinstance(klass, type) and issubclass(klass, Exception):
+        return klass(message)
+    return RuntimeError(f"{name}: {message}")
+
+
+class ClientStorage(object):
+    """This is the ClientStorage class.
+    The objects are held by the server, the client keeps the objects
+    it was sent so that a key stays the same object while the server
+    does not change it. The objects created, changed or deleted here
+    are sent to the server with the next request, in the same round
+    trip, and save() has the server save them"""
+
+    def __init__(self, socket_path="hbnb.sock", pool_size=4):
+        """Creates a new storage using the server listening at
+        socket_path, through up to pool_size idle connections"""
+
+        self.socket_path = socket_path
+        self.__pool = ConnectionPool(socket_path, pool_size)
+        self.__objects = {}
+        self.__pending = set()
+        self.__batch = Batch(self)
+        add_storage(self)
+
+    def all(self, cls=None):
+        """This returns a dictionary containing all objects, or only
+        the objects of cls (a class or a class name) when it is given"""
+
+        if cls is not None:
+            objs = self.__build(self.__call("all", class_name(cls)))
+            return {f"{type(obj).__name__}.{obj.id}": obj for obj in objs}
+        objs = self.__build(self.__call("all"))
+        self.__objects = {f"{type(obj).__name__}.{obj.id}": obj
+                          for obj in objs}
+        return self.__objects
+
+    def count(self, cls=None):
+        """This returns the number of objects, or the number of
+        objects of cls when it is given"""
+
+        return self.__call("count", None if cls is None else class_name(cls))
+
+    def get(self, cls, ide):
+        """This returns the object of cls (a class or a class name)
+        with the id ide, or None if there is none"""
+
+        key = f'{class_name(cls)}.{ide}'
+        dic = self.__call("get", class_name(cls), ide)
+        if dic is None:
+            self.__objects.pop(key, None)
+            return None
+        return self.__build([(key, dic)])[0]
+
+    def find(self, cls, **attrs):
+        """This returns the list of objects of cls whose attributes
+        equal the values given as keyword arguments"""
+
+        return self.__build(self.__call("find", class_name(cls), attrs))
+
+    def find_range(self, cls, attr, low=None, high=None, reverse=False):
+        """This yields the objects of cls whose attribute attr is a
+        number between low and high (both included, None meaning no
+        bound) in increasing order of attr, or decreasing if reverse
+        is True"""
+
+        return iter(self.__build(self.__call(
+            "find_range", class_name(cls), attr, low, high, reverse)))
+
+    def near(self, cls, latitude, longitude, radius_km):
+        """This returns the list of objects of cls at most radius_km
+        kilometres away from (latitude, longitude), nearest first"""
+
+        return self.__build(self.__call("near", class_name(cls), latitude,
+                                        longitude, radius_km))
+
+    def nearest(self, cls, latitude, longitude, k=1):
+        """This returns the list of the k objects of cls nearest to
+        (latitude, longitude), nearest first"""
+
+        return self.__build(self.__call("nearest", class_name(cls),
+                                        latitude, longitude, k))
+
+    def search(self, cls, query, limit=10):
+        """This returns the list of the limit objects of cls best
+        matching the words of query, best first"""
+
+        return self.__build(self.__call("search", class_name(cls), query,
+                                        limit))
+
+    def query(self, cls):
+        """This returns a Query on the objects of cls, see
+        models/engine/query.py"""
+
+        return Query(self, cls)
+
+    def reading(self):
+        """This returns a context for reading several objects together.
+        The objects are copies of those of the server, so there is
+        nothing to hold"""
+
+        return contextlib.nullcontext()
+
+    def index(self, cls, kind, attr=None):
+        """This returns None as the indexes are in the server, queries
+        read the objects of the class instead"""
+
+        return None
+
+    def new(self, obj):
+        """This adds obj to the storage"""
+
+        key = f'{type(obj).__name__}.{obj.id}'
+        previous = self.__objects.get(key)
+        self.__objects[key] = obj
+        self.__pending.add(key)
+        if previous is not obj:
+            self.__batch.added(obj, previous)
+
+    def delete(self, obj=None):
+        """This removes obj from the storage if it is inside"""
+
+        if obj is None:
+            return
+        key = f'{type(obj).__name__}.{obj.id}'
+        self.__objects.pop(key, None)
+        self.__batch.deleted(obj)
+        self.__pending.add(key)
+
+    def mark_dirty(self, obj, name=None, old=UNSET):
+        """This records that obj has changed since it was last sent to
+        the server, the attribute name having been old"""
+
+        ide = obj.__dict__.get("id")
+        if ide is None:
+            return
+        key = f'{type(obj).__name__}.{ide}'
+        if self.__objects.get(key) is obj:
+            self.__pending.add(key)
+            if name is not None:
+                self.__batch.changed(obj, name, old)
+
+    def batch(self):
+        """This returns a context in which saves are deferred until
+        it is left, see models/engine/batch.py"""
+
+        return self.__batch.run()
+
+    def save(self):
+        """This sends the changes to the server and has it save them"""
+
+        if self.__batch.defer():
+            return
+        self.__call("save")
+
+    def reload(self):
+        """This forgets the objects that were sent by the server and
+        the changes not sent yet"""
+
+        self.__objects = {}
+        self.__pending.clear()
+
+    def close(self):
+        """This closes the connections to the server"""
+
+        self.__pool.close()
+
+    def classes(self, c_name):
+        """This will return the class of the class name that
+        is passed, see models/engine/registry.py"""
+
+        return get_model(c_name)
+
+    def __call(self, method, *args):
+        """This sends the request for method with args to the server,
+        after the changes not sent yet, in one pipeline, and returns
+        its result"""
+
+        pending, self.__pending = self.__pending, set()
+        requests = []
+        for key in pending:
+            obj = self.__objects.get(key)
+            if obj is None:
+                requests.append(("delete", (key,)))
+            else:
+                requests.append(("put", (key, obj.to_dict())))
+        requests.append((method, args))
+        try:
+            with self.__pool.connection() as conn:
+                responses = conn.pipeline(requests)
+        except BaseException:
+            self.__pending |= pending
+            raise
+        for ok, result in responses[:-1]:
+            if not ok:
+                self.__pending |= pending
+                raise remote_error(*result)
+        ok, result = responses[-1]
+        if not ok:
+            raise remote_error(*result)
+        return result
+
+    def __build(self, pairs):
+        """This returns the objects of the (key, dictionary) pairs sent
+        by the server. The object already held for a key is kept,
+        updated in place if the server changed it"""
+
+        objs = []
+        for key, dic in pairs:
+            obj = self.__objects.get(key)
+            if obj is None:
+                obj = self.classes(key.split(".")[0]).from_dict(dic)
+                self.__objects[key] = obj
+            elif obj.to_dict() != dic:
+                dic.pop("__class__", None)
+                obj.__dict__.clear()
+                obj.__dict__.update(dic)
+            objs.append(obj)
+        return objs
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+"""
+This module contains the codecs FileStorage can compress its files
+with, all from the standard library:
+
+- zlib: the gzip format (zlib data with a header), suffix .gz
+- bz2: suffix .bz2
+- lzma: the xz format, suffix .xz
+
+Compressed files are recognized by their first bytes, so a file is
+read back whatever codec wrote it, and decompressed as a stream
+"""
+
+
+import bz2
+import gzip
+import lzma
+
+
+class Codec(object):
+    """This is the Codec class. It opens a compressed stream over a
+    file"""
+
+    def __init__(self, name, suffix, magic, opener, level_arg,
+                 default_level):
+        """Creates a codec whose files end with suffix and start with
+        magic. opener(file, mode, **{level_arg: level}) returns the
+        stream, file being a path or a binary file object"""
+
+        self.name = name
+        self.suffix = suffix
+        self.magic = magic
+        self.opener = opener
+        self.level_arg = level_arg
+        self.default_level = default_level
+
+    def open(self, file, mode="rb", level=None):
+        """This returns a stream compressing to, or decompressing from,
+        file, a path or a binary file object which is then left open
+        when the stream is closed. level is the compression level of
+        the codec, default_level if None"""
+
+        if mode == "rb":
+            return self.opener(file, mode)
+        if level is None:
+            level = self.default_level
+        return self.opener(file, mode, **{self.level_arg: level})
+
+
+def _open_gzip(file, mode, **kwargs):
+    """opens a gzip stream, written without a name or a time so that
+    the same objects always compress to the same bytes"""
+    if isinstance(file, str):
+        return gzip.GzipFile(file, mode, **kwargs)
+    return gzip.GzipFile(fileobj=file, mode=mode, filename="", mtime=0,
+                         **kwargs)
+
+
+CODECS = {codec.name: codec for codec in (
+    Codec("zlib", ".gz", b"\x1f\x8b", _open_gzip, "compresslevel", 6),
+    Codec("bz2", ".bz2", b"BZh", bz2.BZ2File, "compresslevel", 9),
+    Codec("lzma", ".xz", b"\xfd7zXZ\x00", lzma.LZMAFile, "preset", 6))}
+
+
+def get_codec(name):
+    """This returns the codec called name, or None for "none" """
+
+    if name is None or name == "none":
+        return None
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"unknown compression {name!r}") from None
+
+
+def codec_of_path(path):
+    """This returns the codec whose suffix ends path, or None"""
+
+    for codec in CODECS.values():
+        if path.endswith(codec.suffix):
+            return codec
+    return None
+
+
+def open_read(path):
+    """This opens the file at path for reading, decompressing it as
+    it is read if it starts like a compressed file"""
+
+    f = open(path, mode="rb")
+    start = f.read(max(len(codec.magic) for codec in CODECS.values()))
+    for codec in CODECS.values():
+        if start.startswith(codec.magic):
+            f.close()
+            return codec.open(path)
+    f.seek(0)
+    return f
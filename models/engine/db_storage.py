@@ -0,0 +1,325 @@
+#!/usr/bin/python3
+"""
+This script contains the definition of the DBStorage.
+This class stores the objects in a SQLite database and
+offers the same methods as the FileStorage class
+"""
+
+
+import contextlib
+import json
+from numbers import Real
+import sqlite3
+import weakref
+from models.engine.batch import UNSET, Batch
+from models.engine.file_storage import class_name
+from models.engine.indexes import TextIndex, distance_km, is_number
+from models.engine.query import Query
+from models.engine.registry import add_storage, get_model
+
+
+# The most keys looked up by one query, below the limit of SQLite on
+# the parameters of a statement
+MAX_PARAMETERS = 500
+
+
+class DBStorage(object):
+    """This is the DBStorage class.
+    Each object is a row of the objects table holding its key, its
+    class name and its dictionary as JSON. Rows are only read when
+    they are asked for and save() only writes the changed ones.
+    The objects read are only kept while the program holds them,
+    through weak references, so that a key stays the same object
+    without every row read staying in memory; the objects changed
+    and not saved yet are held until the next save"""
+
+    def __init__(self, db_path="hbnb.db"):
+        """Creates a new storage using the database at db_path"""
+
+        self.db_path = db_path
+        self.__conn = None
+        self.__objects = weakref.WeakValueDictionary()
+        self.__dirty = {}
+        self.__deleted = set()
+        self.__batch = Batch(self)
+        add_storage(self)
+
+    def all(self, cls=None):
+        """This returns a dictionary containing all objects, or only
+        the objects of cls (a class or a class name) when it is given"""
+
+        if cls is not None:
+            return self.__all_of(class_name(cls))
+        rows = self.__connect().execute(
+            "SELECT key, class, data FROM objects")
+        objs = {key: self.__held(key, c_name, data)
+                for key, c_name, data in rows
+                if key not in self.__deleted}
+        # the objects created and not saved yet
+        objs.update(self.__dirty)
+        return objs
+
+    def count(self, cls=None):
+        """This returns the number of objects, or the number of
+        objects of cls when it is given. The rows are counted by the
+        database, then the objects created or deleted and not saved
+        yet are taken into account"""
+
+        if cls is None:
+            prefix = ""
+            row = self.__connect().execute(
+                "SELECT COUNT(*) FROM objects").fetchone()
+        else:
+            prefix = class_name(cls) + "."
+            row = self.__connect().execute(
+                "SELECT COUNT(*) FROM objects WHERE class = ?",
+                (class_name(cls),)).fetchone()
+        created = [key for key in self.__dirty if key.startswith(prefix)]
+        deleted = [key for key in self.__deleted if key.startswith(prefix)]
+        stored = self.__stored(created + deleted)
+        return (row[0] + sum(key not in stored for key in created)
+                - sum(key in stored for key in deleted))
+
+    def find(self, cls, **attrs):
+        """This returns the list of objects of cls whose attributes
+        equal the values given as keyword arguments"""
+
+        return [obj for obj in self.all(cls).values()
+                if all(getattr(obj, attr, None) == value
+                       for attr, value in attrs.items())]
+
+    def find_range(self, cls, attr, low=None, high=None, reverse=False):
+        """This yields the objects of cls whose attribute attr is a
+        number between low and high (both included, None meaning no
+        bound) in increasing order of attr, or decreasing if reverse
+        is True"""
+
+        objs = []
+        for obj in self.all(cls).values():
+            value = getattr(obj, attr, None)
+            if (is_number(value)
+                    and (low is None or value >= low)
+                    and (high is None or value <= high)):
+                objs.append(obj)
+        objs.sort(key=lambda obj: getattr(obj, attr), reverse=reverse)
+        return iter(objs)
+
+    def near(self, cls, latitude, longitude, radius_km):
+        """This returns the list of objects of cls at most radius_km
+        kilometres away from (latitude, longitude), nearest first"""
+
+        return [obj for dist, obj in self.__by_distance(cls, latitude,
+                                                        longitude)
+                if dist <= radius_km]
+
+    def nearest(self, cls, latitude, longitude, k=1):
+        """This returns the list of the k objects of cls nearest to
+        (latitude, longitude), nearest first"""
+
+        return [obj for dist, obj in
+                self.__by_distance(cls, latitude, longitude)[:k]]
+
+    def search(self, cls, query, limit=10):
+        """This returns the list of the limit objects of cls best
+        matching the words of query, best first"""
+
+        objs = self.all(cls)
+        index = TextIndex()
+        if objs:
+            obj = next(iter(objs.values()))
+            index = TextIndex(getattr(type(obj), "__text_index__", None))
+        for key, obj in objs.items():
+            index.add(key, obj)
+        return [obj for score, obj in index.search(query, limit)]
+
+    def query(self, cls):
+        """This returns a Query on the objects of cls, see
+        models/engine/query.py"""
+
+        return Query(self, cls)
+
+    def reading(self):
+        """This returns a context for reading several objects together.
+        The storage is used from one thread, so there is nothing to
+        hold"""
+
+        return contextlib.nullcontext()
+
+    def index(self, cls, kind, attr=None):
+        """This returns None as the objects kept in memory are not
+        indexed, queries read the rows of the class instead"""
+
+        return None
+
+    def get(self, cls, ide):
+        """This returns the object of cls (a class or a class name)
+        with the id ide, or None if there is none"""
+
+        key = f'{class_name(cls)}.{ide}'
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return obj
+        if key in self.__deleted:
+            return None
+        row = self.__connect().execute(
+            "SELECT class, data FROM objects WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return self.__held(key, *row)
+
+    def new(self, obj):
+        """This adds obj to the storage"""
+
+        key = f'{type(obj).__name__}.{obj.id}'
+        previous = self.__objects.get(key)
+        self.__objects[key] = obj
+        self.__dirty[key] = obj
+        self.__deleted.discard(key)
+        if previous is not obj:
+            self.__batch.added(obj, previous)
+
+    def delete(self, obj=None):
+        """This removes obj from the storage if it is inside"""
+
+        if obj is None:
+            return
+        key = f'{type(obj).__name__}.{obj.id}'
+        self.__objects.pop(key, None)
+        self.__batch.deleted(obj)
+        self.__dirty.pop(key, None)
+        self.__deleted.add(key)
+
+    def mark_dirty(self, obj, name=None, old=UNSET):
+        """This records that obj has changed since the last save,
+        the attribute name having been old"""
+
+        ide = obj.__dict__.get("id")
+        if ide is None:
+            return
+        key = f'{type(obj).__name__}.{ide}'
+        if self.__objects.get(key) is obj:
+            self.__dirty[key] = obj
+            if name is not None:
+                self.__batch.changed(obj, name, old)
+
+    def batch(self):
+        """This returns a context in which saves are deferred until
+        it is left and then written in one transaction, see
+        models/engine/batch.py"""
+
+        return self.__batch.run()
+
+    def save(self):
+        """This writes the objects changed since the last save
+        to the database"""
+
+        if self.__batch.defer():
+            return
+        conn = self.__connect()
+        rows = [(key, type(obj).__name__, json.dumps(obj.to_dict()))
+                for key, obj in self.__dirty.items()]
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO objects (key, class, data) "
+                "VALUES (?, ?, ?)", rows)
+            conn.executemany("DELETE FROM objects WHERE key = ?",
+                             [(key,) for key in self.__deleted])
+        self.__dirty.clear()
+        self.__deleted.clear()
+
+    def reload(self):
+        """This (re)opens the database and forgets the objects that
+        were loaded. Rows are read again when they are asked for"""
+
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+        self.__connect()
+        self.__objects = weakref.WeakValueDictionary()
+        self.__dirty.clear()
+        self.__deleted.clear()
+
+    def close(self):
+        """This closes the connection to the database"""
+
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    def classes(self, c_name):
+        """This will return the class of the class name that
+        is passed, see models/engine/registry.py"""
+
+        return get_model(c_name)
+
+    def __connect(self):
+        """This returns the connection, creating the table on
+        first use"""
+
+        if self.__conn is None:
+            self.__conn = sqlite3.connect(self.db_path)
+            self.__conn.execute("PRAGMA journal_mode=WAL")
+            self.__conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "key TEXT PRIMARY KEY, class TEXT NOT NULL, "
+                "data TEXT NOT NULL)")
+            self.__conn.execute(
+                "CREATE INDEX IF NOT EXISTS objects_class "
+                "ON objects (class)")
+        return self.__conn
+
+    def __all_of(self, c_name):
+        """This returns a dictionary of the objects of the class
+        named c_name, reading only their rows through the index"""
+
+        rows = self.__connect().execute(
+            "SELECT key, data FROM objects WHERE class = ?", (c_name,))
+        objs = {key: self.__held(key, c_name, data)
+                for key, data in rows
+                if key not in self.__deleted}
+        prefix = c_name + "."
+        objs.update((key, obj) for key, obj in self.__dirty.items()
+                    if key.startswith(prefix))
+        return objs
+
+    def __stored(self, keys):
+        """This returns the set of the keys of the list keys that have
+        a row in the table"""
+
+        stored = set()
+        for start in range(0, len(keys), MAX_PARAMETERS):
+            chunk = keys[start:start + MAX_PARAMETERS]
+            rows = self.__connect().execute(
+                "SELECT key FROM objects WHERE key IN ("
+                + ", ".join("?" * len(chunk)) + ")", chunk)
+            stored.update(key for key, in rows)
+        return stored
+
+    def __by_distance(self, cls, latitude, longitude):
+        """This returns the (distance, object) pairs of every object of
+        cls with a position, nearest first"""
+
+        found = []
+        for obj in self.all(cls).values():
+            lat = getattr(obj, "latitude", None)
+            lon = getattr(obj, "longitude", None)
+            if isinstance(lat, Real) and isinstance(lon, Real):
+                found.append((distance_km(latitude, longitude, lat, lon),
+                              obj))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def __held(self, key, c_name, data):
+        """This returns the object of key the program holds, or the
+        one built from its row, then kept while the program holds it"""
+
+        obj = self.__objects.get(key)
+        if obj is None:
+            obj = self.__objects[key] = self.__build(c_name, data)
+        return obj
+
+    def __build(self, c_name, data):
+        """This creates an object from a row of the table"""
+
+        return self.classes(c_name).from_dict(json.loads(data))
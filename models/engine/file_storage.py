@@ -6,8 +6,154 @@ objects and also their coonversion into JSON
 """
 
 
+import atexit
+import io
 import json
+from numbers import Real
 import os
+import secrets
+import threading
+from models.engine.batch import UNSET, Batch
+from models.engine.cache import CacheView, ObjectCache
+from models.engine.compression import CODECS, codec_of_path, get_codec
+from models.engine.compression import open_read
+from models.engine.filelock import FileLock
+from models.engine.flusher import Flusher
+from models.engine.indexes import TextIndex, build_indexes, distance_km
+from models.engine.indexes import is_number
+from models.engine.query import Query
+from models.engine.registry import add_storage, get_model
+from models.engine.rwlock import RWLock
+from models.engine.serializers import SERIALIZERS, detect, get_serializer
+from models.engine.serializers import iter_json_objects, load_file
+
+
+def class_name(cls):
+    """This returns the name of cls, which is either a class or
+    already the name of one"""
+
+    return cls if isinstance(cls, str) else cls.__name__
+
+
+# The durability levels of the writes, from the fastest to the safest:
+# "none" rewrites the file in place, "flush" writes a temporary file
+# and renames it over the file, "fsync" also syncs the temporary file
+# to disk before the rename and "fsync_dir" then syncs the directory
+# so that the rename itself survives a power loss
+DURABILITY_LEVELS = ("none", "flush", "fsync", "fsync_dir")
+
+# The size of the buffer the files are written through
+WRITE_BUFFER_SIZE = 1 << 16
+
+# The total size of the shards from which reload() decodes them with
+# a pool of processes. Below it, starting the pool and sending the
+# objects back to this process take longer than decoding them here,
+# see benchmarks/sharded_reload.py
+PARALLEL_LOAD_BYTES = 4 << 20
+
+
+def fsync_dir(path):
+    """This syncs the directory holding path to disk"""
+
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def create_temp(path):
+    """This creates a new temporary file next to the file at path and
+    returns its descriptor and path. The file is created with mode
+    0o666 so that the umask of the process applies to it as to any new
+    file; the umask is never changed, as other threads may be creating
+    files"""
+
+    while True:
+        tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        try:
+            return (os.open(tmp_path,
+                            os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666),
+                    tmp_path)
+        except FileExistsError:
+            continue
+
+
+def write_file(path, data, durability="flush", codec=None, level=None):
+    """This writes data to the file at path, compressed with codec (see
+    models/engine/compression.py) at level if it is given. data is
+    text, bytes or an iterable of bytes written one after the other
+    through a buffer, so that the content is never whole in memory.
+    Unless durability is "none", data is written to a temporary file
+    in the same directory which then replaces the file at once, so
+    that a crash leaves either the old or the new file. The temporary
+    file is given the permissions of the file it replaces, if there is
+    one, see create_temp()"""
+
+    if durability not in DURABILITY_LEVELS:
+        raise ValueError(f"unknown durability {durability!r}")
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, bytes):
+        data = (data,)
+
+    def write(f):
+        """writes data to the binary file f"""
+        if codec is None:
+            for chunk in data:
+                f.write(chunk)
+        else:
+            with codec.open(f, "wb", level) as stream:
+                buffered = io.BufferedWriter(stream, WRITE_BUFFER_SIZE)
+                for chunk in data:
+                    buffered.write(chunk)
+                buffered.flush()
+                buffered.detach()
+
+    if durability == "none":
+        with open(path, mode="wb", buffering=WRITE_BUFFER_SIZE) as f:
+            write(f)
+        return
+
+    fd, tmp_path = create_temp(path)
+    try:
+        with open(fd, mode="wb", buffering=WRITE_BUFFER_SIZE) as f:
+            write(f)
+            if durability != "flush":
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass  # a new file keeps the mode the umask gave it
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if durability == "fsync_dir":
+        fsync_dir(path)
+
+
+def build_objects(pairs, classes):
+    """This yields a (key, object) pair for each (key, dictionary)
+    pair of pairs, building the object with the from_dict() method of
+    its class, which classes(class name) returns"""
+
+    builders = {}
+    for key, value in pairs:
+        c_name = key[:key.index(".")]
+        build = builders.get(c_name)
+        if build is None:
+            build = builders[c_name] = classes(c_name).from_dict
+        yield key, build(value)
+
+
+def load_shard(path):
+    """This returns the list of (key, dictionary) pairs stored in
+    the shard at path"""
+
+    return list(load_file(path))
 
 
 class FileStorage(object):
@@ -16,34 +162,881 @@ class FileStorage(object):
     __file_path = "file.json"
     __objects = {}
 
-    def all(self):
-        """This returns a dictionary containing all objects"""
+    def __init__(self, file_path=None, journal=False, journal_limit=1000,
+                 sharded=False, workers=None, flush_interval=None,
+                 flush_changes=100, durability="flush", serializer=None,
+                 compression=None, compression_level=None,
+                 cache_fragments=False, keys_index=False, max_resident=None):
+        """Creates a new storage.
 
-        return self.__objects
+        When journal is True, saves append one record per changed
+        object to <file_path>.journal instead of rewriting the whole
+        file. Once the journal holds more than journal_limit records
+        it is folded back into the snapshot by compact()
+
+        When sharded is True, the objects of each class are kept in
+        their own file <file_path>.d/<class name><suffix>, the suffix
+        being the one of the serializer (.json for JSON). Only the
+        shards of the changed classes are rewritten and reload()
+        reads the shards with up to workers processes (the number of
+        CPUs by default) once they hold PARALLEL_LOAD_BYTES
+
+        When flush_interval (in seconds) is given, saves are written
+        behind: save() returns at once and a background thread writes
+        the changes at most every flush_interval seconds, or once
+        flush_changes saves were asked for. flush() writes them at
+        once and is called when the interpreter exits
+
+        durability is one of DURABILITY_LEVELS and tells how safely
+        the files are written, see write_file(). With "fsync" and
+        "fsync_dir" the journal is also synced after each append
+
+        serializer is the name of one of the serializers of
+        models/engine/serializers.py. The files are written with it,
+        and read with the serializer that wrote them whatever it is.
+        When it is not given, the storage keeps writing the format of
+        the files it reloads, JSON for new ones. The journal is always
+        made of JSON lines
+
+        compression is "zlib", "bz2", "lzma" or "none", see
+        models/engine/compression.py. When it is not given, the
+        suffix of file_path chooses it, "file.json.gz" being written
+        with zlib for example. The files are compressed at
+        compression_level (the default of the codec if None), and
+        compressed files are recognized and decompressed as they are
+        read whatever the compression
+
+        Saves write the objects one by one to the file, and only hold
+        the object being encoded in memory. When cache_fragments is
+        True, the encoding of each object is kept so that it is reused
+        while no attribute of the object is set. A change made inside
+        an attribute, appending to a list for example, is then only
+        saved once the object is marked with mark_dirty()
+
+        The file is only read when the objects are first needed, or
+        when reload() is called. When keys_index is True, each full
+        write of the file (not sharded) also writes <file_path>.keys,
+        the keys of the objects and where each one is in the file, so
+        that until then count() reads only that index and get() only
+        the object asked for
+
+        When max_resident is given, at most that many objects are kept
+        in memory, the least recently used ones being moved to a
+        temporary backing file and read back when they are needed
+        again, see models/engine/cache.py. all() then returns a
+        mapping that reads the objects as they are looked up, the
+        declared indexes are not kept (lookups scan the objects) and
+        the fragment cache is off
+
+        The storage may be used from several threads. A reader-writer
+        lock lets lookups run together while changes are made one at
+        a time, and a save only holds it to take a copy-on-write
+        snapshot of the objects: the file is written from the
+        snapshot, so readers and writers are not kept waiting by it
+
+        Several processes may share the files. Saves hold the advisory
+        lock <file_path>.lock alone, and reads share it, see
+        models/engine/filelock.py. Before writing, a save merges the
+        objects other processes saved since the files were last read
+        or written here, see refresh(), so that their changes are not
+        overwritten
+        """
+
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"unknown durability {durability!r}")
+        if file_path is not None:
+            self.__file_path = file_path
+        self.durability = durability
+        self.serializer = get_serializer(serializer or "json")
+        self.__keep_format = serializer is None
+        if compression is None:
+            self.compression = codec_of_path(self.__file_path)
+        else:
+            self.compression = get_codec(compression)
+        self.compression_level = compression_level
+        self.cache_fragments = cache_fragments
+        self.keys_index = keys_index
+        self.max_resident = max_resident
+        if max_resident is not None:
+            self.cache_fragments = False
+        self.__loaded = False
+        self.__keys = None
+        self.__partial = {}
+        self.__objects = self.__new_objects()
+        self.__by_class = {}
+        self.__indexes = {}
+        self.__dirty = set()
+        self.__fragments = {}
+        self.journal = journal
+        self.journal_limit = journal_limit
+        self.__journal_records = 0
+        self.sharded = sharded
+        self.workers = workers or os.cpu_count() or 1
+        self.__stale_shards = set()
+        self.__batch = Batch(self)
+        self.__lock = threading.RLock()
+        self.__rw = RWLock()
+        self.__file_lock = FileLock(self.__file_path + ".lock")
+        self.__seen = None
+        self.__flusher = None
+        if flush_interval is not None:
+            self.__flusher = Flusher(self, flush_interval, flush_changes)
+            atexit.register(self.flush)
+        add_storage(self)
+
+    @property
+    def journal_path(self):
+        """This returns the path of the journal file"""
+
+        return self.__file_path + ".journal"
+
+    @property
+    def shard_dir(self):
+        """This returns the directory holding the shards"""
+
+        return self.__file_path + ".d"
+
+    @property
+    def lock_path(self):
+        """This returns the path of the lock file"""
+
+        return self.__file_lock.path
+
+    @property
+    def keys_path(self):
+        """This returns the path of the keys index file"""
+
+        return self.__file_path + ".keys"
+
+    def all(self, cls=None):
+        """This returns a dictionary containing all objects, or only
+        the objects of cls (a class or a class name) when it is given.
+        The dictionary of all objects is the one of the storage, which
+        other threads may change while it is read: it must be read
+        inside reading(). The objects of cls are a copy"""
+
+        self.__load()
+        if cls is None:
+            return self.__objects
+        with self.__rw.read:
+            return self.__by_class.get(class_name(cls), {}).copy()
+
+    def count(self, cls=None):
+        """This returns the number of objects, or the number of
+        objects of cls when it is given"""
+
+        keys = self.__keys_only()
+        if keys is not None:
+            if cls is None:
+                return sum(map(len, keys.values()))
+            return len(keys.get(class_name(cls), ()))
+        self.__load()
+        if cls is None:
+            return len(self.__objects)
+        return len(self.__by_class.get(class_name(cls), ()))
+
+    def get(self, cls, ide):
+        """This returns the object of cls (a class or a class name)
+        with the id ide, or None if there is none"""
+
+        key = f'{class_name(cls)}.{ide}'
+        keys = self.__keys_only()
+        if keys is not None:
+            if key in self.__partial:
+                return self.__partial[key]
+            place = keys.get(class_name(cls), {}).get(ide, False)
+            if place is False:
+                return None
+            if place is not None:
+                obj = self.__partial[key] = self.__read_one(*place)
+                return obj
+        self.__load()
+        return self.__objects.get(key)
 
     def new(self, obj):
         """This sets in __objects the obj with key <obj class name>.id"""
 
+        self.__load()
         key = f'{type(obj).__name__}.{obj.id}'
         # Reread instructions on this
         # We're to pass in the obj and not the dictionary of the obj
         # This is to ensure that even after instantiation, and attriutes
         # declared will still be part of it when the save method of
         # storage class is called
-        self.__objects[key] = obj
+        with self.__rw.write:
+            previous = self.__objects.get(key)
+            self.__objects[key] = obj
+            self.__bucket(type(obj).__name__)[key] = obj
+            for index in self.__indexes_of(obj):
+                index.add(key, obj)
+            self.__dirty.add(key)
+            if previous is not obj:
+                self.__batch.added(obj, previous)
+
+    def delete(self, obj=None):
+        """This removes obj from __objects if it is inside"""
+
+        if obj is None:
+            return
+        self.__load()
+        key = f'{type(obj).__name__}.{obj.id}'
+        with self.__rw.write:
+            if self.__objects.pop(key, None) is not None:
+                self.__by_class.get(type(obj).__name__, {}).pop(key, None)
+                for index in self.__indexes_of(obj):
+                    index.remove(key)
+                self.__dirty.add(key)
+                self.__fragments.pop(key, None)
+                self.__batch.deleted(obj)
+
+    def mark_dirty(self, obj, name=None, old=UNSET):
+        """This records that obj has changed since the last save.
+        BaseModel calls it on every storage whenever one of its
+        attributes is set, giving the name of the attribute and its
+        previous value; objects that are not in __objects are ignored"""
+
+        ide = obj.__dict__.get("id")
+        if ide is None:
+            return
+        key = f'{type(obj).__name__}.{ide}'
+        if key not in self.__objects:
+            return
+        with self.__rw.write:
+            if self.__objects.get(key) is obj:
+                self.__dirty.add(key)
+                if self.max_resident is not None:
+                    self.__objects.changed(key)
+                for index in self.__indexes_of(obj):
+                    index.update(key, obj)
+                if name is not None:
+                    self.__batch.changed(obj, name, old)
+
+    def batch(self):
+        """This returns a context in which saves are deferred until
+        it is left, then done once. If an exception is raised in it,
+        the objects created, changed or deleted in it are restored
+        as they were before it, see models/engine/batch.py"""
+
+        return self.__batch.run()
+
+    def find(self, cls, **attrs):
+        """This returns the list of objects of cls whose attributes
+        equal the values given as keyword arguments, for example
+        find(Place, city_id=city.id). The smallest matching bucket
+        of the indexes declared on cls is used, only the objects
+        in it are compared"""
+
+        self.__load()
+        c_name = class_name(cls)
+        with self.__rw.read:
+            indexes = self.__indexes.get(c_name, {})
+            candidates = self.__by_class.get(c_name, {})
+            for attr, value in attrs.items():
+                if ("hash", attr) in indexes:
+                    bucket = indexes[("hash", attr)].find(value)
+                    if bucket is not None and \
+                            len(bucket) < len(candidates):
+                        candidates = bucket
+            return [obj for obj in candidates.values()
+                    if all(getattr(obj, attr, None) == value
+                           for attr, value in attrs.items())]
+
+    def find_range(self, cls, attr, low=None, high=None, reverse=False):
+        """This yields the objects of cls whose attribute attr is a
+        number between low and high (both included, None meaning no
+        bound) in increasing order of attr, or decreasing if reverse
+        is True. The sorted index declared on attr is read when
+        there is one, otherwise the objects are scanned and sorted"""
+
+        self.__load()
+        c_name = class_name(cls)
+        with self.__rw.read:
+            index = self.__indexes.get(c_name, {}).get(("range", attr))
+            if index is not None:
+                return index.range(low, high, reverse)
+            objs = []
+            for obj in self.__by_class.get(c_name, {}).values():
+                value = getattr(obj, attr, None)
+                if (is_number(value)
+                        and (low is None or value >= low)
+                        and (high is None or value <= high)):
+                    objs.append(obj)
+        objs.sort(key=lambda obj: getattr(obj, attr), reverse=reverse)
+        return iter(objs)
+
+    def near(self, cls, latitude, longitude, radius_km):
+        """This returns the list of objects of cls at most radius_km
+        kilometres away from (latitude, longitude), nearest first.
+        The cells of the geo index declared on cls are read when
+        there is one, otherwise the objects are scanned"""
+
+        self.__load()
+        with self.__rw.read:
+            index = self.__indexes.get(class_name(cls), {}).get(
+                ("geo", None))
+            if index is not None:
+                found = index.near(latitude, longitude, radius_km)
+            else:
+                found = [item for item in self.__by_distance(cls, latitude,
+                                                             longitude)
+                         if item[0] <= radius_km]
+        return [obj for dist, obj in found]
+
+    def nearest(self, cls, latitude, longitude, k=1):
+        """This returns the list of the k objects of cls nearest to
+        (latitude, longitude), nearest first"""
+
+        self.__load()
+        with self.__rw.read:
+            index = self.__indexes.get(class_name(cls), {}).get(
+                ("geo", None))
+            if index is not None:
+                found = index.nearest(latitude, longitude, k)
+            else:
+                found = self.__by_distance(cls, latitude, longitude)[:k]
+        return [obj for dist, obj in found]
+
+    def search(self, cls, query, limit=10):
+        """This returns the list of the limit objects of cls best
+        matching the words of query, best first. The text index
+        declared on cls is used when there is one, otherwise every
+        text attribute of the objects is indexed for this search"""
+
+        self.__load()
+        c_name = class_name(cls)
+        with self.__rw.read:
+            index = self.__indexes.get(c_name, {}).get(("text", None))
+            if index is None:
+                index = TextIndex()
+                for key, obj in self.__by_class.get(c_name, {}).items():
+                    index.add(key, obj)
+            return [obj for score, obj in index.search(query, limit)]
+
+    def query(self, cls):
+        """This returns a Query on the objects of cls, see
+        models/engine/query.py"""
+
+        return Query(self, cls)
+
+    def reading(self):
+        """This returns a context in which the objects and the indexes
+        are not changed by other threads, for reading several of them
+        together. Changing them in it raises RuntimeError"""
+
+        self.__load()
+        return self.__rw.read
+
+    def index(self, cls, kind, attr=None):
+        """This returns the index of the given kind ("hash", "range",
+        "geo" or "text") declared on attr of cls, or None"""
+
+        self.__load()
+        return self.__indexes.get(class_name(cls), {}).get((kind, attr))
+
+    def __by_distance(self, cls, latitude, longitude):
+        """This returns the (distance, object) pairs of every object of
+        cls with a position, nearest first"""
+
+        lat_attr, lon_attr = getattr(cls, "__geo_index__",
+                                     ("latitude", "longitude"))
+        found = []
+        for obj in self.__by_class.get(class_name(cls), {}).values():
+            lat = getattr(obj, lat_attr, None)
+            lon = getattr(obj, lon_attr, None)
+            if isinstance(lat, Real) and isinstance(lon, Real):
+                found.append((distance_km(latitude, longitude, lat, lon),
+                              obj))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def __new_objects(self):
+        """This returns an empty container for the objects: a
+        dictionary, or an ObjectCache when the memory is bounded"""
+
+        if self.max_resident is None:
+            return {}
+        return ObjectCache(self.max_resident, self.classes,
+                           os.path.dirname(os.path.abspath(self.__file_path)))
+
+    def __reset_objects(self):
+        """This replaces the objects by an empty container and returns
+        it, closing the backing file of the ObjectCache there was"""
+
+        if isinstance(self.__objects, ObjectCache):
+            self.__objects.close()
+        self.__objects = self.__new_objects()
+        return self.__objects
+
+    def __bucket(self, c_name):
+        """This returns the mapping of the objects of the class
+        c_name, creating it if there is none"""
+
+        bucket = self.__by_class.get(c_name)
+        if bucket is None:
+            bucket = self.__by_class[c_name] = \
+                {} if self.max_resident is None else CacheView(self.__objects)
+        return bucket
+
+    def __indexes_of(self, obj):
+        """This returns the indexes declared on the class of obj, none
+        when the memory is bounded as they would hold every object"""
+
+        if self.max_resident is not None:
+            return ()
+        c_name = type(obj).__name__
+        indexes = self.__indexes.get(c_name)
+        if indexes is None:
+            indexes = self.__indexes[c_name] = build_indexes(type(obj))
+        return indexes.values()
 
     def save(self):
         """The save method serializes __objects to the JSON
         file (path: __file_path)
         """
 
-        dic_copy = self.__objects.copy()
-        for key, value in dic_copy.items():
-            dic_copy[key] = value.to_dict()
-        all_objs = json.dumps(dic_copy)
+        if self.__batch.defer():
+            return
+        if self.__flusher is not None:
+            self.__flusher.request()
+        else:
+            self.flush()
+
+    def flush(self):
+        """This writes the changes to the file now, appending them to
+        the journal when it is enabled. In write-behind mode, save()
+        leaves this to the flusher thread"""
+
+        self.__load()
+        with self.__lock, self.__file_lock.hold():
+            if self.__flusher is not None:
+                self.__flusher.flushed()
+            self.__refresh()
+            snapshot = self.shard_dir if self.sharded else self.__file_path
+            if self.journal and os.path.exists(snapshot):
+                self.__append_journal()
+                self.__wrote()
+                if self.__journal_records > self.journal_limit:
+                    self.compact()
+            else:
+                self.compact()
+
+    def close(self):
+        """This stops the flusher thread after writing the pending
+        changes, saves are then written at once. When the memory is
+        bounded, the changes not saved yet are written and the backing
+        file of the objects is removed; the objects are read again if
+        the storage is used afterwards"""
+
+        if self.__flusher is not None:
+            self.__flusher.stop()
+            self.__flusher = None
+            atexit.unregister(self.flush)
+            self.flush()
+        if self.max_resident is not None:
+            with self.__lock:
+                if self.__dirty:
+                    self.flush()
+                with self.__rw.write:
+                    self.__reset_objects()
+                    self.__by_class = {}
+                    self.__loaded = False
+
+    def compact(self):
+        """This writes every object to the JSON file and empties
+        the journal"""
+
+        self.__load()
+        with self.__lock, self.__file_lock.hold():
+            self.__refresh()
+            self.__compact()
+            self.__wrote()
+
+    def refresh(self):
+        """This reads the changes other processes saved since the files
+        were last read or written here, and returns whether there
+        were any. The objects changed elsewhere are updated in place,
+        those created elsewhere added and those deleted elsewhere
+        removed, except the objects changed here and not saved yet
+        which are kept as they are. When other processes only
+        appended to the journal, only the new records are read;
+        otherwise the whole store is read, but only the objects that
+        differ are rebuilt"""
+
+        self.__load()
+        with self.__file_lock.hold(shared=True):
+            return self.__refresh()
+
+    def __disk_state(self):
+        """This returns what tells whether the files have changed: the
+        generation of the lock file, the size, time and inode of the
+        file (or the shard directory) and the size of the journal.
+        The file lock must be held"""
+
+        snapshot = self.shard_dir if self.sharded else self.__file_path
+        try:
+            stat = os.stat(snapshot)
+            signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            signature = None
+        try:
+            journal = os.path.getsize(self.journal_path)
+        except OSError:
+            journal = 0
+        return self.__file_lock.generation(), signature, journal
+
+    def __wrote(self):
+        """This records that the files were just written here. The file
+        lock must be held exclusive"""
+
+        self.__file_lock.bump()
+        self.__seen = self.__disk_state()
+
+    def __refresh(self):
+        """This does the work of refresh() once the file lock is held"""
+
+        state = self.__disk_state()
+        seen = self.__seen
+        if state == seen:
+            return False
+        if seen is not None and state[1] == seen[1] \
+                and state[2] >= seen[2]:
+            # records were only appended to the journal
+            journaled = changes = self.__read_journal(seen[2])
+            self.__journal_records += len(journaled)
+        else:
+            changes, journaled = self.__read_store()
+            self.__journal_records = len(journaled)
+        self.__merge(changes, journaled)
+        self.__seen = state
+        return True
+
+    def __read_store(self):
+        """This returns the changes of the files against the objects,
+        and the records of the journal alone. The changes are the
+        dictionaries, by key, of the objects of the files that differ
+        from those here or are not here, and None for the objects here
+        missing from the files. The files are read one object at a
+        time and only the changes are kept, so that the whole store
+        is never held as dictionaries"""
+
+        journaled = self.__read_journal(0)
+        with self.__rw.read:
+            # the keys are shared with the objects, not copied
+            missing = set(self.__objects)
+        changes = {}
+        for key, value in self.__iter_store():
+            missing.discard(key)
+            if key in journaled:
+                continue
+            obj = self.__objects.get(key)
+            if obj is None or obj.to_dict() != value:
+                changes[key] = value
+        missing.difference_update(journaled)
+        changes.update(journaled)
+        changes.update(dict.fromkeys(missing))
+        return changes, journaled
+
+    def __iter_store(self):
+        """This yields the (key, dictionary) pairs of the snapshot, the
+        file or the shards, without the journal"""
 
-        with open(self.__file_path, mode="w", encoding="utf-8") as f:
-            f.write(all_objs)
+        if self.sharded and os.path.isdir(self.shard_dir):
+            suffixes = self.__shard_suffixes()
+            for name in os.listdir(self.shard_dir):
+                if name[name.find("."):] in suffixes:
+                    yield from load_file(os.path.join(self.shard_dir, name))
+        elif os.path.exists(self.__file_path):
+            yield from load_file(self.__file_path)
+
+    def __read_journal(self, offset):
+        """This returns the records of the journal from offset on, as a
+        dictionary of the dictionaries of the objects by key, None for
+        a deleted object"""
+
+        records = {}
+        try:
+            with open(self.journal_path, mode="rb") as f:
+                f.seek(offset)
+                for line in f:
+                    try:
+                        key, value = json.loads(line)
+                    except ValueError:
+                        break
+                    records[key] = value
+        except FileNotFoundError:
+            pass  # a new file keeps the mode the umask gave it
+        return records
+
+    def __merge(self, changes, journaled):
+        """This applies changes, the dictionaries of the objects saved
+        elsewhere by key, None for a deleted one, to the objects but
+        for those changed here. The classes of the keys of journaled
+        have records in the journal that their shards lack"""
+
+        with self.__rw.write:
+            dirty = self.__dirty
+            for key, value in changes.items():
+                if key in dirty:
+                    # changed here too: this change is saved over it
+                    continue
+                obj = self.__objects.get(key)
+                if value is None:
+                    if obj is None:
+                        continue
+                    self.__objects.pop(key, None)
+                    self.__by_class.get(type(obj).__name__, {}).pop(key,
+                                                                    None)
+                    for index in self.__indexes_of(obj):
+                        index.remove(key)
+                elif obj is None:
+                    obj = self.classes(key.split(".")[0]).from_dict(value)
+                    self.__objects[key] = obj
+                    self.__bucket(type(obj).__name__)[key] = obj
+                    for index in self.__indexes_of(obj):
+                        index.add(key, obj)
+                elif obj.to_dict() != value:
+                    # updated in place, so that it stays the object
+                    # the program holds
+                    value = dict(value)
+                    value.pop("__class__", None)
+                    obj.__dict__.clear()
+                    obj.__dict__.update(value)
+                    if self.max_resident is not None:
+                        self.__objects.changed(key)
+                    for index in self.__indexes_of(obj):
+                        index.update(key, obj)
+                else:
+                    continue
+                self.__fragments.pop(key, None)
+            self.__stale_shards.update(key.split(".")[0]
+                                       for key in journaled)
+
+    def __compact(self):
+        """This does the work of compact() once the lock is held. The
+        changes are taken and the objects copied under the write side
+        of the reader-writer lock, the files are then written from the
+        copy while other threads read and change the objects again"""
+
+        with self.__rw.write:
+            # the objects changed from now on are written next time
+            written = self.__dirty
+            self.__dirty = set()
+            if self.sharded:
+                snapshots = self.__shard_snapshots(written)
+            else:
+                snapshot = self.__objects.copy()
+        try:
+            if self.sharded:
+                self.__write_shards(snapshots, written)
+            else:
+                lengths = [] if self.keys_index else None
+                self.__write_snapshot(self.__file_path, snapshot, written,
+                                      lengths)
+                if lengths is not None:
+                    self.__write_keys(lengths)
+        except BaseException:
+            with self.__rw.write:
+                self.__dirty.update(written)
+                if self.sharded:
+                    self.__stale_shards.update(snapshots)
+            raise
+
+        with self.__rw.write:
+            if len(self.__fragments) > len(self.__objects):
+                # objects were removed, maybe from all() behind our back
+                self.__fragments = {
+                    key: fragment
+                    for key, fragment in self.__fragments.items()
+                    if key in self.__objects}
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.__journal_records = 0
+
+    def __write_snapshot(self, path, objects, written, lengths=None):
+        """This writes the objects of the mapping objects to path with
+        the serializer, streaming each object to the file as soon as
+        it is encoded. Only the objects changed since the last save,
+        whose keys are in written, are serialized again, the others
+        reuse the fragment cached for them. The (key, length) pair of
+        each fragment is appended to lengths when it is given"""
+
+        write_file(path,
+                   self.serializer.chunks(
+                       self.__encode(objects, written, lengths)),
+                   self.durability, self.compression,
+                   self.compression_level)
+
+    def __encode(self, objects, written, lengths=None):
+        """This yields the fragment of each object of the mapping
+        objects, keeping it in the cache if cache_fragments is True.
+        An object is only looked up when it has to be encoded"""
+
+        serializer = self.serializer
+        fragments = self.__fragments
+        cache = self.cache_fragments
+        for key in objects:
+            fragment = None if key in written else fragments.get(key)
+            if fragment is None:
+                value = objects.get(key)
+                if value is None:
+                    # removed from the cache since the snapshot
+                    continue
+                fragment = serializer.fragment(key, value.to_dict())
+                if cache:
+                    fragments[key] = fragment
+            if lengths is not None:
+                lengths.append((key, len(fragment)))
+            yield fragment
+
+    def __write_keys(self, lengths):
+        """This writes the keys index of the file just written, given
+        the (key, length) pairs of its fragments in order. The place
+        of the objects is left out when the file is compressed"""
+
+        places = self.serializer.offsets(length for key, length in lengths)
+        classes = {}
+        for (key, length), offset in zip(lengths, places):
+            c_name, ide = key.split(".", 1)
+            classes.setdefault(c_name, {})[ide] = \
+                None if self.compression else [offset, length]
+        stat = os.stat(self.__file_path)
+        index = {"format": self.serializer.name,
+                 "snapshot": [stat.st_size, stat.st_mtime_ns],
+                 "classes": classes}
+        write_file(self.keys_path, json.dumps(index), self.durability)
+
+    def __keys_only(self):
+        """This returns the keys index, a dictionary mapping each class
+        name to the places of its objects by id, when the objects are
+        not loaded and the index matches the file. Otherwise None"""
+
+        if self.__loaded or not self.keys_index or self.sharded:
+            return None
+        if self.__keys is None:
+            try:
+                with open(self.keys_path, encoding="utf-8") as f:
+                    index = json.load(f)
+                stat = os.stat(self.__file_path)
+            except (OSError, ValueError):
+                return None
+            if index.get("snapshot") != [stat.st_size, stat.st_mtime_ns] \
+                    or os.path.exists(self.journal_path):
+                return None
+            self.__keys = index
+        return self.__keys["classes"]
+
+    def __read_one(self, offset, length):
+        """This returns the object whose fragment is at offset in the
+        file, building only that object"""
+
+        with open(self.__file_path, mode="rb") as f:
+            f.seek(offset)
+            fragment = f.read(length)
+        key, value = get_serializer(self.__keys["format"]).decode(fragment)
+        return self.classes(key.split(".")[0]).from_dict(value)
+
+    def __load(self):
+        """This reads the file the first time the objects are needed.
+        The objects already read alone by get() are kept, so that they
+        stay the objects of the storage"""
+
+        if self.__loaded:
+            return
+        with self.__file_lock.hold(shared=True), self.__rw.write:
+            if self.__loaded:
+                # read by another thread meanwhile
+                return
+            partial = self.__partial
+            self.reload()
+            for key, obj in partial.items():
+                if key in self.__objects:
+                    self.new(obj)
+
+    def __shard_snapshots(self, written):
+        """This returns a dictionary mapping the name of every class
+        changed since the last save, whose keys are in written, to a
+        copy of its objects, to be written to its shard"""
+
+        stale = self.__stale_shards
+        stale.update(key.split(".")[0] for key in written)
+        if not os.path.isdir(self.shard_dir):
+            os.makedirs(self.shard_dir)
+            stale.update(self.__by_class)
+        snapshots = {c_name: self.__by_class.get(c_name, {}).copy()
+                     for c_name in stale}
+        stale.clear()
+        return snapshots
+
+    def __write_shards(self, snapshots, written):
+        """This rewrites the shard of every class of snapshots, see
+        __shard_snapshots(), and removes the shards of the classes
+        that have no objects left"""
+
+        suffix = self.__shard_suffix()
+        for c_name, objs in snapshots.items():
+            if objs:
+                self.__write_snapshot(
+                    os.path.join(self.shard_dir, c_name + suffix), objs,
+                    written)
+            for other in self.__shard_suffixes():
+                # the shard of a class that has no objects left, or
+                # written by another serializer or compression
+                path = os.path.join(self.shard_dir, c_name + other)
+                if (not objs or other != suffix) and os.path.exists(path):
+                    os.remove(path)
+
+    def __shard_suffix(self):
+        """This returns the suffix of the shards written now"""
+
+        suffix = self.serializer.suffix
+        if self.compression is not None:
+            suffix += self.compression.suffix
+        return suffix
+
+    def __shard_suffixes(self):
+        """This returns a dictionary mapping the suffix of every kind
+        of shard to the serializer that writes it"""
+
+        suffixes = {}
+        for serializer in SERIALIZERS.values():
+            suffixes[serializer.suffix] = serializer
+            for codec in CODECS.values():
+                suffixes[serializer.suffix + codec.suffix] = serializer
+        return suffixes
+
+    def __append_journal(self):
+        """This appends one line per changed object to the journal.
+        A line is [key, dict] for a stored object and [key, null]
+        for a deleted one"""
+
+        with self.__rw.write:
+            written = self.__dirty
+            if not written:
+                return
+            self.__dirty = set()
+            changed = []
+            for key in written:
+                self.__fragments.pop(key, None)
+                self.__stale_shards.add(key.split(".")[0])
+                changed.append((key, self.__objects.get(key)))
+        created = not os.path.exists(self.journal_path)
+        try:
+            with open(self.journal_path, mode="a", encoding="utf-8") as f:
+                for key, obj in changed:
+                    record = [key, None if obj is None else obj.to_dict()]
+                    f.write(json.dumps(record, separators=(",", ":"))
+                            + "\n")
+                if self.durability in ("fsync", "fsync_dir"):
+                    f.flush()
+                    os.fsync(f.fileno())
+        except BaseException:
+            with self.__rw.write:
+                self.__dirty.update(written)
+            raise
+        if created and self.durability == "fsync_dir":
+            fsync_dir(self.journal_path)
+
+        self.__journal_records += len(written)
 
     def reload(self):
         """This method deserializes the JSON file to __objects
@@ -51,34 +1044,97 @@ class FileStorage(object):
         do nothing. If the file doesn’t exist)
         """
 
-        if os.path.exists(self.__file_path):
-            with open(self.__file_path, encoding="utf-8") as f:
-                json_string = f.read()
+        with self.__file_lock.hold(shared=True), self.__rw.write:
+            self.__keys = None
+            self.__partial = {}
+            if self.sharded and os.path.isdir(self.shard_dir):
+                self.__load_shards()
+            elif os.path.exists(self.__file_path):
+                # The file is decoded one object at a time so that only
+                # the objects themselves are ever fully held in memory
+                objects = self.__reset_objects()
+                with open_read(self.__file_path) as f:
+                    serializer = detect(f)
+                    if self.__keep_format:
+                        self.serializer = serializer
+                    objects.update(build_objects(serializer.load(f),
+                                                 self.classes))
 
-            self.__objects = json.loads(json_string)
-            to_be_conv_to_obj = self.__objects.copy()
+            self.__stale_shards.clear()
+            self.__replay_journal()
+            self.__by_class = {}
+            self.__indexes = {}
+            if self.max_resident is not None:
+                # the class is in the key, the objects are not read again
+                for key in self.__objects:
+                    self.__bucket(key.split(".")[0])[key] = None
+            else:
+                for key, value in self.__objects.items():
+                    self.__bucket(type(value).__name__)[key] = value
+                    for index in self.__indexes_of(value):
+                        index.load(key, value)
+            self.__dirty.clear()
+            self.__fragments.clear()
+            self.__loaded = True
+            self.__seen = self.__disk_state()
 
-            for key, value in to_be_conv_to_obj.items():
-                c_name, ide = key.split(".")
-                klass = self.classes(c_name)
-                to_be_conv_to_obj[key] = klass(**value)
+    def __load_shards(self):
+        """This loads every shard into __objects. The shards are
+        decoded in parallel by a pool of processes when there are
+        several of them holding PARALLEL_LOAD_BYTES together, the
+        objects are then built here"""
 
-            self.__objects = to_be_conv_to_obj.copy()
+        suffixes = self.__shard_suffixes()
+        # a shard is named <class name><suffix>, with no other dot
+        names = sorted(name for name in os.listdir(self.shard_dir)
+                       if name[name.find("."):] in suffixes)
+        if names and self.__keep_format:
+            self.serializer = suffixes[names[0][names[0].find("."):]]
+        paths = [os.path.join(self.shard_dir, name) for name in names]
+        workers = min(self.workers, len(paths))
+        shards = None
+        if workers > 1 and \
+                sum(map(os.path.getsize, paths)) >= PARALLEL_LOAD_BYTES:
+            # imported here as it takes longer than the rest of the
+            # storage and only sharded stores need it
+            from concurrent.futures import ProcessPoolExecutor
+            import multiprocessing
+            # a process of the pool must not start a pool of its own
+            if multiprocessing.parent_process() is None:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    shards = list(pool.map(load_shard, paths))
+        if shards is None:
+            shards = map(load_shard, paths)
+
+        objects = self.__reset_objects()
+        for pairs in shards:
+            objects.update(build_objects(pairs, self.classes))
+
+    def __replay_journal(self):
+        """This applies the records of the journal to __objects and
+        marks the shards of their classes stale. A torn last line
+        left by a crash ends the replay"""
+
+        self.__journal_records = 0
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    key, value = json.loads(line)
+                except ValueError:
+                    break
+                if value is None:
+                    self.__objects.pop(key, None)
+                else:
+                    klass = self.classes(key.split(".")[0])
+                    self.__objects[key] = klass.from_dict(value)
+                # the shard of the class lacks the record
+                self.__stale_shards.add(key.split(".")[0])
+                self.__journal_records += 1
 
     def classes(self, class_name):
         """This will return the class of the class name that
-        is passed"""
-
-        from models.base_model import BaseModel
-        from models.user import User
-        from models.state import State
-        from models.amenity import Amenity
-        from models.city import City
-        from models.review import Review
-        from models.place import Place
-
-        all_classes = {'BaseModel': BaseModel, 'User': User,
-                       'State': State, 'Amenity': Amenity,
-                       'Place': Place, 'Review': Review,
-                       'City': City}
-        return all_classes[class_name]
+        is passed, see models/engine/registry.py"""
+
+        return get_model(class_name)
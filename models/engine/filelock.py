@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""
+This module contains the FileLock class, the advisory lock with which
+the processes sharing the files of a FileStorage take turns: a writer
+holds it alone, readers share it. The lock file also holds the
+generation of the files, a number each writer increments, so that a
+process tells whether others wrote since it last read or wrote them.
+Locking relies on fcntl.flock(); where there is no fcntl, only the
+threads of the process are kept apart
+"""
+
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """This is the FileLock class. hold() returns a context holding
+    the lock of the file at path, shared or exclusive. It is
+    reentrant: a thread holding it may hold it again, but may not ask
+    for it exclusive while holding it shared"""
+
+    def __init__(self, path):
+        """Creates the lock of the file at path, which is created when
+        the lock is first held"""
+
+        self.path = path
+        self.__fd = None
+        self.__depth = 0
+        self.__shared = False
+        self.__threads = threading.RLock()
+
+    def hold(self, shared=False):
+        """This returns a context holding the lock, shared with other
+        readers if shared is True"""
+
+        return _Held(self, shared)
+
+    def acquire(self, shared=False):
+        """This waits for the lock and takes it. A shared lock that
+        cannot be taken as the file cannot be created, in a directory
+        that is read only for example, is held by this process only"""
+
+        self.__threads.acquire()
+        if self.__depth:
+            if self.__shared and not shared:
+                self.__threads.release()
+                raise RuntimeError("cannot lock exclusively while holding"
+                                   " the shared lock")
+            self.__depth += 1
+            return
+        try:
+            self.__fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            if not shared:
+                self.__threads.release()
+                raise
+            self.__fd = None
+        if self.__fd is not None and fcntl is not None:
+            fcntl.flock(self.__fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self.__shared = shared
+        self.__depth = 1
+
+    def release(self):
+        """This releases the lock"""
+
+        self.__depth -= 1
+        if not self.__depth and self.__fd is not None:
+            # closing the file releases the lock
+            os.close(self.__fd)
+            self.__fd = None
+        self.__threads.release()
+
+    def generation(self):
+        """This returns the generation written in the lock file, 0 if
+        there is none. The lock must be held"""
+
+        if self.__fd is None:
+            return 0
+        os.lseek(self.__fd, 0, os.SEEK_SET)
+        try:
+            return int(os.read(self.__fd, 32) or 0)
+        except ValueError:
+            return 0
+
+    def bump(self):
+        """This increments the generation. The lock must be held
+        exclusive"""
+
+        generation = self.generation() + 1
+        os.ftruncate(self.__fd, 0)
+        os.lseek(self.__fd, 0, os.SEEK_SET)
+        os.write(self.__fd, str(generation).encode())
+        return generation
+
+
+class _Held:
+    """This is the context returned by FileLock.hold()"""
+
+    def __init__(self, lock, shared):
+        """Creates the context"""
+
+        self.lock = lock
+        self.shared = shared
+
+    def __enter__(self):
+        """This takes the lock"""
+
+        self.lock.acquire(self.shared)
+        return self.lock
+
+    def __exit__(self, *exc):
+        """This releases the lock"""
+
+        self.lock.release()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+This module contains the definition of the Flusher class used by
+FileStorage in write-behind mode. save() only tells the flusher that
+there are changes to write, and its thread calls storage.flush() at
+most once per interval, or as soon as max_changes saves were asked
+for, so that a burst of saves is written once
+"""
+
+
+import threading
+import time
+
+
+class Flusher(object):
+    """This is the Flusher class. It owns the background thread that
+    flushes a storage, started on the first request"""
+
+    def __init__(self, storage, interval=0.1, max_changes=100):
+        """Creates a flusher writing storage at most every interval
+        seconds, or after max_changes requests"""
+
+        self.storage = storage
+        self.interval = interval
+        self.max_changes = max_changes
+        self.changes = 0
+        self.error = None
+        self.__cond = threading.Condition()
+        self.__thread = None
+        self.__stopped = False
+
+    def request(self):
+        """This records that the storage has changes to write. An
+        error raised by the last background flush is raised here"""
+
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        with self.__cond:
+            self.changes += 1
+            if self.__thread is None:
+                self.__stopped = False
+                self.__thread = threading.Thread(
+                    target=self.__run, name="FileStorage flusher",
+                    daemon=True)
+                self.__thread.start()
+            self.__cond.notify()
+
+    def flushed(self):
+        """This records that the storage was just flushed"""
+
+        with self.__cond:
+            self.changes = 0
+
+    def stop(self):
+        """This stops the thread, without flushing"""
+
+        with self.__cond:
+            thread = self.__thread
+            self.__thread = None
+            self.__stopped = True
+            self.__cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def __run(self):
+        """This is the loop of the thread: it waits for a request,
+        then for the rest of the interval unless max_changes requests
+        come first, and flushes the storage"""
+
+        while True:
+            with self.__cond:
+                while not self.changes and not self.__stopped:
+                    self.__cond.wait()
+                deadline = time.monotonic() + self.interval
+                while self.changes < self.max_changes and \
+                        not self.__stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__cond.wait(remaining)
+                if self.__stopped:
+                    return
+                if not self.changes:
+                    # flushed by the storage meanwhile
+                    continue
+            try:
+                self.storage.flush()
+            except Exception as error:
+                self.error = error
@@ -0,0 +1,574 @@
+#!/usr/bin/python3
+"""
+This module contains the indexes kept by the FileStorage class.
+An index is declared on a model class by listing attribute names,
+for example __hash_indexes__ = ("city_id", "user_id") on Place, and
+storage keeps it up to date as objects are created, updated and
+deleted
+"""
+
+
+from bisect import bisect_left, insort
+import heapq
+import math
+from numbers import Real
+import re
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """This returns the great-circle distance in kilometres between
+    two points given in degrees"""
+
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def is_number(value):
+    """This tells whether value is a number that can be ordered: a
+    real number but NaN, which is neither less nor greater than any
+    other"""
+
+    return isinstance(value, Real) and value == value
+
+
+class _Top(object):
+    """An object greater than any key, used to bisect after every
+    entry holding a given value"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+
+class HashIndex(object):
+    """This is the HashIndex class. It maps each value of one
+    attribute to the objects holding that value"""
+
+    kind = "hash"
+
+    def __init__(self, attr):
+        """Creates an empty index on the attribute attr"""
+
+        self.attr = attr
+        self.__buckets = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """This adds obj, stored under key, to the index"""
+
+        self.remove(key)
+        value = getattr(obj, self.attr, None)
+        try:
+            bucket = self.__buckets.setdefault(value, {})
+        except TypeError:
+            # unhashable values (lists, dicts) are not indexed
+            return
+        bucket[key] = obj
+        self.__values[key] = value
+
+    # the objects read by reload() are added like the others
+    load = add
+
+    def remove(self, key):
+        """This removes the object stored under key from the index"""
+
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        bucket = self.__buckets[value]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[value]
+
+    def update(self, key, obj):
+        """This moves obj to the bucket of its current value"""
+
+        value = getattr(obj, self.attr, None)
+        if key in self.__values and self.__values[key] == value:
+            return
+        self.remove(key)
+        self.add(key, obj)
+
+    def find(self, value):
+        """This returns a dictionary of the objects whose attribute
+        equals value, or None when value can not be looked up"""
+
+        try:
+            return self.__buckets.get(value, {})
+        except TypeError:
+            return None
+
+    def __len__(self):
+        """This returns the number of indexed objects"""
+
+        return len(self.__values)
+
+
+class RangeIndex(object):
+    """This is the RangeIndex class. It keeps the objects sorted on
+    one numeric attribute so that ranges of values are read in
+    order without scanning. Objects whose value is not a number,
+    or is NaN, are left out. An object added or removed is put in or taken out
+    of its place in the sorted list. The objects read by reload()
+    are loaded instead: their entries are appended and the list is
+    sorted when it is next used, so that loading many objects costs
+    one sort instead of one insertion each"""
+
+    kind = "range"
+
+    def __init__(self, attr):
+        """Creates an empty index on the attribute attr"""
+
+        self.attr = attr
+        self.__entries = []
+        self.__sorted = True
+        self.__objects = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """This adds obj, stored under key, to the index"""
+
+        self.remove(key)
+        value = getattr(obj, self.attr, None)
+        if not is_number(value):
+            return
+        insort(self.__sorted_entries(), (value, key))
+        self.__objects[key] = obj
+        self.__values[key] = value
+
+    def load(self, key, obj):
+        """This adds obj, stored under key, to the index like add(),
+        appending its entry to be sorted with the others later"""
+
+        self.remove(key)
+        value = getattr(obj, self.attr, None)
+        if not is_number(value):
+            return
+        self.__entries.append((value, key))
+        self.__sorted = False
+        self.__objects[key] = obj
+        self.__values[key] = value
+
+    def remove(self, key):
+        """This removes the object stored under key from the index"""
+
+        if key not in self.__values:
+            return
+        value = self.__values.pop(key)
+        del self.__objects[key]
+        entries = self.__sorted_entries()
+        del entries[bisect_left(entries, (value, key))]
+
+    def update(self, key, obj):
+        """This moves obj to the place of its current value"""
+
+        value = getattr(obj, self.attr, None)
+        if key in self.__values and self.__values[key] == value:
+            return
+        self.add(key, obj)
+
+    def range(self, low=None, high=None, reverse=False):
+        """This returns an iterator over the objects whose value is
+        between low and high (both included, None meaning no bound),
+        in increasing order of value or decreasing if reverse is True.
+        The entries are selected at once, the objects are then looked
+        up as they are read"""
+
+        entries = self.__sorted_entries()
+        start = 0 if low is None else bisect_left(entries, (low,))
+        end = len(entries) if high is None else \
+            bisect_left(entries, (high, _TOP))
+        # the slice is a copy, so objects may be changed while the
+        # results are read
+        selected = entries[start:end]
+        if reverse:
+            selected.reverse()
+        objects = self.__objects
+        return (obj for obj in (objects.get(key) for value, key in selected)
+                if obj is not None)
+
+    def __sorted_entries(self):
+        """This returns the list of (value, key) entries, sorting it
+        first if entries were appended since it was last sorted"""
+
+        if not self.__sorted:
+            self.__entries.sort()
+            self.__sorted = True
+        return self.__entries
+
+    def __len__(self):
+        """This returns the number of indexed objects"""
+
+        return len(self.__values)
+
+
+class GridIndex(object):
+    """This is the GridIndex class. It sorts objects by latitude and
+    longitude into square cells of cell degrees so that the points
+    near a location are found by reading a few cells"""
+
+    kind = "geo"
+
+    def __init__(self, lat_attr, lon_attr, cell=0.1):
+        """Creates an empty index on the attributes lat_attr and
+        lon_attr using cells of cell degrees"""
+
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+        self.cell = cell
+        self.__columns = int(round(360 / cell))
+        self.__cells = {}
+        self.__points = {}
+
+    def add(self, key, obj):
+        """This adds obj, stored under key, to the index"""
+
+        self.remove(key)
+        lat = getattr(obj, self.lat_attr, None)
+        lon = getattr(obj, self.lon_attr, None)
+        if (not isinstance(lat, Real) or not isinstance(lon, Real)
+                or not -90 <= lat <= 90 or not -180 <= lon <= 180):
+            return
+        cell = self.__cell_of(lat, lon)
+        self.__cells.setdefault(cell, {})[key] = obj
+        self.__points[key] = (cell, lat, lon)
+
+    # the objects read by reload() are added like the others
+    load = add
+
+    def remove(self, key):
+        """This removes the object stored under key from the index"""
+
+        if key not in self.__points:
+            return
+        cell = self.__points.pop(key)[0]
+        objs = self.__cells[cell]
+        del objs[key]
+        if not objs:
+            del self.__cells[cell]
+
+    def update(self, key, obj):
+        """This moves obj to the cell of its current position"""
+
+        point = self.__points.get(key)
+        if (point is not None
+                and point[1] == getattr(obj, self.lat_attr, None)
+                and point[2] == getattr(obj, self.lon_attr, None)):
+            return
+        self.add(key, obj)
+
+    def near(self, lat, lon, radius_km):
+        """This returns the list of (distance in km, object) pairs for
+        the objects at most radius_km away from (lat, lon), nearest
+        first"""
+
+        dlat, dlon = self.__box(lat, radius_km)
+        found = []
+        for cell in self.__cells_around(lat, lon, dlat, dlon):
+            for key, obj in self.__cells.get(cell, {}).items():
+                point = self.__points[key]
+                if abs(point[1] - lat) > dlat:
+                    continue
+                if dlon < 180.0 and \
+                        abs((point[2] - lon + 180.0) % 360.0 - 180.0) > dlon:
+                    continue
+                dist = distance_km(lat, lon, point[1], point[2])
+                if dist <= radius_km:
+                    found.append((dist, key, obj))
+        found.sort(key=lambda item: item[:2])
+        return [(dist, obj) for dist, key, obj in found]
+
+    def nearest(self, lat, lon, k=1):
+        """This returns the list of (distance in km, object) pairs for
+        the k objects nearest to (lat, lon), nearest first.
+
+        The cells are read in rings around the cell of (lat, lon)
+        until the k-th distance found is below the distance to any
+        cell outside the rings. Once the rings span more cells than
+        are in use, the remaining cells in use are read instead,
+        nearest cell first"""
+
+        k = min(k, len(self.__points))
+        if k <= 0:
+            return []
+        heap = []
+        row0, col0 = self.__cell_of(lat, lon)
+        col0 = math.floor(lon / self.cell)
+
+        def visit(objs):
+            for key, obj in objs.items():
+                point = self.__points[key]
+                dist = distance_km(lat, lon, point[1], point[2])
+                item = (-dist, key, obj)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        ring = 0
+        while True:
+            for cell in self.__ring(row0, col0, ring):
+                visit(self.__cells.get(cell, {}))
+            bound = self.__bound_outside(lat, lon, row0, col0, ring)
+            if len(heap) == k and -heap[0][0] <= bound:
+                break
+            ring += 1
+            if ((2 * ring + 1) ** 2 > len(self.__cells)
+                    or 2 * ring + 1 >= self.__columns):
+                rest = []
+                for cell in self.__cells:
+                    dcol = (cell[1] - col0) % self.__columns
+                    dcol = min(dcol, self.__columns - dcol)
+                    if max(abs(cell[0] - row0), dcol) >= ring:
+                        rest.append((self.__cell_bound(lat, lon, cell),
+                                     cell))
+                rest.sort()
+                for bound, cell in rest:
+                    if len(heap) == k and -heap[0][0] <= bound:
+                        break
+                    visit(self.__cells[cell])
+                break
+        heap.sort(reverse=True)
+        return [(-dist, obj) for dist, key, obj in heap]
+
+    def __ring(self, row0, col0, ring):
+        """This returns the cells whose row or column is ring cells
+        away from (row0, col0) and none is further"""
+
+        if ring == 0:
+            return [(row0, col0 % self.__columns)]
+        cells = []
+        for row in range(row0 - ring, row0 + ring + 1):
+            if row in (row0 - ring, row0 + ring):
+                cols = range(col0 - ring, col0 + ring + 1)
+            else:
+                cols = (col0 - ring, col0 + ring)
+            for col in cols:
+                cells.append((row, col % self.__columns))
+        return cells
+
+    def __bound_outside(self, lat, lon, row0, col0, ring):
+        """This returns a distance in km below which no point lies
+        outside the square of cells ring cells around (row0, col0)"""
+
+        south = lat - (row0 - ring) * self.cell
+        north = (row0 + ring + 1) * self.cell - lat
+        bound = math.inf
+        if (row0 - ring) * self.cell > -90.0:
+            bound = min(bound, math.radians(south) * EARTH_RADIUS_KM)
+        if (row0 + ring + 1) * self.cell < 90.0:
+            bound = min(bound, math.radians(north) * EARTH_RADIUS_KM)
+        gap = min(lon - (col0 - ring) * self.cell,
+                  (col0 + ring + 1) * self.cell - lon)
+        if gap <= 90.0:
+            # distance to the great circle of the nearest meridian
+            cross = math.asin(abs(math.sin(math.radians(gap)))
+                              * math.cos(math.radians(lat)))
+            bound = min(bound, cross * EARTH_RADIUS_KM)
+        elif gap < 180.0:
+            bound = min(bound,
+                        math.radians(90.0 - abs(lat)) * EARTH_RADIUS_KM)
+        return bound
+
+    def __cell_bound(self, lat, lon, cell):
+        """This returns a distance in km below which no point of cell
+        lies from (lat, lon)"""
+
+        lat0 = cell[0] * self.cell
+        lat_gap = max(lat0 - lat, lat - (lat0 + self.cell), 0.0)
+        bound = math.radians(lat_gap) * EARTH_RADIUS_KM
+        lon0 = cell[1] * self.cell
+        west = (lon - (lon0 + self.cell)) % 360.0
+        east = (lon0 - lon) % 360.0
+        gap = 0.0 if (lon - lon0) % 360.0 <= self.cell else min(west, east)
+        if gap <= 90.0:
+            cross = math.asin(abs(math.sin(math.radians(gap)))
+                              * math.cos(math.radians(lat)))
+        else:
+            cross = math.radians(90.0 - abs(lat))
+        return max(bound, cross * EARTH_RADIUS_KM)
+
+    def __box(self, lat, radius_km):
+        """This returns the half height and half width in degrees of
+        a box around latitude lat holding the circle of radius_km"""
+
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        if abs(lat) + dlat >= 90.0:
+            return dlat, 180.0
+        widest = math.cos(math.radians(abs(lat) + dlat))
+        return dlat, min(180.0, dlat / widest)
+
+    def __cell_of(self, lat, lon):
+        """This returns the (row, column) of the cell holding a point"""
+
+        return (math.floor(lat / self.cell),
+                math.floor(lon / self.cell) % self.__columns)
+
+    def __cells_around(self, lat, lon, dlat, dlon):
+        """This returns every cell that may hold a point of the box
+        of half height dlat and half width dlon around (lat, lon)"""
+
+        lat_min = max(-90.0, lat - dlat)
+        lat_max = min(90.0, lat + dlat)
+        rows = range(math.floor(lat_min / self.cell),
+                     math.floor(lat_max / self.cell) + 1)
+        if dlon >= 180.0:
+            columns = range(self.__columns)
+        else:
+            first = math.floor((lon - dlon) / self.cell)
+            last = math.floor((lon + dlon) / self.cell)
+            columns = [c % self.__columns for c in range(first, last + 1)]
+            if len(columns) > self.__columns:
+                columns = range(self.__columns)
+        if len(rows) * len(columns) > len(self.__cells):
+            # fewer cells are in use than would be visited
+            columns = set(columns)
+            return [cell for cell in self.__cells
+                    if cell[0] in rows and cell[1] in columns]
+        return [(row, col) for row in rows for col in columns]
+
+    def __len__(self):
+        """This returns the number of indexed objects"""
+
+        return len(self.__points)
+
+
+def tokenize(text):
+    """This returns the list of lowercase words of text"""
+
+    return re.findall(r"\w+", text.lower())
+
+
+class TextIndex(object):
+    """This is the TextIndex class. It keeps, for every word of some
+    text attributes, the objects holding it and how often (the
+    posting lists) and ranks the objects matching a query with BM25.
+    When attrs is None every text attribute of an object but its id
+    is indexed"""
+
+    kind = "text"
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, attrs=None):
+        """Creates an empty index on the attributes attrs"""
+
+        self.attrs = attrs
+        self.__postings = {}
+        self.__objects = {}
+        self.__texts = {}
+        self.__lengths = {}
+        self.__total_length = 0
+
+    def add(self, key, obj):
+        """This adds obj, stored under key, to the index"""
+
+        self.remove(key)
+        texts = self.__texts_of(obj)
+        counts = {}
+        for text in texts:
+            for word in tokenize(text):
+                counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.items():
+            self.__postings.setdefault(word, {})[key] = count
+        length = sum(counts.values())
+        self.__objects[key] = obj
+        self.__texts[key] = texts
+        self.__lengths[key] = length
+        self.__total_length += length
+
+    # the objects read by reload() are added like the others
+    load = add
+
+    def remove(self, key):
+        """This removes the object stored under key from the index"""
+
+        if key not in self.__objects:
+            return
+        for text in self.__texts.pop(key):
+            for word in tokenize(text):
+                postings = self.__postings.get(word)
+                if postings is not None and postings.pop(key, None):
+                    if not postings:
+                        del self.__postings[word]
+        del self.__objects[key]
+        self.__total_length -= self.__lengths.pop(key)
+
+    def update(self, key, obj):
+        """This indexes the text of obj again if it has changed"""
+
+        if self.__texts.get(key) == self.__texts_of(obj):
+            return
+        self.add(key, obj)
+
+    def search(self, query, limit=10):
+        """This returns the list of (score, object) pairs for the
+        limit objects best matching the words of query, best first"""
+
+        if not self.__objects:
+            return []
+        count = len(self.__objects)
+        average = self.__total_length / count or 1
+        scores = {}
+        for word in set(tokenize(query)):
+            postings = self.__postings.get(word)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) /
+                           (len(postings) + 0.5))
+            for key, freq in postings.items():
+                norm = 1 - self.b + self.b * self.__lengths[key] / average
+                scores[key] = scores.get(key, 0.0) + \
+                    idf * freq * (self.k1 + 1) / (freq + self.k1 * norm)
+        best = heapq.nsmallest(limit, scores.items(),
+                               key=lambda item: (-item[1], item[0]))
+        return [(score, self.__objects[key]) for key, score in best]
+
+    def __texts_of(self, obj):
+        """This returns the tuple of the texts of obj to index"""
+
+        if self.attrs is None:
+            return tuple(value for name, value in obj.__dict__.items()
+                         if isinstance(value, str) and name != "id")
+        texts = []
+        for attr in self.attrs:
+            value = getattr(obj, attr, None)
+            if isinstance(value, str):
+                texts.append(value)
+        return tuple(texts)
+
+    def __len__(self):
+        """This returns the number of indexed objects"""
+
+        return len(self.__objects)
+
+
+def build_indexes(cls):
+    """This returns a dictionary (kind, attribute name) -> index
+    holding the indexes declared on cls"""
+
+    indexes = {}
+    for attr in getattr(cls, "__hash_indexes__", ()):
+        indexes[("hash", attr)] = HashIndex(attr)
+    for attr in getattr(cls, "__range_indexes__", ()):
+        indexes[("range", attr)] = RangeIndex(attr)
+    geo = getattr(cls, "__geo_index__", None)
+    if geo is not None:
+        indexes[("geo", None)] = GridIndex(*geo)
+    text = getattr(cls, "__text_index__", None)
+    if text is not None:
+        indexes[("text", None)] = TextIndex(text)
+    return indexes
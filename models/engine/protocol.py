@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""
+This module contains the protocol spoken over the Unix socket of the
+storage server (models/engine/server.py) by ClientStorage
+(models/engine/client_storage.py). A message is a frame: its length
+as 4 little-endian bytes, then the message encoded with marshal.
+
+A request is a (method, arguments) tuple and its response is
+(True, result), or (False, (exception class name, message)) when the
+request raised. Requests are pipelined: a client sends several of
+them at once and the server answers them in order, sending all the
+responses it has ready at once
+"""
+
+
+import marshal
+import socket
+import struct
+import threading
+from contextlib import contextmanager
+
+
+HEADER = struct.Struct("<I")
+
+# The most a frame may hold, larger lengths are taken for garbage
+MAX_FRAME = 1 << 30
+
+# The size of the reads from the socket
+RECV_SIZE = 1 << 16
+
+
+def frame(message):
+    """This returns the frame holding message"""
+
+    data = marshal.dumps(message)
+    return HEADER.pack(len(data)) + data
+
+
+class FrameReader:
+    """This is the FrameReader class. It reads the frames sent on a
+    socket and decodes their messages"""
+
+    def __init__(self, sock):
+        """Creates a reader of the frames sent on sock"""
+
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def messages(self):
+        """This waits for at least one whole frame and returns the list
+        of the messages of all the whole frames received, or an empty
+        list once the other end has closed the connection"""
+
+        while True:
+            found = self.__parse()
+            if found:
+                return found
+            chunk = self.sock.recv(RECV_SIZE)
+            if not chunk:
+                if self.buffer:
+                    raise ConnectionError("connection closed in the"
+                                          " middle of a frame")
+                return []
+            self.buffer += chunk
+
+    def __parse(self):
+        """This decodes the whole frames at the start of the buffer and
+        removes them from it"""
+
+        buffer = self.buffer
+        found = []
+        start = 0
+        while len(buffer) - start >= HEADER.size:
+            length, = HEADER.unpack_from(buffer, start)
+            if length > MAX_FRAME:
+                raise ConnectionError(f"frame of {length} bytes")
+            end = start + HEADER.size + length
+            if end > len(buffer):
+                break
+            found.append(marshal.loads(buffer[start + HEADER.size:end]))
+            start = end
+        del buffer[:start]
+        return found
+
+
+class Connection:
+    """This is the Connection class, a connection to the storage
+    server on which requests are pipelined"""
+
+    def __init__(self, path):
+        """Creates a connection to the server listening at path"""
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.reader = FrameReader(self.sock)
+
+    def pipeline(self, requests):
+        """This sends every request of the list requests at once, then
+        returns the list of their responses"""
+
+        self.sock.sendall(b"".join(map(frame, requests)))
+        responses = []
+        while len(responses) < len(requests):
+            received = self.reader.messages()
+            if not received:
+                raise ConnectionError("the storage server closed the"
+                                      " connection")
+            responses.extend(received)
+        return responses
+
+    def close(self):
+        """This closes the connection"""
+
+        self.sock.close()
+
+
+class ConnectionPool:
+    """This is the ConnectionPool class. It keeps up to size idle
+    connections to the server at path, so that the threads of a
+    client reuse them instead of connecting for each request"""
+
+    def __init__(self, path, size=4):
+        """Creates an empty pool of connections to the server at path"""
+
+        self.path = path
+        self.size = size
+        self.__idle = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """This returns a context holding a connection of the pool, or
+        a new one if none is idle. A connection on which an exception
+        was raised is closed, as its responses may be out of step"""
+
+        with self.__lock:
+            conn = self.__idle.pop() if self.__idle else None
+        if conn is None:
+            conn = Connection(self.path)
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        with self.__lock:
+            if len(self.__idle) < self.size:
+                self.__idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        """This closes the idle connections"""
+
+        with self.__lock:
+            idle, self.__idle = self.__idle, []
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+"""
+This module contains the definition of the Query class returned by
+storage.query(cls). A query is built by chaining where(), order_by()
+and limit() and runs when it is iterated, for example
+storage.query(Place).where(city_id=city.id)
+                    .where("price_by_night", "<=", 120)
+                    .order_by("price_by_night").limit(10)
+"""
+
+
+from itertools import islice
+import operator
+from models.engine.indexes import is_number
+
+
+OPERATORS = {"==": operator.eq, "!=": operator.ne,
+             "<": operator.lt, "<=": operator.le,
+             ">": operator.gt, ">=": operator.ge,
+             "in": lambda value, values: value in values}
+
+
+def order_key(value):
+    """This returns a sort key putting numbers first, in order, and
+    then every other value in order of its text"""
+
+    if is_number(value):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+class Query(object):
+    """This is the Query class. When it is iterated it picks one of
+    the indexes of storage to read the objects of cls from: the hash
+    index of an attribute compared with ==, else the range index of
+    the attribute it is ordered by or compared with, else every
+    object of cls. The other conditions are checked on each object
+    and the results are yielded one by one"""
+
+    def __init__(self, storage, cls):
+        """Creates a query on the objects of cls kept by storage"""
+
+        self.storage = storage
+        self.cls = cls
+        self.conditions = []
+        self.order = None
+        self.reverse = False
+        self.max_count = None
+
+    def where(self, *condition, **equals):
+        """This adds conditions the objects must meet, either one
+        (attribute, operator, value) condition such as
+        where("max_guest", ">=", 4), or attribute=value equalities,
+        and returns the query"""
+
+        if condition:
+            attr, op, value = condition
+            if op not in OPERATORS:
+                raise ValueError(f"unknown operator {op!r}")
+            self.conditions.append((attr, op, value))
+        for attr, value in equals.items():
+            self.conditions.append((attr, "==", value))
+        return self
+
+    def order_by(self, attr, reverse=False):
+        """This orders the results on attr, decreasing if reverse
+        is True or attr starts with "-", and returns the query"""
+
+        if attr.startswith("-"):
+            attr = attr[1:]
+            reverse = not reverse
+        self.order = attr
+        self.reverse = reverse
+        return self
+
+    def limit(self, count):
+        """This keeps only the first count results and returns
+        the query"""
+
+        self.max_count = count
+        return self
+
+    def explain(self):
+        """This returns a description of the way the objects are read"""
+
+        with self.storage.reading():
+            return self.__plan()[0]
+
+    def all(self):
+        """This returns the list of the results"""
+
+        return list(self)
+
+    def first(self):
+        """This returns the first result, or None if there is none"""
+
+        return next(iter(self), None)
+
+    def __iter__(self):
+        """This yields the results of the query"""
+
+        # the candidates are copies, read once the storage may change
+        with self.storage.reading():
+            plan, objs, ordered = self.__plan()
+        results = (obj for obj in objs if self.__matches(obj))
+        if self.order is not None and not ordered:
+            results = sorted(
+                results, reverse=self.reverse,
+                key=lambda obj: order_key(getattr(obj, self.order, None)))
+        if self.max_count is not None:
+            results = islice(results, self.max_count)
+        return iter(results)
+
+    def __plan(self):
+        """This returns (description, objects, ordered) where objects
+        is an iterable of the candidates and ordered tells whether
+        they already come in the requested order"""
+
+        c_name = self.cls if isinstance(self.cls, str) else \
+            self.cls.__name__
+        index_of = self.storage.index
+        best = None
+        for attr, op, value in self.conditions:
+            if op != "==":
+                continue
+            index = index_of(self.cls, "hash", attr)
+            if index is None:
+                continue
+            bucket = index.find(value)
+            if bucket is not None and (best is None
+                                       or len(bucket) < len(best[1])):
+                best = (attr, bucket)
+        if best is not None:
+            return (f"hash index {c_name}.{best[0]}",
+                    list(best[1].values()), False)
+
+        bounded = [attr for attr, op, value in self.conditions
+                   if op in ("==", "<", "<=", ">", ">=")
+                   and is_number(value)]
+        attrs = bounded if self.order is None else [self.order] + bounded
+        for attr in attrs:
+            index = index_of(self.cls, "range", attr)
+            if index is None:
+                continue
+            if attr not in bounded and \
+                    len(index) != self.storage.count(self.cls):
+                # only ordered on attr, and some objects hold a value
+                # that is not a number and so is not in the index
+                continue
+            low, high = self.__bounds(attr)
+            ordered = attr == self.order
+            return (f"range index {c_name}.{attr} [{low}, {high}]",
+                    index.range(low, high, ordered and self.reverse),
+                    ordered)
+
+        return (f"scan {c_name}", self.storage.all(self.cls).values(),
+                False)
+
+    def __bounds(self, attr):
+        """This returns the (low, high) bounds the conditions put on
+        the numeric attribute attr, None meaning no bound"""
+
+        low = high = None
+        for name, op, value in self.conditions:
+            if name != attr or not is_number(value):
+                continue
+            if op in ("==", ">", ">=") and (low is None or value > low):
+                low = value
+            if op in ("==", "<", "<=") and (high is None or value < high):
+                high = value
+        return low, high
+
+    def __matches(self, obj):
+        """This tells whether obj meets every condition"""
+
+        for attr, op, value in self.conditions:
+            try:
+                if not OPERATORS[op](getattr(obj, attr, None), value):
+                    return False
+            except TypeError:
+                return False
+        return True
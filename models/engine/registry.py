@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+This module contains the registry of the model classes. BaseModel and
+each of its subclasses add themselves to MODELS when they are defined,
+so that the storage engines and the console find a class from its
+name with a single lookup. A new model only has to be a subclass of
+BaseModel in a module of the models package.
+
+It also holds the storages to tell when an attribute of an object is
+set, every storage and not only models.storage, so that each storage
+holding the object records the change
+"""
+
+
+import importlib
+import os
+import threading
+import weakref
+
+
+# The model classes by name
+MODELS = {}
+
+_all_loaded = False
+
+# Weak references to the storages told of the changes. The tuple is
+# replaced rather than changed, so that it is read without a lock
+_storages = ()
+_storages_lock = threading.Lock()
+
+
+def register(cls):
+    """This adds cls to the registry and returns it"""
+
+    MODELS[cls.__name__] = cls
+    return cls
+
+
+def load_models():
+    """This imports every module of the models package, once, so that
+    all the model classes are registered"""
+
+    global _all_loaded
+    if _all_loaded:
+        return
+    import models
+    for path in models.__path__:
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".py") and name != "__init__.py":
+                importlib.import_module("models." + name[:-3])
+    _all_loaded = True
+
+
+def get_model(name):
+    """This returns the model class called name. KeyError is raised
+    if there is none"""
+
+    try:
+        return MODELS[name]
+    except KeyError:
+        load_models()
+        return MODELS[name]
+
+
+def add_storage(storage):
+    """This adds storage to the storages whose mark_dirty() is called
+    when an attribute of an object is set, until it is collected"""
+
+    global _storages
+    with _storages_lock:
+        _storages += (weakref.ref(storage, _remove_storage),)
+
+
+def _remove_storage(ref):
+    """This forgets the storage of ref once it is collected"""
+
+    global _storages
+    with _storages_lock:
+        _storages = tuple(other for other in _storages if other is not ref)
+
+
+def notify_changed(obj, name, old):
+    """This tells every storage that the attribute name of obj was set,
+    its previous value being old"""
+
+    for ref in _storages:
+        storage = ref()
+        if storage is not None:
+            storage.mark_dirty(obj, name, old)
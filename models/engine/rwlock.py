@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""
+This module contains the RWLock class, the reader-writer lock of
+FileStorage: any number of threads may read the objects at the same
+time, while a thread changing them is alone
+"""
+
+
+import threading
+
+
+class _Side:
+    """This is one side of an RWLock, used in a with statement"""
+
+    def __init__(self, acquire, release):
+        """Creates the side from its acquire and release methods"""
+
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        """This acquires the side"""
+
+        self.acquire()
+
+    def __exit__(self, *exc):
+        """This releases the side"""
+
+        self.release()
+
+
+class RWLock:
+    """This is the RWLock class. Its read and write attributes are
+    used in with statements. Both sides are reentrant, and the thread
+    holding the write side may also take the read side, but a thread
+    holding only the read side must not ask for the write side:
+    RuntimeError is raised as it would wait forever. Waiting writers
+    go before new readers, so that a stream of readers does not keep
+    a writer out"""
+
+    def __init__(self):
+        """Creates an unlocked lock"""
+
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = {}
+        self.__writer = None
+        self.__writes = 0
+        self.__waiting = 0
+        self.read = _Side(self.acquire_read, self.release_read)
+        self.write = _Side(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        """This waits until no other thread writes, then takes the
+        read side"""
+
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer != me and me not in self.__readers:
+                while self.__writer is not None or self.__waiting:
+                    self.__cond.wait()
+            self.__readers[me] = self.__readers.get(me, 0) + 1
+
+    def release_read(self):
+        """This releases the read side"""
+
+        me = threading.get_ident()
+        with self.__cond:
+            count = self.__readers[me] - 1
+            if count:
+                self.__readers[me] = count
+            else:
+                del self.__readers[me]
+                self.__cond.notify_all()
+
+    def acquire_write(self):
+        """This waits until no other thread reads or writes, then takes
+        the write side"""
+
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__writes += 1
+                return
+            if me in self.__readers:
+                raise RuntimeError("cannot write while holding the read"
+                                   " side of the lock")
+            self.__waiting += 1
+            try:
+                while self.__writer is not None or self.__readers:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__writer = me
+            self.__writes = 1
+
+    def release_write(self):
+        """This releases the write side"""
+
+        with self.__cond:
+            self.__writes -= 1
+            if not self.__writes:
+                self.__writer = None
+                self.__cond.notify_all()
@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+"""
+This module contains the serializers FileStorage writes its files
+with. Each one turns (key, dictionary) pairs into bytes and reads
+them back one pair at a time:
+
+- json, the default: a JSON object, as the files have always been
+- marshal: records made of their length packed with struct and the
+  pair dumped with marshal, smaller and several times faster
+- pickle: the pairs pickled with protocol 5. Only plain values are
+  loaded back, a file asking for any class is refused
+
+The binary serializers leave out the "id" and "__class__" items of the
+dictionaries, which the key already holds
+
+Binary files start with a header naming their format so that
+detect() can tell which serializer reads a file, once the file is
+decompressed (see models/engine/compression.py)
+"""
+
+
+import io
+import json
+import marshal
+import pickle
+import struct
+from models.engine.compression import open_read
+
+
+def iter_json_objects(f, chunk_size=65536):
+    """This yields the (key, value) pairs of the JSON object stored
+    in the text file f one at a time. Only the pair being decoded is
+    held in memory besides a buffer of about chunk_size characters"""
+
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        """reads the next chunk into buf, dropping what was consumed"""
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_spaces():
+        """moves pos to the next character that is not a space"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def expect(chars):
+        """consumes one of chars and returns it"""
+        nonlocal pos
+        skip_spaces()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}",
+                                       buf, pos)
+        pos += 1
+        return buf[pos - 1]
+
+    def decode():
+        """decodes the next value, reading more until it is whole"""
+        nonlocal pos
+        skip_spaces()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # a number may go on in the next chunk
+                fill()
+                continue
+            pos = end
+            return value
+
+    fill()
+    expect("{")
+    skip_spaces()
+    if pos < len(buf) and buf[pos] == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+        if pos > chunk_size:
+            fill()
+
+
+def strip(key, value):
+    """This returns value without the items that key holds"""
+
+    value = dict(value)
+    value.pop("id", None)
+    value.pop("__class__", None)
+    return value
+
+
+def restore(key, value):
+    """This puts back in value the items that strip() left out"""
+
+    value["__class__"], value["id"] = key.split(".", 1)
+    return value
+
+
+class Serializer(object):
+    """This is the base class of the serializers. A file is opening,
+    then the fragments of the pairs separated by separator, then
+    closing"""
+
+    header = b""
+    opening = b""
+    separator = b""
+    closing = b""
+
+    def chunks(self, fragments):
+        """This yields the content of a file holding the fragments of
+        the iterable fragments, piece by piece"""
+
+        yield self.opening
+        separator = b""
+        for fragment in fragments:
+            if separator:
+                yield separator
+            yield fragment
+            separator = self.separator
+        if self.closing:
+            yield self.closing
+
+    def offsets(self, lengths):
+        """This yields the offset in the file of each fragment, given
+        the lengths of the fragments in order"""
+
+        position = len(self.opening)
+        for length in lengths:
+            yield position
+            position += length + len(self.separator)
+
+
+class JSONSerializer(Serializer):
+    """This is the JSONSerializer class. A file is one JSON object
+    mapping each key to its dictionary"""
+
+    name = "json"
+    suffix = ".json"
+    opening = b"{"
+    separator = b", "
+    closing = b"}"
+
+    def fragment(self, key, value):
+        """This returns the bytes of the pair (key, value), which the
+        storage caches until the object changes"""
+
+        return (json.dumps(key) + ": " + json.dumps(value)).encode("utf-8")
+
+    def decode(self, fragment):
+        """This returns the pair (key, dictionary) of fragment"""
+
+        return next(iter(json.loads(b"{" + fragment + b"}").items()))
+
+    def load(self, f):
+        """This yields the (key, dictionary) pairs of the binary
+        file f, positioned after the header"""
+
+        text = io.TextIOWrapper(f, encoding="utf-8")
+        try:
+            yield from iter_json_objects(text)
+        finally:
+            text.detach()
+
+
+class MarshalSerializer(Serializer):
+    """This is the MarshalSerializer class. A file is the header
+    followed by one record per pair: its length as a 4 bytes little
+    endian integer, then the pair dumped by marshal"""
+
+    name = "marshal"
+    suffix = ".bin"
+    header = opening = b"HBNB marshal 1\n"
+    length = struct.Struct("<I")
+
+    def fragment(self, key, value):
+        """This returns the record of the pair (key, value)"""
+
+        data = marshal.dumps((key, strip(key, value)))
+        return self.length.pack(len(data)) + data
+
+    def decode(self, fragment):
+        """This returns the pair (key, dictionary) of fragment"""
+
+        key, value = marshal.loads(fragment[self.length.size:])
+        return key, restore(key, value)
+
+    def load(self, f):
+        """This yields the (key, dictionary) pairs of the binary
+        file f, positioned after the header"""
+
+        size = self.length.size
+        while True:
+            prefix = f.read(size)
+            if not prefix:
+                return
+            if len(prefix) < size:
+                raise ValueError("truncated marshal record")
+            data = f.read(self.length.unpack(prefix)[0])
+            key, value = marshal.loads(data)
+            yield key, restore(key, value)
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    """This is an Unpickler that refuses to load any class or
+    function, so that a file can only hold plain values"""
+
+    def find_class(self, module, name):
+        """This refuses every global"""
+
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed")
+
+
+class PickleSerializer(Serializer):
+    """This is the PickleSerializer class. A file is the header
+    followed by each pair pickled with protocol 5"""
+
+    name = "pickle"
+    suffix = ".pickle"
+    header = opening = b"HBNB pickle 5\n"
+
+    def fragment(self, key, value):
+        """This returns the pickle of the pair (key, value)"""
+
+        return pickle.dumps((key, strip(key, value)), protocol=5)
+
+    def decode(self, fragment):
+        """This returns the pair (key, dictionary) of fragment"""
+
+        key, value = _PlainUnpickler(io.BytesIO(fragment)).load()
+        return key, restore(key, value)
+
+    def load(self, f):
+        """This yields the (key, dictionary) pairs of the binary
+        file f, positioned after the header"""
+
+        unpickler = _PlainUnpickler(f)
+        while True:
+            try:
+                key, value = unpickler.load()
+            except EOFError:
+                return
+            yield key, restore(key, value)
+
+
+SERIALIZERS = {serializer.name: serializer for serializer in
+               (JSONSerializer(), MarshalSerializer(), PickleSerializer())}
+
+
+def get_serializer(name):
+    """This returns the serializer called name"""
+
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError(f"unknown serializer {name!r}") from None
+
+
+def detect(f):
+    """This returns the serializer that wrote the binary file f and
+    moves f after its header. Files without a header are JSON"""
+
+    start = f.read(max(len(s.header) for s in SERIALIZERS.values()))
+    for serializer in SERIALIZERS.values():
+        if serializer.header and start.startswith(serializer.header):
+            f.seek(len(serializer.header))
+            return serializer
+    f.seek(0)
+    return SERIALIZERS["json"]
+
+
+def load_file(path):
+    """This yields the (key, dictionary) pairs of the file at path,
+    whatever serializer wrote it and compressed or not"""
+
+    with open_read(path) as f:
+        yield from detect(f).load(f)
@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+"""
+This module contains the storage server: a process that owns the
+objects of a storage and serves them to ClientStorage instances
+(models/engine/client_storage.py) over a Unix socket, so that many
+short-lived consoles and scripts share one loaded store instead of
+each reading the files. See models/engine/protocol.py for the
+protocol. It is started from the root of the repository with:
+
+    python3 -m models.engine.server [socket path]
+
+The served storage is the one chosen by the HBNB_* environment
+variables, see README.md; the socket path defaults to
+HBNB_SOCKET_PATH, or hbnb.sock
+"""
+
+
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+from models.engine.protocol import FrameReader, frame
+
+
+class StorageHandler(socketserver.BaseRequestHandler):
+    """This is the StorageHandler class. It serves one connection,
+    answering its requests in order"""
+
+    def handle(self):
+        """This answers the requests until the client disconnects. The
+        responses to the requests received together are sent
+        together"""
+
+        reader = FrameReader(self.request)
+        dispatch = self.server.dispatch
+        while True:
+            requests = reader.messages()
+            if not requests:
+                return
+            self.request.sendall(b"".join(frame(dispatch(request))
+                                          for request in requests))
+
+
+class StorageServer(socketserver.ThreadingMixIn,
+                    socketserver.UnixStreamServer):
+    """This is the StorageServer class. It serves storage to the
+    clients connecting to the Unix socket at path, each connection
+    in its own thread, so storage must be thread safe as FileStorage
+    is. The socket may only be used by the user running the server"""
+
+    daemon_threads = True
+
+    def __init__(self, path, storage):
+        """Creates a server of storage listening at path. A socket left
+        at path by a server that is gone is replaced"""
+
+        self.path = path
+        self.storage = storage
+        remove_stale_socket(path)
+        super().__init__(path, StorageHandler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        """This stops listening and removes the socket"""
+
+        super().server_close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def dispatch(self, request):
+        """This returns the response to request"""
+
+        try:
+            method, args = request
+            handler = getattr(self, "op_" + method, None)
+            if handler is None:
+                raise ValueError(f"unknown request {method!r}")
+            return True, handler(*args)
+        except Exception as e:
+            return False, (type(e).__name__, str(e))
+
+    def op_ping(self):
+        """This answers that the server is up"""
+
+        return True
+
+    def op_all(self, c_name=None):
+        """This returns the (key, dictionary) pairs of all objects, or
+        only of the objects of the class c_name"""
+
+        with self.storage.reading():
+            return [(key, obj.to_dict())
+                    for key, obj in self.storage.all(c_name).items()]
+
+    def op_count(self, c_name=None):
+        """This returns the number of objects"""
+
+        return self.storage.count(c_name)
+
+    def op_get(self, c_name, ide):
+        """This returns the dictionary of an object, or None"""
+
+        obj = self.storage.get(c_name, ide)
+        return None if obj is None else obj.to_dict()
+
+    def op_find(self, c_name, attrs):
+        """This returns the (key, dictionary) pairs of find()"""
+
+        return pairs(self.storage.find(c_name, **attrs))
+
+    def op_find_range(self, c_name, attr, low, high, reverse):
+        """This returns the (key, dictionary) pairs of find_range()"""
+
+        return pairs(self.storage.find_range(c_name, attr, low, high,
+                                             reverse))
+
+    def op_near(self, c_name, latitude, longitude, radius_km):
+        """This returns the (key, dictionary) pairs of near()"""
+
+        return pairs(self.storage.near(self.storage.classes(c_name),
+                                       latitude, longitude, radius_km))
+
+    def op_nearest(self, c_name, latitude, longitude, k):
+        """This returns the (key, dictionary) pairs of nearest()"""
+
+        return pairs(self.storage.nearest(self.storage.classes(c_name),
+                                          latitude, longitude, k))
+
+    def op_search(self, c_name, query, limit):
+        """This returns the (key, dictionary) pairs of search()"""
+
+        return pairs(self.storage.search(c_name, query, limit))
+
+    def op_put(self, key, dic):
+        """This stores the object of key built from dic, replacing the
+        one there was"""
+
+        c_name = key.split(".")[0]
+        self.storage.new(self.storage.classes(c_name).from_dict(dic))
+
+    def op_delete(self, key):
+        """This deletes the object of key if there is one"""
+
+        c_name, ide = key.split(".", 1)
+        obj = self.storage.get(c_name, ide)
+        if obj is not None:
+            self.storage.delete(obj)
+
+    def op_save(self):
+        """This saves the storage"""
+
+        self.storage.save()
+
+
+def pairs(objs):
+    """This returns the (key, dictionary) pairs of the objects objs"""
+
+    return [(f"{type(obj).__name__}.{obj.id}", obj.to_dict())
+            for obj in objs]
+
+
+def remove_stale_socket(path):
+    """This removes the socket at path if no server listens on it"""
+
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except ConnectionRefusedError:
+        os.remove(path)
+    except OSError:
+        pass
+    else:
+        raise OSError(f"a server already listens at {path}")
+    finally:
+        sock.close()
+
+
+def main(argv):
+    """This serves the storage of the environment until the process
+    is interrupted or terminated, then writes the saves still
+    pending in write-behind mode"""
+
+    from models import storage
+    from models.engine.file_storage import FileStorage
+    if not isinstance(storage, FileStorage):
+        # the other engines may only be used from a single thread
+        sys.exit("the storage server serves a FileStorage, unset"
+                 " HBNB_TYPE_STORAGE")
+    path = argv[1] if len(argv) > 1 else \
+        os.getenv("HBNB_SOCKET_PATH", "hbnb.sock")
+    # the objects are read now rather than by the first client
+    storage.all()
+    server = StorageServer(path, storage)
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        storage.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -12,6 +12,12 @@ class Place(BaseModel):
     """This is the Place class that is a subclass of the
     BaseModel Class"""
 
+    __hash_indexes__ = ("city_id", "user_id")
+    __range_indexes__ = ("price_by_night", "max_guest",
+                         "number_rooms", "number_bathrooms")
+    __geo_index__ = ("latitude", "longitude")
+    __text_index__ = ("name", "description")
+
     city_id = ""
     user_id = ""
     name = ""
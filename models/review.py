@@ -12,6 +12,9 @@ class Review(BaseModel):
     """This is the Review class that is a subclass of the
     BaseModel Class"""
 
+    __hash_indexes__ = ("place_id", "user_id")
+    __text_index__ = ("text",)
+
     place_id = ""
     user_id = ""
     text = ""
@@ -200,6 +200,31 @@ class TestAllCommand(unittest.TestCase):
             test = f.getvalue()
             self.assertEqual(str_obj_list, test)
 
+    def test_all_while_changed(self):
+        """Tests that another thread changing the objects waits until
+        all command has read them"""
+        import threading
+        from models import storage
+        from models.base_model import BaseModel
+
+        BaseModel()
+        threads = []
+
+        def change(obj):
+            """Starts a thread adding an object, once"""
+            if not threads:
+                threads.append(threading.Thread(target=BaseModel))
+                threads[0].start()
+                threads[0].join(0.1)
+                self.assertTrue(threads[0].is_alive())
+            return object.__str__(obj)
+        with patch('sys.stdout', new=StringIO()):
+            with patch.object(BaseModel, "__str__", change):
+                HBNBCommand().onecmd("all")
+        threads[0].join()
+        with patch('sys.stdout', new=StringIO()):
+            HBNBCommand().onecmd("all")
+
 
 class TestAllCommandError(unittest.TestCase):
     """Tests the all command of the console with faulty input"""
@@ -728,6 +753,58 @@ class TestCountCommandError(unittest.TestCase):
             self.assertEqual(test, err_message)
 
 
+class TestSearchCommand(unittest.TestCase):
+    """Tests the search command of the console with normal input"""
+
+    def test_search_place(self):
+        """Tests that search prints the matching places, best first"""
+        from models.place import Place
+        import uuid
+
+        word = uuid.uuid4().hex
+        place1 = Place()
+        place1.name = f"{word} loft"
+        place1.description = f"{word} view"
+        place2 = Place()
+        place2.name = f"{word} house"
+        place2.description = "with a big garden"
+        Place().name = "Beach house"
+        expected = str([str(place1), str(place2)]) + "\n"
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd(f"search Place {word}")
+            test = f.getvalue()
+            self.assertEqual(test, expected)
+
+
+class TestSearchCommandError(unittest.TestCase):
+    """Tests the search command of the console with faulty input"""
+
+    def test_search_missing_class(self):
+        """Tests the error shown when search is called without class"""
+        err_message = "** class name missing **\n"
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd("search")
+            test = f.getvalue()
+            self.assertEqual(test, err_message)
+
+    def test_search_wrong_class(self):
+        """Tests the error shown when search is called with a class
+        that doesn't exist"""
+        err_message = "** class doesn't exist **\n"
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd("search MyModel pool")
+            test = f.getvalue()
+            self.assertEqual(test, err_message)
+
+    def test_search_missing_words(self):
+        """Tests the error shown when search is called without words"""
+        err_message = "** search words missing **\n"
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd("search Place")
+            test = f.getvalue()
+            self.assertEqual(test, err_message)
+
+
 class TestAdvancedShowCommand(unittest.TestCase):
     """Tests the show command of the console with normal input (advanced)"""
 
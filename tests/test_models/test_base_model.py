@@ -6,6 +6,8 @@ import unittest
 from models.base_model import BaseModel
 from models import storage
 from datetime import datetime
+from unittest.mock import patch
+from models.place import Place
 
 
 class TestInstantiation(unittest.TestCase):
@@ -224,3 +226,88 @@ T21:05:54.119427'}
         dic = model.__dict__
         with self.assertRaises(KeyError):
             dic['__class__']
+
+
+class TestFromDict(unittest.TestCase):
+    """This contains the unittests for the from_dict class method"""
+
+    def test_same_as_kwargs(self):
+        """This tests that from_dict builds the same instance as
+        __init__ with the dictionary as kwargs"""
+        dic = {'my_number': 89, 'name': 'My First Model', '__class__': 'BaseMo\
+del', 'updated_at': '2017-09-28T21:05:54.119572', 'id': 'b6a6e15c-c67d-4312-9a\
+75-9d084935e579', 'created_at': '2017-09-28T21:05:54.119427'}
+        model1 = BaseModel(**dic)
+        model2 = BaseModel.from_dict(dict(dic))
+        self.assertIs(type(model2), BaseModel)
+        self.assertEqual(model1.__dict__, model2.__dict__)
+        self.assertIsInstance(model2.created_at, datetime)
+        self.assertEqual(model2.to_dict(), dic)
+
+    def test_subclass(self):
+        """This tests that from_dict builds an instance of the class
+        it is called on"""
+        place = Place()
+        place.name = "Loft"
+        copy = Place.from_dict(place.to_dict())
+        self.assertIs(type(copy), Place)
+        self.assertEqual(copy.to_dict(), place.to_dict())
+        self.assertEqual(copy.created_at, place.created_at)
+        self.assertEqual(copy.updated_at, place.updated_at)
+        self.assertEqual(copy.__dict__, place.__dict__)
+
+    def test_not_stored_nor_marked(self):
+        """This tests that from_dict neither adds the instance to the
+        storage nor reports its attributes"""
+        model = BaseModel()
+        dic = model.to_dict()
+        storage.delete(model)
+        with patch.object(storage, "mark_dirty") as mark_dirty:
+            copy = BaseModel.from_dict(dic)
+        self.assertEqual(mark_dirty.call_count, 0)
+        self.assertIsNone(storage.get(BaseModel, copy.id))
+
+
+class TestLazyDatetime(unittest.TestCase):
+    """This contains the unittests for the datetimes parsed when
+    they are first read"""
+
+    def setUp(self):
+        """Creates an instance holding the ISO strings"""
+        self.dic = {'__class__': 'BaseModel', 'updated_at': '2017-09-28T21:05:\
+54.119572', 'id': 'b6a6e15c-c67d-4312-9a75-9d084935e579', 'created_at': '2017-\
+09-28T21:05:54.119427'}
+        self.model = BaseModel.from_dict(dict(self.dic))
+
+    def test_parsed_when_read(self):
+        """This tests that a datetime is parsed the first time it is
+        read, and only then"""
+        self.assertEqual(self.model.__dict__['created_at'],
+                         self.dic['created_at'])
+        self.assertEqual(self.model.created_at,
+                         datetime.fromisoformat(self.dic['created_at']))
+        self.assertIsInstance(self.model.__dict__['created_at'], datetime)
+        self.assertEqual(self.model.__dict__['updated_at'],
+                         self.dic['updated_at'])
+
+    def test_to_dict_keeps_strings(self):
+        """This tests that to_dict reuses the ISO strings without
+        parsing them"""
+        with patch('models.base_model.datetime') as mock_datetime:
+            self.assertEqual(self.model.to_dict(), self.dic)
+        self.assertEqual(mock_datetime.fromisoformat.call_count, 0)
+        self.model.updated_at = datetime(2020, 1, 1)
+        self.assertEqual(self.model.to_dict()['updated_at'],
+                         '2020-01-01T00:00:00')
+
+    def test_str_shows_datetimes(self):
+        """This tests that __str__ shows the datetimes parsed"""
+        output = str(self.model)
+        self.assertIn("datetime.datetime(2017, 9, 28", output)
+        self.assertNotIn(self.dic['created_at'], output)
+
+    def test_not_iso(self):
+        """This tests that a string that is not ISO is kept as is"""
+        self.model.created_at = "yesterday"
+        self.assertEqual(self.model.created_at, "yesterday")
+        self.assertEqual(self.model.to_dict()['created_at'], "yesterday")
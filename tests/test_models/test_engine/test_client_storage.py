@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""This contains unittests for the ClientStorage class and the
+storage server"""
+
+
+import unittest
+from models.place import Place
+from models.user import User
+from models.engine.client_storage import ClientStorage
+from models.engine.file_storage import FileStorage
+from models.engine.protocol import Connection, FrameReader, frame
+from models.engine.server import StorageServer
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from unittest.mock import patch
+
+
+class TestClientStorage(unittest.TestCase):
+    """This tests the methods of the ClientStorage Class against a
+    server running in a thread"""
+
+    def setUp(self):
+        """Starts a server of a storage in a temporary directory"""
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "file.json")
+        self.socket_path = os.path.join(self.tmp, "hbnb.sock")
+        self.served = FileStorage(self.path)
+        self.server = StorageServer(self.socket_path, self.served)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.01,))
+        self.thread.start()
+        self.storage = self.client()
+
+    def tearDown(self):
+        """Stops the server and removes the temporary files"""
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.tmp)
+
+    def client(self):
+        """Returns a new client of the server"""
+        client = ClientStorage(self.socket_path)
+        self.addCleanup(client.close)
+        return client
+
+    def test_save_and_get(self):
+        """This tests that saved objects are found by other clients
+        and written by the server"""
+        user = User()
+        user.first_name = "Betty"
+        self.storage.new(user)
+        self.storage.save()
+        found = self.client().get(User, user.id)
+        self.assertEqual(found.first_name, "Betty")
+        self.assertEqual(found.created_at, user.created_at)
+        self.assertIs(type(found), User)
+        self.assertIsNone(self.client().get(User, "nope"))
+        self.assertEqual(FileStorage(self.path).count(User), 1)
+
+    def test_all_and_count(self):
+        """This tests all() and count(), which see the changes not
+        sent yet"""
+        users = [User() for i in range(3)]
+        for user in users:
+            self.storage.new(user)
+        self.storage.new(Place())
+        self.assertEqual(self.storage.count(), 4)
+        self.assertEqual(self.storage.count(User), 3)
+        self.assertEqual(len(self.storage.all(Place)), 1)
+        all_objs = self.storage.all()
+        self.assertIs(all_objs[f"User.{users[0].id}"], users[0])
+        self.storage.delete(users[0])
+        self.assertEqual(self.client().count("User"), 3)
+        self.assertEqual(self.storage.count("User"), 2)
+        self.assertEqual(self.client().count("User"), 2)
+
+    def test_changed_elsewhere(self):
+        """This tests that an object changed by another client is
+        updated in place"""
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        other_client = self.client()
+        other = other_client.get(User, user.id)
+        self.assertIsNot(other, user)
+        other.first_name = "Holberton"
+        other_client.save()
+        self.assertIs(self.storage.get(User, user.id), user)
+        self.assertEqual(user.first_name, "Holberton")
+
+    def test_lookups(self):
+        """This tests find(), find_range(), near() and search()"""
+        for i in range(5):
+            place = Place()
+            place.name = f"place {i}"
+            place.number_rooms = i
+            place.latitude = 48.0 + i
+            place.longitude = 2.0
+            self.storage.new(place)
+        self.assertEqual([p.name for p in
+                          self.storage.find(Place, number_rooms=3)],
+                         ["place 3"])
+        self.assertEqual([p.number_rooms for p in
+                          self.storage.find_range(Place, "number_rooms",
+                                                  1, 3, reverse=True)],
+                         [3, 2, 1])
+        self.assertEqual([p.name for p in
+                          self.storage.nearest(Place, 50.1, 2.0)],
+                         ["place 2"])
+        self.assertEqual(len(self.storage.near(Place, 48.0, 2.0, 120)), 2)
+        self.assertEqual(self.storage.search(Place, "place")[0].__class__,
+                         Place)
+        self.assertEqual(self.storage.query(Place)
+                         .where(number_rooms=4).first().name, "place 4")
+
+    def test_pipelined(self):
+        """This tests that the changes and the request are sent in one
+        round trip, on a connection of the pool"""
+        with patch.object(Connection, "pipeline",
+                          autospec=True,
+                          side_effect=Connection.pipeline) as pipeline:
+            for i in range(5):
+                self.storage.new(User())
+            self.storage.save()
+            self.storage.count()
+        self.assertEqual(pipeline.call_count, 2)
+        self.assertEqual(len(pipeline.call_args_list[0][0][1]), 6)
+        with patch.object(Connection, "__init__",
+                          side_effect=AssertionError) as connect:
+            self.storage.count()
+        self.assertEqual(connect.call_count, 0)
+
+    def test_errors(self):
+        """This tests that an exception raised by the server is raised
+        by the client, the changes staying to be sent"""
+        self.storage.new(User())
+        with patch.object(StorageServer, "op_count",
+                          side_effect=KeyError("boom")):
+            self.assertRaises(KeyError, self.storage.count)
+        self.assertEqual(self.storage.count(User), 1)
+        self.assertRaises(ValueError,
+                          self.storage._ClientStorage__call, "nope")
+
+    def test_threads(self):
+        """This tests clients used from several threads"""
+        errors = []
+
+        def work():
+            try:
+                client = ClientStorage(self.socket_path)
+                for i in range(20):
+                    client.new(User())
+                    client.save()
+                client.close()
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(FileStorage(self.path).count(User), 80)
+
+    def test_frames(self):
+        """This tests that the frames received in pieces or together
+        are all read"""
+        left, right = socket.socketpair()
+        data = frame(("put", ("User.1", {"a": 1}))) + frame(("save", ()))
+        left.sendall(data[:3])
+        left.sendall(data[3:])
+        left.close()
+        reader = FrameReader(right)
+        messages = []
+        while True:
+            received = reader.messages()
+            if not received:
+                break
+            messages.extend(received)
+        right.close()
+        self.assertEqual(messages, [("put", ("User.1", {"a": 1})),
+                                    ("save", ())])
+
+
+if __name__ == "__main__":
+    unittest.main()
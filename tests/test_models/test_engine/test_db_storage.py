@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""This contains unittests for the DBStorage class"""
+
+
+import unittest
+from models.base_model import BaseModel
+from models.place import Place
+from models.user import User
+from models.engine.db_storage import DBStorage
+import gc
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+
+class TestDBStorage(unittest.TestCase):
+    """This tests the methods of the DBStorage Class"""
+
+    def setUp(self):
+        """Creates a storage on a temporary database"""
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "hbnb.db")
+        self.storage = DBStorage(self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        """Closes the storage and removes the database"""
+        self.storage.close()
+        shutil.rmtree(self.tmp)
+
+    def reopen(self):
+        """Returns a new storage on the same database"""
+        new_storage = DBStorage(self.path)
+        new_storage.reload()
+        self.addCleanup(new_storage.close)
+        return new_storage
+
+    def test_all_return_type(self):
+        """This tests that the all() method returns a dictionary"""
+        self.assertEqual(type(self.storage.all()), dict)
+
+    def test_new_and_all(self):
+        """This tests that new objects are returned by all()"""
+        user = User()
+        self.storage.new(user)
+        self.assertTrue(f"User.{user.id}" in self.storage.all())
+
+    def test_save_and_reload(self):
+        """This tests that saved objects are read back"""
+        user = User()
+        user.first_name = "Betty"
+        self.storage.new(user)
+        self.storage.save()
+        all_objs = self.reopen().all()
+        key = f"User.{user.id}"
+        self.assertTrue(key in all_objs)
+        self.assertEqual(all_objs[key].first_name, "Betty")
+        self.assertEqual(all_objs[key].created_at, user.created_at)
+        self.assertEqual(type(all_objs[key]), User)
+
+    def test_get(self):
+        """This tests that get() reads a single object"""
+        place = Place()
+        self.storage.new(place)
+        self.storage.save()
+        new_storage = self.reopen()
+        self.assertEqual(new_storage.get(Place, place.id).id, place.id)
+        self.assertIsNone(new_storage.get(Place, "1234"))
+
+    def test_save_only_writes_changed(self):
+        """This tests that save() only writes the dirty objects"""
+        model1 = BaseModel()
+        model2 = BaseModel()
+        self.storage.new(model1)
+        self.storage.new(model2)
+        self.storage.save()
+        model1.name = "My_First_Model"
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        before = conn.total_changes
+        self.storage.save()
+        obj = self.reopen().get(BaseModel, model1.id)
+        self.assertEqual(obj.name, "My_First_Model")
+        self.assertEqual(conn.total_changes, before)
+
+    def test_delete(self):
+        """This tests that deleted objects are removed from the table"""
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        self.storage.delete(user)
+        self.assertFalse(f"User.{user.id}" in self.storage.all())
+        self.storage.save()
+        self.assertFalse(f"User.{user.id}" in self.reopen().all())
+
+    def test_all_and_count_with_class(self):
+        """This tests that all(cls) and count(cls) only use the
+        objects of cls"""
+        user = User()
+        self.storage.new(user)
+        self.storage.new(Place())
+        self.storage.save()
+        new_storage = self.reopen()
+        self.assertEqual(list(new_storage.all(User)), [f"User.{user.id}"])
+        self.assertEqual(new_storage.count("Place"), 1)
+        self.assertEqual(new_storage.count(BaseModel), 0)
+
+    def test_count_reads_no_object(self):
+        """This tests that count() counts the rows without building
+        the objects, with the objects created and deleted but not
+        saved"""
+        users = [User() for i in range(3)]
+        for user in users:
+            self.storage.new(user)
+        self.storage.new(Place())
+        self.storage.save()
+        new_storage = self.reopen()
+        with patch.object(DBStorage, "_DBStorage__build") as build:
+            new_storage.new(User())
+            new_storage.delete(new_storage.get(User, users[0].id))
+            build.reset_mock()
+            new_storage.delete(users[1])
+            self.assertEqual(new_storage.count(), 4)
+            self.assertEqual(new_storage.count(User), 3)
+            self.assertEqual(new_storage.count("Place"), 1)
+        self.assertEqual(build.call_count, 0)
+
+    def test_objects_not_kept(self):
+        """This tests that the objects read are only kept while they
+        are held, and stay the same objects meanwhile"""
+        users = [User() for i in range(3)]
+        for user in users:
+            self.storage.new(user)
+        self.storage.save()
+        new_storage = self.reopen()
+        held = new_storage.get(User, users[0].id)
+        self.assertEqual(len(new_storage.all()), 3)
+        self.assertEqual(len(new_storage.all(User)), 3)
+        gc.collect()
+        self.assertEqual(list(new_storage._DBStorage__objects.values()),
+                         [held])
+        self.assertIs(new_storage.all(User)[f"User.{users[0].id}"], held)
+        held.first_name = "Betty"
+        del held
+        gc.collect()
+        new_storage.save()
+        self.assertEqual(self.reopen().get(User, users[0].id).first_name,
+                         "Betty")
+
+    def test_find(self):
+        """This tests that find() filters the objects of a class"""
+        place = Place()
+        place.city_id = "a"
+        self.storage.new(place)
+        self.storage.new(Place())
+        self.storage.save()
+        found = self.reopen().find(Place, city_id="a")
+        self.assertEqual([p.id for p in found], [place.id])
+
+    def test_query(self):
+        """This tests that queries read the rows of the class"""
+        for price in [120, 80, 100]:
+            place = Place()
+            place.price_by_night = price
+            self.storage.new(place)
+        self.storage.save()
+        query = self.reopen().query(Place) \
+            .where("price_by_night", "<=", 100).order_by("price_by_night")
+        self.assertEqual(query.explain(), "scan Place")
+        self.assertEqual([p.price_by_night for p in query], [80, 100])
+
+    def test_batch(self):
+        """This tests that the saves in a batch are written once and
+        that an exception undoes the changes made in it"""
+        with patch("models.base_model.storage", self.storage):
+            with self.storage.batch():
+                users = [User() for i in range(3)]
+                for user in users:
+                    user.save()
+                self.assertEqual(self.reopen().count(), 0)
+            self.assertEqual(self.reopen().count(), 3)
+            with self.assertRaises(ValueError):
+                with self.storage.batch():
+                    users[0].first_name = "Betty"
+                    self.storage.delete(users[1])
+                    raise ValueError
+        self.assertFalse("first_name" in users[0].__dict__)
+        self.assertIs(self.storage.get(User, users[1].id), users[1])
@@ -11,9 +11,25 @@ from models.review import Review
 from models.place import Place
 from models.user import User
 from models import storage
-from models.engine.file_storage import FileStorage
+from models.engine.file_storage import FileStorage, iter_json_objects
+from models.engine.file_storage import DURABILITY_LEVELS, write_file
+from models.engine.serializers import SERIALIZERS, get_serializer
+from models.engine.compression import CODECS, get_codec, open_read
+from models.engine.rwlock import RWLock
 from datetime import datetime
+import atexit
+import io
 import json
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+import time
+import uuid
+from unittest.mock import patch
 import os
 
 
@@ -234,3 +250,1522 @@ class TestReload(unittest.TestCase):
             self.assertTrue(type(all_objs[key]) in [User, BaseModel, Review,
                                                     Place, City, Amenity,
                                                     State])
+
+
+class TempDirTestCase(unittest.TestCase):
+    """This is the base of the tests using a storage file in a
+    temporary directory, which is removed after each test"""
+
+    def setUp(self):
+        """Creates a temporary directory, self.tmp, and the path of a
+        storage file in it, self.path"""
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = os.path.join(self.tmp, "file.json")
+
+
+class TestJournal(TempDirTestCase):
+    """This tests the journal mode of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a journaled storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path, journal=True)
+
+    def test_first_save_writes_snapshot(self):
+        """This tests that the first save writes the whole file"""
+        self.storage.new(BaseModel())
+        self.storage.save()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.storage.journal_path))
+
+    def test_save_appends_changed_objects(self):
+        """This tests that later saves only append the changed objects"""
+        user = User()
+        place = Place()
+        self.storage.new(user)
+        self.storage.new(place)
+        self.storage.save()
+        user.first_name = "Betty"
+        self.storage.save()
+        with open(self.storage.journal_path) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        key, value = json.loads(lines[0])
+        self.assertEqual(key, f"User.{user.id}")
+        self.assertEqual(value["first_name"], "Betty")
+
+    def test_reload_replays_journal(self):
+        """This tests that reload() applies the journal on the snapshot"""
+        user = User()
+        place = Place()
+        self.storage.new(user)
+        self.storage.new(place)
+        self.storage.save()
+        user.first_name = "Betty"
+        self.storage.delete(place)
+        self.storage.save()
+
+        new_storage = FileStorage(self.path, journal=True)
+        new_storage.reload()
+        all_objs = new_storage.all()
+        self.assertEqual(all_objs[f"User.{user.id}"].first_name, "Betty")
+        self.assertFalse(f"Place.{place.id}" in all_objs)
+
+    def test_reload_ignores_torn_record(self):
+        """This tests that a half written last record is ignored"""
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        with open(self.storage.journal_path, "a") as f:
+            f.write('["User.1234", {"id": "12')
+        new_storage = FileStorage(self.path, journal=True)
+        new_storage.reload()
+        self.assertEqual(list(new_storage.all()), [f"User.{user.id}"])
+
+    def test_compact_after_limit(self):
+        """This tests that the journal is folded into the snapshot
+        once it holds more than journal_limit records"""
+        self.storage.journal_limit = 2
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        for i in range(4):
+            user.first_name = str(i)
+            self.storage.save()
+        with open(self.storage.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)[f"User.{user.id}"]["first_name"],
+                             "2")
+
+
+class TestDirtyTracking(unittest.TestCase):
+    """This tests that save() only serializes changed objects"""
+
+    def test_setattr_marks_dirty(self):
+        """This tests that only the changed object is serialized again"""
+        model1 = BaseModel()
+        model2 = BaseModel()
+        with patch.object(storage, "cache_fragments", True):
+            storage.save()
+            model1.name = "My_First_Model"
+            with patch.object(BaseModel, "to_dict", autospec=True,
+                              side_effect=BaseModel.to_dict) as to_dict:
+                storage.save()
+        self.assertEqual([c.args[0] for c in to_dict.call_args_list],
+                         [model1])
+        with open("file.json", "r") as f:
+            objs_json = json.load(f)
+        key1 = f"BaseModel.{model1.id}"
+        self.assertEqual(objs_json[key1]["name"], "My_First_Model")
+        self.assertTrue(f"BaseModel.{model2.id}" in objs_json)
+
+    def test_cached_output_matches_json_dumps(self):
+        """This tests that the file is the same as a full json.dumps"""
+        BaseModel().save()
+        User().save()
+        with open("file.json", "r") as f:
+            string = f.read()
+        expected = json.dumps({key: value.to_dict()
+                               for key, value in storage.all().items()})
+        self.assertEqual(string, expected)
+
+    def test_deleted_object_not_saved(self):
+        """This tests that a deleted object disappears from the file"""
+        model = BaseModel()
+        storage.save()
+        storage.delete(model)
+        storage.save()
+        with open("file.json", "r") as f:
+            objs_json = json.load(f)
+        self.assertFalse(f"BaseModel.{model.id}" in objs_json)
+
+    def test_change_inside_attribute(self):
+        """This tests that a change made inside an attribute, which
+        does not set it, is saved"""
+        place = Place()
+        place.amenity_ids = []
+        storage.save()
+        place.amenity_ids.append("wifi")
+        storage.save()
+        with open("file.json", "r") as f:
+            objs_json = json.load(f)
+        self.assertEqual(objs_json[f"Place.{place.id}"]["amenity_ids"],
+                         ["wifi"])
+
+    def test_other_storages_marked(self):
+        """This tests that setting an attribute marks the object in
+        every storage holding it, not only in models.storage"""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        others = [FileStorage(os.path.join(tmp, "cached.json"),
+                              cache_fragments=True),
+                  FileStorage(os.path.join(tmp, "journal.json"),
+                              journal=True),
+                  FileStorage(os.path.join(tmp, "sharded.json"),
+                              sharded=True)]
+        user = User()
+        for other in others:
+            other.new(user)
+            other.save()
+        user.first_name = "Betty"
+        for other in others:
+            other.save()
+            saved = FileStorage(other._FileStorage__file_path,
+                                sharded=other.sharded)
+            self.assertEqual(saved.get(User, user.id).first_name, "Betty")
+
+
+class TestStreamingReload(unittest.TestCase):
+    """This tests the incremental decoding used by reload()"""
+
+    def test_iter_json_objects(self):
+        """This tests that the pairs are the same as with json.loads"""
+        dic = {f"Place.{i}": {"id": str(i), "name": "a}b" * i,
+                              "amenity_ids": [str(i), {"x": 1.5}]}
+               for i in range(20)}
+        for string in [json.dumps(dic), json.dumps(dic, indent=4)]:
+            for chunk_size in [1, 3, 64, 65536]:
+                pairs = iter_json_objects(io.StringIO(string), chunk_size)
+                self.assertEqual(dict(pairs), dic)
+
+    def test_iter_json_objects_empty(self):
+        """This tests that an empty JSON object yields nothing"""
+        self.assertEqual(list(iter_json_objects(io.StringIO(" {} "))), [])
+
+    def test_iter_json_objects_truncated(self):
+        """This tests that a truncated file raises an error"""
+        with self.assertRaises(ValueError):
+            list(iter_json_objects(io.StringIO('{"a": {"b": 1}'), 4))
+
+    def test_reload_builds_objects(self):
+        """This tests that reload() builds every object of the file"""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "file.json")
+        user = User()
+        user.first_name = "Betty"
+        place = Place()
+        with open(path, "w") as f:
+            json.dump({f"User.{user.id}": user.to_dict(),
+                       f"Place.{place.id}": place.to_dict()}, f, indent=2)
+        new_storage = FileStorage(path)
+        new_storage.reload()
+        all_objs = new_storage.all()
+        self.assertEqual(len(all_objs), 2)
+        self.assertEqual(all_objs[f"User.{user.id}"].first_name, "Betty")
+        self.assertEqual(type(all_objs[f"Place.{place.id}"]), Place)
+
+
+class TestShards(TempDirTestCase):
+    """This tests the sharded layout of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a sharded storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path, sharded=True)
+
+    def shard(self, class_name):
+        """Returns the path of the shard of class_name"""
+        return os.path.join(self.storage.shard_dir, class_name + ".json")
+
+    def test_one_file_per_class(self):
+        """This tests that each class is saved in its own file"""
+        user = User()
+        place = Place()
+        self.storage.new(user)
+        self.storage.new(place)
+        self.storage.save()
+        self.assertEqual(sorted(os.listdir(self.storage.shard_dir)),
+                         ["Place.json", "User.json"])
+        with open(self.shard("User")) as f:
+            self.assertEqual(list(json.load(f)), [f"User.{user.id}"])
+
+    def test_only_changed_shards_rewritten(self):
+        """This tests that save() leaves unchanged shards alone"""
+        user = User()
+        place = Place()
+        self.storage.new(user)
+        self.storage.new(place)
+        self.storage.save()
+        os.remove(self.shard("Place"))
+        user.first_name = "Betty"
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.shard("Place")))
+        with open(self.shard("User")) as f:
+            self.assertEqual(json.load(f)[f"User.{user.id}"]["first_name"],
+                             "Betty")
+
+    def test_empty_shard_removed(self):
+        """This tests that the shard of a class without objects
+        is removed"""
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        self.storage.delete(user)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.shard("User")))
+
+    def test_reload_merges_shards(self):
+        """This tests that reload() loads the objects of every shard,
+        with and without a pool of processes"""
+        objs = [User(), Place(), City(), Review(), State()]
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        for workers in [1, 2]:
+            new_storage = FileStorage(self.path, sharded=True,
+                                      workers=workers)
+            with patch("models.engine.file_storage.PARALLEL_LOAD_BYTES",
+                       0):
+                new_storage.reload()
+            all_objs = new_storage.all()
+            self.assertEqual(len(all_objs), len(objs))
+            for obj in objs:
+                key = f"{type(obj).__name__}.{obj.id}"
+                self.assertEqual(type(all_objs[key]), type(obj))
+
+    def test_small_store_not_parallel(self):
+        """This tests that the shards of a small store are decoded
+        without a pool of processes"""
+        for obj in [User(), Place(), City()]:
+            self.storage.new(obj)
+        self.storage.save()
+        new_storage = FileStorage(self.path, sharded=True, workers=4)
+        with patch("concurrent.futures.ProcessPoolExecutor") as pool:
+            self.assertEqual(new_storage.count(), 3)
+        self.assertEqual(pool.call_count, 0)
+
+    def test_journal_with_shards(self):
+        """This tests that compact() rewrites the shards changed
+        through the journal"""
+        self.storage.journal = True
+        self.storage.journal_limit = 0
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        user.first_name = "Betty"
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.storage.journal_path))
+        with open(self.shard("User")) as f:
+            self.assertEqual(json.load(f)[f"User.{user.id}"]["first_name"],
+                             "Betty")
+
+
+class TestClassIndex(TempDirTestCase):
+    """This tests the all(cls) and count(cls) methods of the
+    FileStorage Class"""
+
+    def setUp(self):
+        """Creates a storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+
+    def test_all_with_class(self):
+        """This tests that all(cls) only returns the objects of cls"""
+        user = User()
+        place = Place()
+        self.storage.new(user)
+        self.storage.new(place)
+        self.assertEqual(self.storage.all(User), {f"User.{user.id}": user})
+        self.assertEqual(self.storage.all("Place"),
+                         {f"Place.{place.id}": place})
+        self.assertEqual(self.storage.all(City), {})
+
+    def test_count(self):
+        """This tests that count() follows new() and delete()"""
+        users = [User(), User()]
+        for user in users:
+            self.storage.new(user)
+        self.storage.new(Place())
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(self.storage.count(User), 2)
+        self.storage.delete(users[0])
+        self.assertEqual(self.storage.count("User"), 1)
+        self.assertEqual(self.storage.count(), 2)
+
+    def test_get(self):
+        """This tests that get() returns the object with the id"""
+        user = User()
+        self.storage.new(user)
+        self.assertIs(self.storage.get(User, user.id), user)
+        self.assertIs(self.storage.get("User", user.id), user)
+        self.assertIsNone(self.storage.get(Place, user.id))
+
+    def test_index_after_reload(self):
+        """This tests that reload() rebuilds the index"""
+        self.storage.new(User())
+        self.storage.new(Place())
+        self.storage.save()
+        new_storage = FileStorage(self.path)
+        new_storage.reload()
+        self.assertEqual(new_storage.count(User), 1)
+        self.assertEqual(new_storage.count(Place), 1)
+        self.assertEqual(new_storage.count(BaseModel), 0)
+
+
+class TestFind(TempDirTestCase):
+    """This tests the find() method of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+
+    def place(self, **attrs):
+        """Returns a new Place stored in self.storage"""
+        place = Place(id=str(uuid.uuid4()),
+                      created_at=datetime.now().isoformat(),
+                      updated_at=datetime.now().isoformat(), **attrs)
+        self.storage.new(place)
+        return place
+
+    def test_find_by_indexed_attribute(self):
+        """This tests that find() returns the objects with the value"""
+        place1 = self.place(city_id="a", user_id="u")
+        place2 = self.place(city_id="a", user_id="v")
+        self.place(city_id="b", user_id="u")
+        found = self.storage.find(Place, city_id="a")
+        self.assertEqual(sorted(p.id for p in found),
+                         sorted([place1.id, place2.id]))
+        self.assertEqual(self.storage.find(Place, city_id="a", user_id="u"),
+                         [place1])
+        self.assertEqual(self.storage.find(Place, city_id="c"), [])
+
+    def test_find_by_other_attribute(self):
+        """This tests that find() works on attributes without index"""
+        place = self.place(name="Home")
+        self.place(name="Office")
+        self.assertEqual(self.storage.find("Place", name="Home"), [place])
+
+    def test_find_follows_updates(self):
+        """This tests that the index follows changed and deleted
+        objects"""
+        place = self.place(city_id="a")
+        place.city_id = "b"
+        self.assertEqual(self.storage.find(Place, city_id="a"), [])
+        self.assertEqual(self.storage.find(Place, city_id="b"), [place])
+        self.storage.delete(place)
+        self.assertEqual(self.storage.find(Place, city_id="b"), [])
+
+    def test_find_through_base_model(self):
+        """This tests that attributes set on objects of the main storage
+        update its indexes"""
+        review = Review()
+        review.place_id = "1234"
+        self.assertEqual(storage.find(Review, place_id="1234"), [review])
+        review.place_id = "5678"
+        self.assertEqual(storage.find(Review, place_id="1234"), [])
+
+    def test_find_after_reload(self):
+        """This tests that reload() rebuilds the indexes"""
+        place = self.place(city_id="a")
+        self.storage.save()
+        new_storage = FileStorage(self.path)
+        new_storage.reload()
+        self.assertEqual([p.id for p in new_storage.find(Place,
+                                                         city_id="a")],
+                         [place.id])
+
+
+class TestFindRange(TempDirTestCase):
+    """This tests the find_range() method of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a storage holding places with several prices"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+        for price, guests in [(120, 4), (80, 2), (100, 6), (200, 8)]:
+            place = Place()
+            place.price_by_night = price
+            place.max_guest = guests
+            place.latitude = price / 10
+            self.storage.new(place)
+
+    def test_indexed_range(self):
+        """This tests a range over an indexed attribute"""
+        places = self.storage.find_range(Place, "price_by_night", high=120)
+        cheap = [p for p in places if p.max_guest >= 4]
+        self.assertEqual([p.price_by_night for p in cheap], [100, 120])
+
+    def test_range_without_index(self):
+        """This tests a range over an attribute without index"""
+        places = self.storage.find_range(Place, "latitude", 9, 12.5,
+                                         reverse=True)
+        self.assertEqual([p.latitude for p in places], [12.0, 10.0])
+
+    def test_range_follows_updates(self):
+        """This tests that the index follows changed objects"""
+        place = next(self.storage.find_range(Place, "max_guest", low=8))
+        place.max_guest = 1
+        guests = self.storage.find_range(Place, "max_guest")
+        self.assertEqual([p.max_guest for p in guests], [1, 2, 4, 6])
+
+
+class TestNear(TempDirTestCase):
+    """This tests the near() and nearest() methods of the FileStorage
+    Class"""
+
+    def setUp(self):
+        """Creates a storage holding places and cities with positions"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+        self.places = []
+        for lat, lon in [(6.60, 3.35), (6.47, 3.58), (7.38, 3.95)]:
+            place = Place()
+            place.latitude = lat
+            place.longitude = lon
+            self.storage.new(place)
+            self.places.append(place)
+            city = City()
+            city.latitude = lat
+            city.longitude = lon
+            self.storage.new(city)
+
+    def test_near(self):
+        """This tests a radius query with and without index"""
+        self.assertEqual(self.storage.near(Place, 6.52, 3.38, 30),
+                         self.places[:2])
+        found = self.storage.near(City, 6.52, 3.38, 30)
+        self.assertEqual([c.latitude for c in found], [6.60, 6.47])
+
+    def test_nearest(self):
+        """This tests a k nearest query with and without index"""
+        self.assertEqual(self.storage.nearest(Place, 7.0, 3.9, 2),
+                         [self.places[2], self.places[1]])
+        found = self.storage.nearest(City, 7.0, 3.9, 2)
+        self.assertEqual([c.latitude for c in found], [7.38, 6.47])
+
+
+class TestSearch(TempDirTestCase):
+    """This tests the search() method of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+
+    def test_search_indexed_class(self):
+        """This tests a search over the text index of Place"""
+        place1 = Place()
+        place1.name = "Loft"
+        place1.description = "Sunny loft near the market"
+        place2 = Place()
+        place2.name = "Sunny villa"
+        place2.description = "Sunny villa, sunny garden"
+        self.storage.new(place1)
+        self.storage.new(place2)
+        self.assertEqual(self.storage.search(Place, "sunny"),
+                         [place2, place1])
+        self.assertEqual(self.storage.search(Place, "loft"), [place1])
+        place1.description = "Dark loft"
+        self.assertEqual(self.storage.search(Place, "sunny"), [place2])
+
+    def test_search_other_class(self):
+        """This tests a search over a class without text index"""
+        user = User()
+        user.first_name = "Betty"
+        self.storage.new(user)
+        self.storage.new(User())
+        self.assertEqual(self.storage.search("User", "betty"), [user])
+
+
+class TestBatch(TempDirTestCase):
+    """This tests the batch() method of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a storage on a temporary file that the models
+        report their changes to"""
+        super().setUp()
+        self.storage = FileStorage(self.path)
+        patcher = patch("models.base_model.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_write(self):
+        """This tests that the saves in a batch are done once"""
+        with patch.object(self.storage, "compact",
+                          wraps=self.storage.compact) as compact:
+            with self.storage.batch() as batch_storage:
+                self.assertIs(batch_storage, self.storage)
+                for i in range(5):
+                    user = User()
+                    user.first_name = f"user{i}"
+                    user.save()
+                self.assertFalse(os.path.exists(self.path))
+            self.assertEqual(compact.call_count, 1)
+        saved = FileStorage(self.path)
+        saved.reload()
+        self.assertEqual(len(saved.all()), 5)
+
+    def test_no_save_asked(self):
+        """This tests that a batch without save does not write"""
+        with self.storage.batch():
+            User()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_rollback(self):
+        """This tests that an exception undoes the changes made in
+        the batch and that nothing is written"""
+        place = Place()
+        place.name = "Loft"
+        place.price_by_night = 100
+        gone = User()
+        self.storage.save()
+        with self.assertRaises(KeyError):
+            with self.storage.batch():
+                place.name = "Villa"
+                place.price_by_night = 300
+                place.max_guest = 4
+                added = City()
+                self.storage.delete(gone)
+                self.storage.save()
+                raise KeyError("stop")
+        self.assertEqual(place.name, "Loft")
+        self.assertEqual(place.price_by_night, 100)
+        self.assertFalse("max_guest" in place.__dict__)
+        self.assertIsNone(self.storage.get(City, added.id))
+        self.assertIs(self.storage.get(User, gone.id), gone)
+        self.assertEqual(
+            list(self.storage.find_range(Place, "price_by_night",
+                                         200, 400)), [])
+        self.assertEqual(
+            list(self.storage.find_range(Place, "price_by_night",
+                                         50, 150)), [place])
+        saved = FileStorage(self.path)
+        saved.reload()
+        self.assertEqual(len(saved.all()), 2)
+
+    def test_nested_rollback(self):
+        """This tests that an exception leaving an inner batch only
+        undoes the changes made in it"""
+        user = User()
+        with self.storage.batch():
+            user.first_name = "Betty"
+            user.save()
+            try:
+                with self.storage.batch():
+                    user.first_name = "Holberton"
+                    raise ValueError
+            except ValueError:
+                pass
+            self.assertEqual(user.first_name, "Betty")
+        saved = FileStorage(self.path)
+        saved.reload()
+        self.assertEqual(saved.get(User, user.id).first_name, "Betty")
+
+    def test_other_thread(self):
+        """This tests that a batch neither defers the saves nor undoes
+        the changes of another thread"""
+        user = User()
+        other = User()
+
+        def change():
+            other.first_name = "Betty"
+            other.save()
+        with self.assertRaises(ValueError):
+            with self.storage.batch():
+                user.first_name = "Holberton"
+                thread = threading.Thread(target=change)
+                thread.start()
+                thread.join()
+                saved = FileStorage(self.path)
+                self.assertEqual(saved.get(User, other.id).first_name,
+                                 "Betty")
+                raise ValueError
+        self.assertFalse("first_name" in user.__dict__)
+        self.assertEqual(other.first_name, "Betty")
+        self.storage.save()
+        saved = FileStorage(self.path)
+        self.assertEqual(saved.get(User, other.id).first_name, "Betty")
+
+
+class TestWriteBehind(TempDirTestCase):
+    """This tests the write-behind mode of the FileStorage Class"""
+
+    def setUp(self):
+        """Creates a write-behind storage on a temporary file"""
+        super().setUp()
+        self.storage = FileStorage(self.path, flush_interval=60,
+                                   flush_changes=3)
+
+    def tearDown(self):
+        """Stops the flusher"""
+        self.storage.close()
+
+    def saved(self):
+        """Returns the objects saved in the file"""
+        saved = FileStorage(self.path)
+        saved.reload()
+        return saved.all()
+
+    def test_save_does_not_write(self):
+        """This tests that save() leaves the write to flush()"""
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        self.assertFalse(os.path.exists(self.path))
+        self.storage.flush()
+        self.assertTrue(f"User.{user.id}" in self.saved())
+
+    def test_flush_after_changes(self):
+        """This tests that the thread writes once flush_changes saves
+        were asked for, in a single write"""
+        with patch.object(self.storage, "compact",
+                          wraps=self.storage.compact) as compact:
+            for i in range(3):
+                self.storage.new(User())
+                self.storage.save()
+            for i in range(100):
+                if compact.call_count:
+                    break
+                time.sleep(0.01)
+            self.storage._FileStorage__flusher.stop()
+            self.assertEqual(compact.call_count, 1)
+            self.assertEqual(len(self.saved()), 3)
+
+    def test_flush_after_interval(self):
+        """This tests that the thread writes after flush_interval"""
+        storage = FileStorage(self.path, flush_interval=0.01)
+        storage.new(User())
+        storage.save()
+        for i in range(100):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        storage.close()
+        self.assertEqual(len(self.saved()), 1)
+
+    def test_close(self):
+        """This tests that close() writes the pending changes and
+        that the saves are then written at once"""
+        self.storage.new(User())
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual(len(self.saved()), 1)
+        self.storage.new(User())
+        self.storage.save()
+        self.assertEqual(len(self.saved()), 2)
+
+    def test_error_raised_on_next_save(self):
+        """This tests that an error of the thread is raised by the
+        next save()"""
+        storage = FileStorage(os.path.join(self.tmp, "no", "file.json"),
+                              flush_interval=0)
+        self.addCleanup(atexit.unregister, storage.flush)
+        storage.new(User())
+        storage.save()
+        for i in range(100):
+            if isinstance(storage._FileStorage__flusher.error, OSError):
+                break
+            time.sleep(0.01)
+        with self.assertRaises(OSError):
+            storage.save()
+        storage._FileStorage__flusher.stop()
+
+
+class TestDurability(TempDirTestCase):
+    """This tests the durability levels of the FileStorage Class"""
+
+    def test_levels(self):
+        """This tests that every level saves and reloads the objects"""
+        for durability in DURABILITY_LEVELS:
+            storage = FileStorage(self.path, durability=durability)
+            user = User()
+            storage.new(user)
+            storage.save()
+            saved = FileStorage(self.path)
+            saved.reload()
+            self.assertTrue(f"User.{user.id}" in saved.all())
+            self.assertEqual([name for name in os.listdir(self.tmp)
+                              if name != "file.json.lock"], ["file.json"])
+
+    def test_unknown_level(self):
+        """This tests that an unknown level is refused"""
+        with self.assertRaises(ValueError):
+            FileStorage(self.path, durability="always")
+        with self.assertRaises(ValueError):
+            write_file(self.path, "{}", "always")
+
+    def test_failed_write_keeps_file(self):
+        """This tests that a write failing before the rename leaves
+        the file as it was and no temporary file"""
+        write_file(self.path, '{"a": 1}')
+        with patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                write_file(self.path, '{"b": 2}')
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"a": 1}')
+        self.assertEqual(os.listdir(self.tmp), ["file.json"])
+
+    def test_permissions(self):
+        """This tests that a file replaced keeps its permissions, and
+        that a new file gets those of the umask, as do the shards,
+        without the umask being changed"""
+        umask = os.umask(0o027)
+        self.addCleanup(os.umask, umask)
+        with patch("os.umask") as set_umask:
+            write_file(self.path, "{}")
+        set_umask.assert_not_called()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        os.chmod(self.path, 0o644)
+        for durability in DURABILITY_LEVELS:
+            write_file(self.path, "{}", durability)
+            self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+        storage = FileStorage(self.path, sharded=True)
+        storage.new(User())
+        storage.save()
+        shard = os.path.join(storage.shard_dir, "User.json")
+        self.assertEqual(os.stat(shard).st_mode & 0o777, 0o640)
+
+    def test_fsync(self):
+        """This tests which levels sync the file and the directory"""
+        synced = {"none": 0, "flush": 0, "fsync": 1, "fsync_dir": 2}
+        for durability, count in synced.items():
+            with patch("os.fsync") as fsync:
+                write_file(self.path, "{}", durability)
+            self.assertEqual(fsync.call_count, count)
+
+    def test_journal_fsync(self):
+        """This tests that journal appends are synced with "fsync" """
+        storage = FileStorage(self.path, journal=True, durability="fsync")
+        storage.save()
+        storage.new(User())
+        with patch("os.fsync") as fsync:
+            storage.save()
+        self.assertEqual(fsync.call_count, 1)
+        self.assertTrue(os.path.exists(storage.journal_path))
+
+
+class TestSerializers(TempDirTestCase):
+    """This tests the serializers of the FileStorage Class"""
+
+    def fill(self, storage):
+        """Adds a user and a place to storage and returns them"""
+        user = User()
+        user.first_name = "Betty"
+        place = Place()
+        place.amenity_ids = ["a", "b"]
+        place.latitude = 37.77
+        storage.new(user)
+        storage.new(place)
+        return user, place
+
+    def test_round_trip(self):
+        """This tests that each serializer reads back what it wrote,
+        and that reload() detects it"""
+        for name in SERIALIZERS:
+            storage = FileStorage(self.path, serializer=name)
+            user, place = self.fill(storage)
+            storage.save()
+            saved = FileStorage(self.path)
+            saved.reload()
+            self.assertIs(saved.serializer, get_serializer(name))
+            self.assertEqual(saved.all()[f"User.{user.id}"].to_dict(),
+                             user.to_dict())
+            self.assertEqual(saved.all()[f"Place.{place.id}"].to_dict(),
+                             place.to_dict())
+
+    def test_json_default(self):
+        """This tests that JSON files are written as before"""
+        storage = FileStorage(self.path)
+        user, place = self.fill(storage)
+        storage.save()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)[f"User.{user.id}"],
+                             user.to_dict())
+
+    def test_binary_smaller(self):
+        """This tests that the binary files are smaller"""
+        sizes = {}
+        for name in SERIALIZERS:
+            path = os.path.join(self.tmp, name)
+            storage = FileStorage(path, serializer=name)
+            for i in range(50):
+                self.fill(storage)
+            storage.save()
+            sizes[name] = os.path.getsize(path)
+        self.assertLess(sizes["marshal"], sizes["json"])
+        self.assertLess(sizes["pickle"], sizes["json"])
+
+    def test_convert(self):
+        """This tests that a storage given a serializer rewrites a file
+        in another format with it"""
+        storage = FileStorage(self.path)
+        user, place = self.fill(storage)
+        storage.save()
+        converted = FileStorage(self.path, serializer="marshal")
+        converted.reload()
+        self.assertIs(converted.serializer, get_serializer("marshal"))
+        converted.save()
+        saved = FileStorage(self.path)
+        saved.reload()
+        self.assertIs(saved.serializer, get_serializer("marshal"))
+        self.assertEqual(len(saved.all()), 2)
+
+    def test_shards(self):
+        """This tests the shards written by a binary serializer and
+        their conversion"""
+        storage = FileStorage(self.path, sharded=True, workers=1)
+        self.fill(storage)
+        storage.save()
+        storage = FileStorage(self.path, sharded=True, workers=1,
+                              serializer="pickle")
+        storage.reload()
+        storage.new(User())
+        storage.save()
+        self.assertEqual(sorted(os.listdir(storage.shard_dir)),
+                         ["Place.json", "User.pickle"])
+        saved = FileStorage(self.path, sharded=True, workers=1)
+        saved.reload()
+        self.assertEqual(saved.count(User), 2)
+        self.assertEqual(saved.count(Place), 1)
+
+    def test_pickle_refuses_classes(self):
+        """This tests that a pickle file holding an object of a class
+        is refused"""
+        header = get_serializer("pickle").header
+        with open(self.path, "wb") as f:
+            f.write(header + pickle.dumps(("User.1", datetime.now())))
+        with self.assertRaises(pickle.UnpicklingError):
+            FileStorage(self.path).reload()
+
+    def test_unknown_serializer(self):
+        """This tests that an unknown serializer is refused"""
+        with self.assertRaises(ValueError):
+            FileStorage(self.path, serializer="xml")
+
+
+class TestCompression(TempDirTestCase):
+    """This tests the compressed files of the FileStorage Class"""
+
+    def fill(self, storage, count=20):
+        """Adds count users to storage and returns them"""
+        users = []
+        for i in range(count):
+            user = User()
+            user.first_name = f"user{i}"
+            storage.new(user)
+            users.append(user)
+        return users
+
+    def test_round_trip(self):
+        """This tests that each codec reads back what it wrote with
+        each serializer, and compresses"""
+        plain = FileStorage(self.path)
+        users = self.fill(plain)
+        plain.save()
+        plain_size = os.path.getsize(self.path)
+        for codec in CODECS:
+            for serializer in SERIALIZERS:
+                storage = FileStorage(self.path, compression=codec,
+                                      serializer=serializer)
+                for user in users:
+                    storage.new(user)
+                storage.save()
+                with open(self.path, "rb") as f:
+                    self.assertTrue(
+                        f.read().startswith(CODECS[codec].magic))
+                if serializer == "json":
+                    self.assertLess(os.path.getsize(self.path), plain_size)
+                saved = FileStorage(self.path)
+                saved.reload()
+                self.assertIs(saved.serializer, get_serializer(serializer))
+                self.assertEqual(
+                    saved.all()[f"User.{users[3].id}"].to_dict(),
+                    users[3].to_dict())
+
+    def test_suffix(self):
+        """This tests that the suffix of the file chooses the codec"""
+        for suffix, codec in [(".gz", "zlib"), (".bz2", "bz2"),
+                              (".xz", "lzma"), ("", None)]:
+            storage = FileStorage(self.path + suffix)
+            self.assertIs(storage.compression, get_codec(codec))
+        storage = FileStorage(self.path + ".gz", compression="none")
+        self.assertIsNone(storage.compression)
+
+    def test_level(self):
+        """This tests that the level is given to the codec"""
+        sizes = []
+        for level in (0, 9):
+            storage = FileStorage(self.path, compression="zlib",
+                                  compression_level=level)
+            self.fill(storage, 50)
+            storage.save()
+            sizes.append(os.path.getsize(self.path))
+        self.assertGreater(sizes[0], sizes[1])
+
+    def test_shards(self):
+        """This tests compressed shards"""
+        storage = FileStorage(self.path, sharded=True, workers=1,
+                              compression="lzma", serializer="marshal")
+        self.fill(storage)
+        storage.new(Place())
+        storage.save()
+        self.assertEqual(sorted(os.listdir(storage.shard_dir)),
+                         ["Place.bin.xz", "User.bin.xz"])
+        saved = FileStorage(self.path, sharded=True, workers=1)
+        saved.reload()
+        self.assertEqual(saved.count(User), 20)
+        self.assertIs(saved.serializer, get_serializer("marshal"))
+        saved.new(User())
+        saved.save()
+        self.assertEqual(sorted(os.listdir(storage.shard_dir)),
+                         ["Place.bin.xz", "User.bin"])
+
+    def test_unknown_compression(self):
+        """This tests that an unknown compression is refused"""
+        with self.assertRaises(ValueError):
+            FileStorage(self.path, compression="zip")
+
+
+class TestStreamingSave(TempDirTestCase):
+    """This tests that the FileStorage Class streams its saves"""
+
+    def test_write_chunks(self):
+        """This tests that write_file() writes an iterable of chunks,
+        compressed or not"""
+        expected = b"".join(b"%d," % i for i in range(1000))
+        for codec in [None] + list(CODECS):
+            write_file(self.path, (b"%d," % i for i in range(1000)),
+                       codec=get_codec(codec))
+            with open_read(self.path) as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_chunks(self):
+        """This tests that the chunks of each serializer are the file
+        it used to write"""
+        fragments = [b"a", b"b", b"c"]
+        for name, expected in [("json", b"{a, b, c}"),
+                               ("marshal", b"abc"), ("pickle", b"abc")]:
+            serializer = get_serializer(name)
+            self.assertEqual(b"".join(serializer.chunks(fragments)),
+                             serializer.header + expected)
+        self.assertEqual(b"".join(get_serializer("json").chunks([])),
+                         b"{}")
+
+    def test_no_fragment_cache(self):
+        """This tests that a storage without fragment cache writes the
+        same file and keeps no fragment"""
+        storages = [FileStorage(self.path, cache_fragments=cache)
+                    for cache in (True, False)]
+        for i in range(10):
+            user = User()
+            for storage in storages:
+                storage.new(user)
+        contents = []
+        for storage in storages:
+            storage.save()
+            with open(self.path, encoding="utf-8") as f:
+                contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+        self.assertEqual(len(storages[0]._FileStorage__fragments), 10)
+        self.assertEqual(storages[1]._FileStorage__fragments, {})
+
+    def test_reload_save_does_not_parse(self):
+        """This tests that a reload followed by a save writes back the
+        datetimes without parsing them"""
+        storage = FileStorage(self.path, cache_fragments=False)
+        for i in range(10):
+            storage.new(User())
+        storage.save()
+        with open(self.path, encoding="utf-8") as f:
+            before = f.read()
+        storage.reload()
+        with patch("models.base_model.datetime") as mock_datetime:
+            storage.compact()
+        self.assertEqual(mock_datetime.fromisoformat.call_count, 0)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), before)
+
+    def test_memory(self):
+        """This tests that a save without fragment cache allocates
+        less memory than the size of the file"""
+        storage = FileStorage(self.path, cache_fragments=False)
+        for i in range(1000):
+            place = Place()
+            place.description = "A quiet room near the park"
+            storage.new(place)
+        tracemalloc.start()
+        try:
+            storage.save()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, os.path.getsize(self.path) / 2)
+
+
+class TestLazyLoad(TempDirTestCase):
+    """This tests that the FileStorage Class reads its file when the
+    objects are first needed, and its keys index"""
+
+    def setUp(self):
+        """Creates a file holding a few objects"""
+        super().setUp()
+        storage = FileStorage(self.path, keys_index=True)
+        self.users = [User() for i in range(3)]
+        for user in self.users:
+            user.first_name = "Betty"
+            storage.new(user)
+        self.place = Place()
+        storage.new(self.place)
+        storage.save()
+
+    def loaded(self, storage):
+        """Returns whether storage has read its file"""
+        return storage._FileStorage__loaded
+
+    def test_lazy(self):
+        """This tests that the file is read on the first all()"""
+        storage = FileStorage(self.path)
+        self.assertFalse(self.loaded(storage))
+        self.assertEqual(len(storage.all()), 4)
+        self.assertTrue(self.loaded(storage))
+
+    def test_new_loads_first(self):
+        """This tests that new() reads the file first, so that a save
+        keeps the objects already saved"""
+        storage = FileStorage(self.path)
+        storage.new(User())
+        storage.save()
+        saved = FileStorage(self.path)
+        self.assertEqual(saved.count(User), 4)
+        self.assertEqual(saved.count(), 5)
+
+    def test_keys_index(self):
+        """This tests that count() and get() only read the keys index
+        and the object asked for"""
+        with patch("models.engine.file_storage.build_objects") as build:
+            storage = FileStorage(self.path, keys_index=True)
+            self.assertEqual(storage.count(), 4)
+            self.assertEqual(storage.count(User), 3)
+            self.assertEqual(storage.count("Place"), 1)
+            user = storage.get(User, self.users[1].id)
+            self.assertIsNone(storage.get(User, "nope"))
+            self.assertIs(storage.get(User, self.users[1].id), user)
+        self.assertEqual(build.call_count, 0)
+        self.assertFalse(self.loaded(storage))
+        self.assertEqual(user.to_dict(), self.users[1].to_dict())
+        self.assertIs(type(user), User)
+
+    def test_partial_objects_kept(self):
+        """This tests that an object read alone by get() stays the
+        object of the storage and that its changes are saved"""
+        storage = FileStorage(self.path, keys_index=True)
+        user = storage.get(User, self.users[0].id)
+        user.first_name = "Holberton"
+        self.assertIs(storage.all()[f"User.{user.id}"], user)
+        self.assertIs(storage.find(User, first_name="Holberton")[0], user)
+        storage.save()
+        saved = FileStorage(self.path)
+        self.assertEqual(saved.get(User, user.id).first_name, "Holberton")
+
+    def test_serializers(self):
+        """This tests get() on the files of every serializer"""
+        for name in SERIALIZERS:
+            storage = FileStorage(self.path, keys_index=True,
+                                  serializer=name)
+            storage.reload()
+            storage.compact()
+            storage = FileStorage(self.path, keys_index=True)
+            place = storage.get(Place, self.place.id)
+            self.assertFalse(self.loaded(storage))
+            self.assertEqual(place.to_dict(), self.place.to_dict())
+
+    def test_compressed(self):
+        """This tests that a compressed file only has the keys, and
+        that get() then reads the whole file"""
+        storage = FileStorage(self.path, keys_index=True,
+                              compression="zlib")
+        storage.reload()
+        storage.compact()
+        storage = FileStorage(self.path, keys_index=True)
+        self.assertEqual(storage.count(User), 3)
+        self.assertFalse(self.loaded(storage))
+        self.assertEqual(storage.get(User, self.users[2].id).first_name,
+                         "Betty")
+        self.assertTrue(self.loaded(storage))
+
+    def test_stale_index(self):
+        """This tests that the index is not used once the file has
+        changed or while a journal is pending"""
+        storage = FileStorage(self.path, journal=True)
+        storage.new(User())
+        storage.save()
+        self.assertTrue(os.path.exists(storage.journal_path))
+        storage = FileStorage(self.path, keys_index=True)
+        self.assertEqual(storage.count(User), 4)
+        self.assertTrue(self.loaded(storage))
+        storage = FileStorage(self.path)
+        storage.compact()
+        storage = FileStorage(self.path, keys_index=True)
+        self.assertEqual(storage.count(User), 4)
+        self.assertTrue(self.loaded(storage))
+
+
+class TestBoundedMemory(TempDirTestCase):
+    """This tests the FileStorage Class with a memory budget, keeping
+    only the objects used last in memory"""
+
+    def setUp(self):
+        """Creates a storage keeping 5 objects in memory"""
+        super().setUp()
+        self.storage = FileStorage(self.path, max_resident=5)
+
+    def tearDown(self):
+        """Closes the storage"""
+        self.storage.close()
+
+    def test_backing_file_closed(self):
+        """This tests that reload() and close() close the backing file
+        of the objects, and that the storage may be used after close()"""
+        ids = self.fill()
+        self.storage.save()
+        cache = self.storage.all()
+        backing = cache._ObjectCache__file
+        self.assertIsNotNone(backing)
+        self.storage.reload()
+        self.assertTrue(backing.closed)
+        self.storage.get(Place, ids[0]).name = "changed"
+        cache = self.storage.all()
+        self.fill(5)
+        backing = cache._ObjectCache__file
+        self.storage.close()
+        self.assertTrue(backing.closed)
+        self.assertEqual(self.storage.count(Place), 25)
+        self.assertEqual(self.storage.get(Place, ids[0]).name, "changed")
+
+    def fill(self, count=20):
+        """Adds count places to the storage and returns their ids,
+        dropping the objects themselves"""
+        ids = []
+        for i in range(count):
+            place = Place()
+            place.name = f"place {i}"
+            place.number_rooms = i
+            self.storage.new(place)
+            ids.append(place.id)
+        return ids
+
+    def test_copy_after_delete(self):
+        """This tests that the objects of a class read after one of
+        them was deleted leave it out, as queries started before"""
+        ids = self.fill()
+        objs = self.storage.all(Place)
+        query = iter(self.storage.query(Place).where(number_rooms=3))
+        gone = self.storage.get(Place, ids[3])
+        self.storage.delete(gone)
+        self.storage.delete(self.storage.get(Place, ids[0]))
+        self.assertEqual([obj.name for obj in objs.values()],
+                         [f"place {i}" for i in range(1, 20) if i != 3])
+        self.assertEqual(len(list(objs.items())), 18)
+        self.assertFalse(f"Place.{ids[3]}" in list(objs))
+        self.assertEqual(list(query), [])
+
+    def test_budget(self):
+        """This tests that no more than max_resident objects stay in
+        memory, while every one can still be found"""
+        ids = self.fill()
+        cache = self.storage.all()
+        self.assertEqual(cache.resident, 5)
+        self.assertEqual(len(cache), 20)
+        self.assertEqual(self.storage.count(Place), 20)
+        for i, ide in enumerate(ids):
+            place = self.storage.get(Place, ide)
+            self.assertEqual(place.name, f"place {i}")
+            self.assertLessEqual(cache.resident, 5)
+        self.assertEqual(sorted(p.number_rooms for p in
+                                self.storage.all(Place).values()),
+                         list(range(20)))
+
+    def test_identity(self):
+        """This tests that an evicted object still held by the program
+        is the one found again"""
+        place = Place()
+        self.storage.new(place)
+        self.fill()
+        self.assertIs(self.storage.get(Place, place.id), place)
+
+    def test_changes_kept(self):
+        """This tests that the changes of an object are kept when it
+        is evicted and read back"""
+        ids = self.fill()
+        place = self.storage.get(Place, ids[0])
+        place.name = "changed"
+        del place
+        self.fill()
+        self.assertEqual(self.storage.get(Place, ids[0]).name, "changed")
+
+    def test_save_reload(self):
+        """This tests that a save writes every object, and that a
+        bounded reload reads them all"""
+        ids = self.fill()
+        self.storage.save()
+        saved = FileStorage(self.path)
+        self.assertEqual(saved.count(Place), 20)
+        self.assertEqual(saved.get(Place, ids[3]).name, "place 3")
+        bounded = FileStorage(self.path, max_resident=5)
+        self.assertEqual(bounded.count(Place), 20)
+        self.assertEqual(bounded.all().resident, 5)
+        self.assertEqual(bounded.get(Place, ids[3]).name, "place 3")
+        bounded.close()
+
+    def test_delete(self):
+        """This tests deleting an evicted object"""
+        ids = self.fill()
+        self.storage.delete(self.storage.get(Place, ids[0]))
+        self.assertIsNone(self.storage.get(Place, ids[0]))
+        self.assertNotIn(f"Place.{ids[0]}", self.storage.all(Place))
+        self.assertEqual(self.storage.count(Place), 19)
+
+    def test_lookups(self):
+        """This tests that find() and queries scan the objects"""
+        ids = self.fill()
+        self.assertEqual([p.id for p in
+                          self.storage.find(Place, number_rooms=7)],
+                         [ids[7]])
+        self.assertEqual([p.number_rooms for p in
+                          self.storage.find_range(Place, "number_rooms",
+                                                  3, 5)], [3, 4, 5])
+        self.assertEqual(self.storage.query(Place)
+                         .where(name="place 12").first().id, ids[12])
+        self.assertIsNone(self.storage.index(Place, "hash", "city_id"))
+
+
+class TestThreads(TempDirTestCase):
+    """This tests the FileStorage Class used from several threads"""
+
+    def run_threads(self, *targets):
+        """Runs each target in its own thread, and returns the
+        exceptions they raised"""
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(target,))
+                   for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_concurrent(self):
+        """This tests adding, changing, reading and saving objects at
+        the same time"""
+        storage = FileStorage(self.path, cache_fragments=False)
+
+        def add():
+            for i in range(300):
+                place = Place()
+                place.number_rooms = i % 7
+                storage.new(place)
+
+        def read():
+            for i in range(100):
+                storage.find(Place, number_rooms=3)
+                list(storage.find_range(Place, "number_rooms", 2, 4))
+                len(storage.all(Place))
+
+        def save():
+            for i in range(20):
+                storage.save()
+
+        self.assertEqual(self.run_threads(add, add, read, save), [])
+        storage.save()
+        self.assertEqual(FileStorage(self.path).count(Place), 600)
+
+    def test_snapshot(self):
+        """This tests that a save writes the objects as they were when
+        it began, and that the changes made meanwhile stay for the
+        next save"""
+        storage = FileStorage(self.path)
+        user = User()
+        user.first_name = "Betty"
+        storage.new(user)
+        key = f"User.{user.id}"
+        write = storage.serializer.fragment
+
+        def fragment(k, dic):
+            if k == key:
+                user.first_name = "Holberton"
+            return write(k, dic)
+        with patch.object(storage.serializer, "fragment", fragment):
+            storage.save()
+        self.assertEqual(
+            FileStorage(self.path).get(User, user.id).first_name, "Betty")
+        storage.save()
+        self.assertEqual(
+            FileStorage(self.path).get(User, user.id).first_name,
+            "Holberton")
+
+    def test_reading(self):
+        """This tests that a writer waits for the readers, and that a
+        reader cannot change the objects"""
+        storage = FileStorage(self.path)
+        place = Place()
+        done = []
+
+        def add():
+            storage.new(place)
+            done.append(True)
+        with storage.reading():
+            thread = threading.Thread(target=add)
+            thread.start()
+            thread.join(0.1)
+            self.assertEqual(done, [])
+            self.assertRaises(RuntimeError, storage.new, User())
+        thread.join()
+        self.assertEqual(done, [True])
+        self.assertIs(storage.get(Place, place.id), place)
+
+    def test_lock(self):
+        """This tests the reentrancy of the RWLock"""
+        lock = RWLock()
+        with lock.write:
+            with lock.write:
+                with lock.read:
+                    pass
+        with lock.read:
+            with lock.read:
+                pass
+            self.assertRaises(RuntimeError, lock.acquire_write)
+        entered = []
+
+        def read():
+            with lock.read:
+                entered.append(True)
+        with lock.write:
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join(0.1)
+            self.assertEqual(entered, [])
+        thread.join()
+        self.assertEqual(entered, [True])
+
+
+class TestProcesses(TempDirTestCase):
+    """This tests FileStorage instances sharing one file, as several
+    processes do"""
+
+    def setUp(self):
+        """Creates two storages on a file holding one user"""
+        super().setUp()
+        first = FileStorage(self.path)
+        self.user = User()
+        self.user.first_name = "Betty"
+        first.new(self.user)
+        first.save()
+        self.a = FileStorage(self.path)
+        self.b = FileStorage(self.path)
+        self.a.reload()
+        self.b.reload()
+
+    def test_no_lost_write(self):
+        """This tests that a save keeps the objects saved elsewhere"""
+        first, second = User(), User()
+        self.a.new(first)
+        self.a.save()
+        self.b.new(second)
+        self.b.save()
+        saved = FileStorage(self.path)
+        self.assertIsNotNone(saved.get(User, first.id))
+        self.assertIsNotNone(saved.get(User, second.id))
+        self.assertIsNotNone(saved.get(User, self.user.id))
+        self.assertIsNotNone(self.b.get(User, first.id))
+
+    def test_merge_memory(self):
+        """This tests that merging a file written elsewhere keeps only
+        the objects that differ, not the whole file as dictionaries"""
+        for i in range(5000):
+            place = Place.from_dict({
+                "id": str(i), "created_at": "2017-09-28T21:05:54",
+                "updated_at": "2017-09-28T21:05:54",
+                "name": f"place {i}",
+                "description": "A quiet room near the park. " * 8})
+            self.a.new(place)
+        self.a.save()
+        self.b.reload()
+        self.b.get(Place, "7").name = "changed"
+        self.b.save()
+        self.a.new(User())
+        tracemalloc.start()
+        try:
+            self.a.save()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(self.a.get(Place, "7").name, "changed")
+        self.assertLess(peak, os.path.getsize(self.path) / 2)
+
+    def test_changed_elsewhere(self):
+        """This tests that an object changed elsewhere is updated in
+        place, and one deleted elsewhere removed"""
+        user = self.a.get(User, self.user.id)
+        other = self.b.get(User, self.user.id)
+        other.first_name = "Holberton"
+        self.b.save()
+        self.a.new(Place())
+        self.a.save()
+        self.assertIs(self.a.get(User, self.user.id), user)
+        self.assertEqual(user.first_name, "Holberton")
+        self.assertEqual(
+            FileStorage(self.path).get(User, self.user.id).first_name,
+            "Holberton")
+
+        self.b.delete(other)
+        self.b.save()
+        self.assertTrue(self.a.refresh())
+        self.assertFalse(self.a.refresh())
+        self.assertIsNone(self.a.get(User, self.user.id))
+        self.assertEqual(self.a.find(User, first_name="Holberton"), [])
+
+    def test_changed_here_wins(self):
+        """This tests that the object changed by the last save is the
+        one saved"""
+        other = self.b.get(User, self.user.id)
+        other.first_name = "Holberton"
+        self.b.save()
+        user = self.a.get(User, self.user.id)
+        user.last_name = "School"
+        self.a.save()
+        saved = FileStorage(self.path).get(User, self.user.id)
+        self.assertEqual(saved.first_name, "Betty")
+        self.assertEqual(saved.last_name, "School")
+
+    def test_journal(self):
+        """This tests that only the records appended to the journal
+        are read when nothing else changed"""
+        a = FileStorage(self.path, journal=True)
+        b = FileStorage(self.path, journal=True)
+        a.reload()
+        b.reload()
+        place = Place()
+        a.new(place)
+        a.save()
+        self.assertTrue(os.path.exists(a.journal_path))
+        with patch("models.engine.file_storage.load_file") as load:
+            self.assertTrue(b.refresh())
+        self.assertEqual(load.call_count, 0)
+        self.assertIsNotNone(b.get(Place, place.id))
+
+    def test_workers(self):
+        """This tests processes saving to the file at the same time"""
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        code = ("from models import storage\n"
+                "from models.user import User\n"
+                "for i in range(20):\n"
+                "    User().save()\n")
+        env = dict(os.environ, HBNB_FILE_PATH=self.path)
+        env.pop("HBNB_TYPE_STORAGE", None)
+        workers = [subprocess.Popen([sys.executable, "-c", code], cwd=root,
+                                    env=env)
+                   for i in range(4)]
+        for worker in workers:
+            self.assertEqual(worker.wait(), 0)
+        self.assertEqual(FileStorage(self.path).count(User), 81)
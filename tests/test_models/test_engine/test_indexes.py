@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+"""This contains unittests for the indexes kept by FileStorage"""
+
+
+import unittest
+from types import SimpleNamespace
+from models.engine.indexes import HashIndex, RangeIndex, GridIndex, TextIndex
+from models.engine.indexes import build_indexes, distance_km, tokenize
+from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+from models.review import Review
+
+
+class TestHashIndex(unittest.TestCase):
+    """This tests the HashIndex class"""
+
+    def test_add_find_remove(self):
+        """This tests that objects are found by their value"""
+        index = HashIndex("city_id")
+        place1 = Place()
+        place1.city_id = "a"
+        place2 = Place()
+        place2.city_id = "a"
+        index.add("Place.1", place1)
+        index.add("Place.2", place2)
+        self.assertEqual(index.find("a"),
+                         {"Place.1": place1, "Place.2": place2})
+        index.remove("Place.1")
+        self.assertEqual(index.find("a"), {"Place.2": place2})
+        self.assertEqual(index.find("b"), {})
+        self.assertEqual(len(index), 1)
+
+    def test_update(self):
+        """This tests that update() moves the object to its new value"""
+        index = HashIndex("city_id")
+        place = Place()
+        place.city_id = "a"
+        index.add("Place.1", place)
+        place.city_id = "b"
+        index.update("Place.1", place)
+        self.assertEqual(index.find("a"), {})
+        self.assertEqual(index.find("b"), {"Place.1": place})
+
+    def test_unhashable_value(self):
+        """This tests that unhashable values are not indexed"""
+        index = HashIndex("amenity_ids")
+        place = Place()
+        place.amenity_ids = ["a"]
+        index.add("Place.1", place)
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.find(["a"]))
+
+    def test_build_indexes(self):
+        """This tests that the indexes declared on a class are built"""
+        indexes = build_indexes(Place)
+        self.assertIsInstance(indexes.pop(("geo", None)), GridIndex)
+        self.assertIsInstance(indexes.pop(("text", None)), TextIndex)
+        self.assertEqual(sorted(indexes),
+                         [("hash", "city_id"), ("hash", "user_id"),
+                          ("range", "max_guest"),
+                          ("range", "number_bathrooms"),
+                          ("range", "number_rooms"),
+                          ("range", "price_by_night")])
+        self.assertEqual(sorted(build_indexes(Review)),
+                         [("hash", "place_id"), ("hash", "user_id"),
+                          ("text", None)])
+        self.assertEqual(list(build_indexes(City)), [("hash", "state_id")])
+        self.assertEqual(build_indexes(BaseModel), {})
+
+
+class TestRangeIndex(unittest.TestCase):
+    """This tests the RangeIndex class"""
+
+    def setUp(self):
+        """Creates an index over places with several prices"""
+        self.index = RangeIndex("price_by_night")
+        self.places = {}
+        for i, price in enumerate([100, 50, 150, 100, 75]):
+            place = Place()
+            place.price_by_night = price
+            self.places[f"Place.{i}"] = place
+            self.index.add(f"Place.{i}", place)
+
+    def prices(self, objs):
+        """Returns the prices of objs"""
+        return [obj.price_by_night for obj in objs]
+
+    def test_ordered_iteration(self):
+        """This tests that objects are read in order of value"""
+        self.assertEqual(self.prices(self.index.range()),
+                         [50, 75, 100, 100, 150])
+        self.assertEqual(self.prices(self.index.range(reverse=True)),
+                         [150, 100, 100, 75, 50])
+
+    def test_bounds_are_included(self):
+        """This tests that low and high are both included"""
+        self.assertEqual(self.prices(self.index.range(75, 100)),
+                         [75, 100, 100])
+        self.assertEqual(self.prices(self.index.range(high=99)), [50, 75])
+        self.assertEqual(self.prices(self.index.range(low=101)), [150])
+        self.assertEqual(self.prices(self.index.range(200, 300)), [])
+
+    def test_update_and_remove(self):
+        """This tests that changed and removed objects move"""
+        self.places["Place.2"].price_by_night = 10
+        self.index.update("Place.2", self.places["Place.2"])
+        self.index.remove("Place.0")
+        self.assertEqual(self.prices(self.index.range()), [10, 50, 75, 100])
+        self.assertEqual(len(self.index), 4)
+
+    def test_not_a_number(self):
+        """This tests that values that are not numbers are left out"""
+        place = Place()
+        place.price_by_night = "cheap"
+        self.index.add("Place.9", place)
+        self.assertEqual(len(self.index), 5)
+
+    def test_nan_left_out(self):
+        """This tests that NaN is left out, so that removing its object
+        removes no other"""
+        for load in (False, True):
+            index = RangeIndex("price_by_night")
+            for i, price in enumerate([5, float("nan"), 3, 7]):
+                place = Place()
+                place.price_by_night = price
+                if load:
+                    index.load(f"Place.{i}", place)
+                else:
+                    index.add(f"Place.{i}", place)
+            index.remove("Place.1")
+            self.assertEqual(self.prices(index.range()), [3, 5, 7])
+            self.assertEqual(len(index), 3)
+
+    def test_load(self):
+        """This tests that loaded objects are read in order of value"""
+        index = RangeIndex("price_by_night")
+        for key, place in self.places.items():
+            index.load(key, place)
+        self.assertEqual(self.prices(index.range()), [50, 75, 100, 100, 150])
+
+    def test_update_cost(self):
+        """This tests that an update of a sorted index compares a few
+        entries instead of sorting them all again"""
+
+        class Counted(float):
+            """A number counting its comparisons"""
+            comparisons = 0
+
+            def __lt__(self, other):
+                Counted.comparisons += 1
+                return float.__lt__(self, other)
+
+            def __eq__(self, other):
+                Counted.comparisons += 1
+                return float.__eq__(self, other)
+
+            __hash__ = float.__hash__
+
+        index = RangeIndex("price")
+        objs = [SimpleNamespace(price=Counted(i)) for i in range(4096)]
+        for i, obj in enumerate(objs):
+            index.load(str(i), obj)
+        next(index.range())
+        Counted.comparisons = 0
+        for i in range(64):
+            objs[i].price = Counted(5000 + i)
+            index.update(str(i), objs[i])
+        self.assertLess(Counted.comparisons, 64 * 100)
+        self.assertEqual([obj.price for obj in index.range(low=4095)],
+                         [4095] + list(range(5000, 5064)))
+
+
+class TestGridIndex(unittest.TestCase):
+    """This tests the GridIndex class"""
+
+    def setUp(self):
+        """Creates an index over places around Lagos and elsewhere"""
+        self.index = GridIndex("latitude", "longitude")
+        self.points = {"ikeja": (6.6018, 3.3515),
+                       "lekki": (6.4698, 3.5852),
+                       "ibadan": (7.3775, 3.9470),
+                       "accra": (5.6037, -0.1870),
+                       "suva": (-18.1416, 178.4419),
+                       "apia": (-13.8333, -171.7667)}
+        self.places = {}
+        for name, (lat, lon) in self.points.items():
+            place = Place()
+            place.name = name
+            place.latitude = lat
+            place.longitude = lon
+            self.places[name] = place
+            self.index.add(f"Place.{name}", place)
+
+    def names(self, found):
+        """Returns the names of the places of (distance, place) pairs"""
+        return [place.name for dist, place in found]
+
+    def test_distance_km(self):
+        """This tests the great-circle distance"""
+        self.assertAlmostEqual(distance_km(0, 0, 0, 1), 111.195, 2)
+        self.assertAlmostEqual(distance_km(6.6, 3.3, 6.6, 3.3), 0)
+
+    def test_near(self):
+        """This tests that points inside the radius are found"""
+        self.assertEqual(self.names(self.index.near(6.5244, 3.3792, 30)),
+                         ["ikeja", "lekki"])
+        self.assertEqual(self.names(self.index.near(6.5244, 3.3792, 150)),
+                         ["ikeja", "lekki", "ibadan"])
+        self.assertEqual(self.index.near(0, 0, 10), [])
+
+    def test_near_across_antimeridian(self):
+        """This tests that cells on both sides of longitude 180 are
+        read"""
+        self.assertEqual(self.names(self.index.near(-16, 179.9, 1200)),
+                         ["suva", "apia"])
+
+    def test_nearest(self):
+        """This tests that the k nearest points are found"""
+        self.assertEqual(self.names(self.index.nearest(6.5244, 3.3792, 4)),
+                         ["ikeja", "lekki", "ibadan", "accra"])
+        self.assertEqual(len(self.index.nearest(0, 0, 10)), 6)
+
+    def test_update_and_remove(self):
+        """This tests that moved and removed points follow"""
+        place = self.places["accra"]
+        place.latitude = 6.5
+        place.longitude = 3.4
+        self.index.update("Place.accra", place)
+        self.index.remove("Place.ikeja")
+        self.assertEqual(self.names(self.index.near(6.5244, 3.3792, 30)),
+                         ["accra", "lekki"])
+        self.assertEqual(len(self.index), 5)
+
+
+class TestTextIndex(unittest.TestCase):
+    """This tests the TextIndex class"""
+
+    def setUp(self):
+        """Creates an index over the text of some reviews"""
+        self.index = TextIndex(("text",))
+        self.reviews = {}
+        for i, text in enumerate(["Great pool, great view",
+                                  "The pool was cold",
+                                  "Lovely host and a lovely garden",
+                                  "Noisy street"]):
+            review = Review()
+            review.text = text
+            self.reviews[f"Review.{i}"] = review
+            self.index.add(f"Review.{i}", review)
+
+    def texts(self, found):
+        """Returns the texts of (score, review) pairs"""
+        return [review.text for score, review in found]
+
+    def test_tokenize(self):
+        """This tests that text is split in lowercase words"""
+        self.assertEqual(tokenize("Great pool, GREAT view!"),
+                         ["great", "pool", "great", "view"])
+
+    def test_search_ranks_matches(self):
+        """This tests that the best matching objects come first"""
+        found = self.index.search("great pool")
+        self.assertEqual(self.texts(found),
+                         ["Great pool, great view", "The pool was cold"])
+        self.assertGreater(found[0][0], found[1][0])
+        self.assertEqual(self.index.search("beach"), [])
+
+    def test_search_limit(self):
+        """This tests that at most limit objects are returned"""
+        self.assertEqual(len(self.index.search("pool lovely noisy", 2)), 2)
+
+    def test_update_and_remove(self):
+        """This tests that changed and removed objects follow"""
+        review = self.reviews["Review.3"]
+        review.text = "Quiet street by the beach"
+        self.index.update("Review.3", review)
+        self.index.remove("Review.0")
+        self.assertEqual(sorted(self.texts(self.index.search("beach pool"))),
+                         ["Quiet street by the beach", "The pool was cold"])
+        self.assertEqual(self.index.search("noisy great"), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_all_text_attributes(self):
+        """This tests that every text attribute is indexed without
+        attrs"""
+        index = TextIndex()
+        model = BaseModel()
+        model.name = "blue house"
+        index.add("BaseModel.1", model)
+        self.assertEqual(len(index.search("house")), 1)
+        self.assertEqual(index.search(model.id), [])
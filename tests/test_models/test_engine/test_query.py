@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""This contains unittests for the Query class"""
+
+
+import unittest
+from models.engine.file_storage import FileStorage
+from models.engine.query import Query
+from models.place import Place
+from models.user import User
+import os
+import shutil
+import tempfile
+
+
+class TestQuery(unittest.TestCase):
+    """This tests the queries returned by storage.query()"""
+
+    def setUp(self):
+        """Creates a storage holding a few places"""
+        self.tmp = tempfile.mkdtemp()
+        self.storage = FileStorage(os.path.join(self.tmp, "file.json"))
+        self.places = []
+        for name, city, price, guests in [("a", "lagos", 120, 4),
+                                          ("b", "lagos", 80, 2),
+                                          ("c", "lagos", 100, 6),
+                                          ("d", "abuja", 90, 5),
+                                          ("e", "abuja", 200, 8)]:
+            place = Place()
+            place.name = name
+            place.city_id = city
+            place.price_by_night = price
+            place.max_guest = guests
+            self.storage.new(place)
+            self.places.append(place)
+        user = User()
+        user.first_name = "Betty"
+        self.storage.new(user)
+
+    def tearDown(self):
+        """Removes the temporary files"""
+        shutil.rmtree(self.tmp)
+
+    def names(self, query):
+        """Returns the names of the results of query"""
+        return [place.name for place in query]
+
+    def test_query_type(self):
+        """This tests that storage.query() returns a Query"""
+        self.assertIsInstance(self.storage.query(Place), Query)
+
+    def test_hash_index_plan(self):
+        """This tests that an equality on a hash index is used"""
+        query = self.storage.query(Place).where(city_id="abuja")
+        self.assertEqual(query.explain(), "hash index Place.city_id")
+        self.assertEqual(sorted(self.names(query)), ["d", "e"])
+
+    def test_range_index_plan(self):
+        """This tests that the range index of the ordering is used
+        and gives the order without sorting"""
+        query = self.storage.query(Place) \
+            .where("price_by_night", "<", 120) \
+            .where("max_guest", ">=", 4) \
+            .order_by("price_by_night")
+        self.assertEqual(query.explain(),
+                         "range index Place.price_by_night [None, 120]")
+        self.assertEqual(self.names(query), ["d", "c"])
+
+    def test_range_condition_plan(self):
+        """This tests that the range index of a condition is used"""
+        self.places[0].price_by_night = "cheap"
+        query = self.storage.query(Place).where("max_guest", ">", 5)
+        self.assertEqual(query.explain(),
+                         "range index Place.max_guest [5, None]")
+        self.assertEqual(sorted(self.names(query)), ["c", "e"])
+
+    def test_scan_plan(self):
+        """This tests that the objects are scanned without index"""
+        query = self.storage.query("User").where(first_name="Betty")
+        self.assertEqual(query.explain(), "scan User")
+        self.assertEqual(len(query.all()), 1)
+
+    def test_order_limit_and_reverse(self):
+        """This tests ordering on an attribute without range index,
+        in decreasing order and with a limit"""
+        query = self.storage.query(Place).where(city_id="lagos") \
+            .order_by("-name").limit(2)
+        self.assertEqual(self.names(query), ["c", "b"])
+        query = self.storage.query(Place).order_by("max_guest",
+                                                   reverse=True).limit(1)
+        self.assertEqual(query.first().name, "e")
+
+    def test_results_are_lazy(self):
+        """This tests that results are produced while iterating"""
+        results = iter(self.storage.query(Place).order_by("price_by_night"))
+        self.assertEqual(next(results).name, "b")
+        self.assertEqual(next(results).name, "d")
+
+    def test_operators(self):
+        """This tests the != and in operators and wrong operators"""
+        query = self.storage.query(Place).where("name", "in", ["a", "e"]) \
+            .where("city_id", "!=", "abuja")
+        self.assertEqual(self.names(query), ["a"])
+        with self.assertRaises(ValueError):
+            self.storage.query(Place).where("name", "~", "a")
+
+    def test_values_not_comparable(self):
+        """This tests that objects with values that can not be compared
+        are left out"""
+        self.places[0].price_by_night = "cheap"
+        query = self.storage.query(Place).where("price_by_night", "<", 100)
+        self.assertEqual(sorted(self.names(query)), ["b", "d"])
+
+    def test_order_with_values_not_numbers(self):
+        """This tests that ordering keeps the objects whose value is
+        not a number, after the others"""
+        self.places[0].price_by_night = "cheap"
+        query = self.storage.query(Place).order_by("price_by_night")
+        self.assertEqual(query.explain(), "scan Place")
+        self.assertEqual(self.names(query), ["b", "d", "c", "e", "a"])
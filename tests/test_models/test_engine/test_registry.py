@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""This contains unittests for the registry of the model classes"""
+
+
+import unittest
+from unittest.mock import patch
+from io import StringIO
+from console import HBNBCommand
+from models import storage
+from models.base_model import BaseModel
+from models.place import Place
+from models.engine import registry
+from models.engine.registry import MODELS, get_model, load_models
+
+
+class TestRegistry(unittest.TestCase):
+    """This tests the registry of the model classes"""
+
+    def tearDown(self):
+        """Removes the classes defined by the tests"""
+        MODELS.pop("Boat", None)
+
+    def test_builtin_models(self):
+        """This tests that every model class is registered"""
+        load_models()
+        for name in ["BaseModel", "User", "State", "City", "Amenity",
+                     "Place", "Review"]:
+            self.assertEqual(get_model(name).__name__, name)
+        self.assertIs(get_model("Place"), Place)
+        self.assertIs(storage.classes("BaseModel"), BaseModel)
+
+    def test_unknown_model(self):
+        """This tests that an unknown name raises KeyError"""
+        with self.assertRaises(KeyError):
+            get_model("Boat")
+
+    def test_load_models_imports_once(self):
+        """This tests that the modules are only looked for once"""
+        load_models()
+        with patch("importlib.import_module") as import_module:
+            load_models()
+            with self.assertRaises(KeyError):
+                get_model("Boat")
+        self.assertEqual(import_module.call_count, 0)
+        self.assertTrue(registry._all_loaded)
+
+    def test_new_model(self):
+        """This tests that a new subclass of BaseModel is registered
+        and usable by the storage and the console"""
+
+        class Boat(BaseModel):
+            """A model defined outside of the models package"""
+            name = ""
+
+        self.assertIs(get_model("Boat"), Boat)
+        with patch('sys.stdout', new=StringIO()) as f:
+            HBNBCommand().onecmd("create Boat")
+            ide = f.getvalue().strip()
+        boat = storage.get("Boat", ide)
+        self.assertIs(type(boat), Boat)
+        self.assertIs(type(Boat.from_dict(boat.to_dict())), Boat)
+        storage.delete(boat)
+        storage.save()